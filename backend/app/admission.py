@@ -0,0 +1,308 @@
+"""
+admission.py – per-tenant admission control for the expensive routes.
+
+Two gates, both per worker process:
+
+• Rate: one token bucket per tenant, sized by Tenant.plan
+  (admission_rate / admission_burst, in work units).  Each request spends
+  admission_cost[kind] units; an empty bucket is answered at once with 429
+  and a Retry-After of when the units will be there
+• Capacity: admission_slots[kind] requests of a kind ("llm", "stt", "tts")
+  run at once.  Past that they wait in a weighted-fair queue: every tenant
+  has its own lane and lanes are served by virtual finish time (cost /
+  plan weight, self-clocked fair queueing), so under saturation throughput
+  splits by admission_weight instead of arrival order and a tenant with a
+  backlog can't push everyone else's wait up.  A full queue (in total or
+  for the tenant) or a wait beyond admission_max_wait_s is a 429 too
+
+HTTP routes take admit(kind) as a dependency; it authenticates the
+caller (every admitted route needs a bearer token, so each request is
+charged to its own tenant) and holds the slot until the response body is
+sent, streams included.  Routes that only sometimes do the expensive work
+(/voice/tts on a cache hit) hold http_slot() in their own dependency
+instead.  WebSocket handlers use get_admission().slot(kind, tenant_id)
+around each turn.
+
+stats() reports per kind: busy slots, queue depth (overall and per
+waiting tenant) and recent wait percentiles; /metrics has the wait
+histogram and rejections by reason.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+
+from .auth import Principal, current_principal
+from .cache import TTLCache
+from .config import get_settings
+from .metrics import ADMISSION_REJECTED, ADMISSION_WAIT
+from .models import Tenant, _engine
+
+KINDS = ("llm", "stt", "tts")
+
+
+class AdmissionRejected(Exception):
+    """The request is over its tenant's rate or the queue has no room."""
+
+    def __init__(self, reason: str, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.reason = reason  # rate | queue | timeout
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))  # whole seconds
+
+    def http(self) -> HTTPException:
+        return HTTPException(
+            429, self.detail, headers={"Retry-After": str(self.retry_after)}
+        )
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate, self.burst = rate, burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def take(self, cost: float) -> float:
+        """Spend *cost* and return 0, or return the seconds until it's there."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        cost = min(cost, self.burst)  # a cost above the burst would never fit
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class FairQueue:
+    """Concurrency slots for one kind of work, granted in weighted-fair order."""
+
+    def __init__(self, kind: str, slots: int):
+        self.kind = kind
+        self.slots = slots
+        self.busy = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # (virtual finish, arrival, tenant, future); entries whose waiter timed
+        # out or went away stay until popped, but no longer count anywhere
+        self._heap: list[tuple[float, int, int, asyncio.Future]] = []
+        self._finish: dict[int, float] = {}  # last finish tag per tenant
+        self._waiting: dict[int, int] = {}  # live waiters per tenant
+        self._live = 0  # live waiters in all
+        self._vtime = 0.0  # finish tag of the request granted last
+        self._arrivals = itertools.count()
+        self._hold_s = 0.1  # moving average of how long a slot is held
+        self._waits: deque[float] = deque(maxlen=1000)
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # waiters of a previous (closed) loop can never be woken
+            self._loop, self._heap, self._waiting, self._finish = loop, [], {}, {}
+            self._live = 0
+        return loop
+
+    def _retry_after(self) -> float:
+        return (self._live + 1) * self._hold_s / self.slots
+
+    async def acquire(self, tenant_id: int, weight: float, cost: float):
+        cfg = get_settings()
+        loop = self._bind()
+        if self.busy < self.slots and not self._live:
+            self.busy += 1
+            self._granted(0.0)
+            return
+        waiting = self._waiting.get(tenant_id, 0)
+        if self._live >= cfg.admission_max_queue or (
+            waiting >= cfg.admission_max_queue_per_tenant
+        ):
+            raise self._reject("queue", f"Too many {self.kind} requests queued")
+
+        start = max(self._vtime, self._finish.get(tenant_id, 0.0))
+        finish = self._finish[tenant_id] = start + cost / weight
+        fut = loop.create_future()
+        heapq.heappush(self._heap, (finish, next(self._arrivals), tenant_id, fut))
+        self._waiting[tenant_id] = waiting + 1
+        self._live += 1
+        self.queued += 1
+        t0 = time.monotonic()
+        try:
+            await asyncio.wait_for(fut, cfg.admission_max_wait_s)
+        except asyncio.TimeoutError:
+            self._leave(tenant_id)
+            raise self._reject("timeout", f"Waited too long for a {self.kind} slot")
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(0.0)  # granted just as the caller went away
+            else:
+                self._leave(tenant_id)
+            raise
+        self._granted(time.monotonic() - t0)
+
+    def _leave(self, tenant_id: int):
+        """A waiter is off the queue: granted, timed out or gone."""
+        left = self._waiting.pop(tenant_id) - 1
+        if left:
+            self._waiting[tenant_id] = left
+        self._live -= 1
+        if not self._live:
+            self._heap.clear()  # only dead entries left
+
+    def _granted(self, waited: float):
+        self.admitted += 1
+        self._waits.append(waited)
+        ADMISSION_WAIT.observe(waited, kind=self.kind)
+
+    def _reject(self, reason: str, detail: str) -> AdmissionRejected:
+        self.rejected += 1
+        ADMISSION_REJECTED.inc(kind=self.kind, reason=reason)
+        return AdmissionRejected(reason, detail, self._retry_after())
+
+    def release(self, held_s: float):
+        """Free a slot, or hand it straight to the next waiter in fair order."""
+        if held_s:
+            self._hold_s += 0.1 * (held_s - self._hold_s)
+        while self._heap:
+            finish, _, tenant_id, fut = heapq.heappop(self._heap)
+            if fut.done():  # timed out or cancelled while waiting; already left
+                continue
+            self._vtime = finish
+            self._leave(tenant_id)
+            fut.set_result(None)
+            return
+        self.busy -= 1
+        # an empty queue has nobody ahead or behind: start the clock over
+        self._finish.clear()
+        self._vtime = 0.0
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+
+        def pct(q: float) -> float:
+            return round(waits[int(q * (len(waits) - 1))] * 1000, 1) if waits else 0.0
+
+        return {
+            "slots": self.slots,
+            "busy": self.busy,
+            "queue_depth": self._live,
+            "waiting_by_tenant": dict(self._waiting),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "wait_p50_ms": pct(0.5),
+            "wait_p99_ms": pct(0.99),
+        }
+
+
+class Admission:
+    def __init__(self):
+        cfg = get_settings()
+        self.queues = {kind: FairQueue(kind, cfg.admission_slots[kind]) for kind in KINDS}
+        self._buckets: TTLCache[TokenBucket] = TTLCache(100_000, 3600)
+        self._plans: TTLCache[str] = TTLCache(100_000, cfg.admission_plan_cache_ttl_s)
+        self.rate_limited = 0
+
+    def _plan_of(self, tenant_id: int) -> str:
+        with Session(_engine()) as session:
+            tenant = session.get(Tenant, tenant_id)
+        return tenant.plan if tenant is not None else get_settings().admission_default_plan
+
+    async def plan(self, tenant_id: int) -> str:
+        plan = self._plans.get(tenant_id)
+        if plan is None:
+            plan = await run_in_threadpool(self._plan_of, tenant_id)
+            self._plans.put(tenant_id, plan)
+        return plan
+
+    def _take(self, tenant_id: int, plan: str, cost: float) -> float:
+        cfg = get_settings()
+        key = (tenant_id, plan)  # a plan change starts a fresh bucket
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            fallback = cfg.admission_default_plan
+            bucket = TokenBucket(
+                cfg.admission_rate.get(plan, cfg.admission_rate[fallback]),
+                cfg.admission_burst.get(plan, cfg.admission_burst[fallback]),
+            )
+        self._buckets.put(key, bucket)  # touched: stays for another TTL
+        return bucket.take(cost)
+
+    async def acquire(self, kind: str, tenant_id: int):
+        cfg = get_settings()
+        plan = await self.plan(tenant_id)
+        wait = self._take(tenant_id, plan, cfg.admission_cost[kind])
+        if wait:
+            self.rate_limited += 1
+            ADMISSION_REJECTED.inc(kind=kind, reason="rate")
+            raise AdmissionRejected("rate", f"Rate limit for the {plan} plan reached", wait)
+        weight = cfg.admission_weight.get(plan, cfg.admission_weight[cfg.admission_default_plan])
+        await self.queues[kind].acquire(tenant_id, weight, cfg.admission_cost[kind])
+
+    @asynccontextmanager
+    async def slot(self, kind: str, tenant_id: int):
+        """Hold a *kind* slot for the block; raises AdmissionRejected."""
+        if not get_settings().admission_enabled:
+            yield
+            return
+        await self.acquire(kind, tenant_id)
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.queues[kind].release(time.monotonic() - t0)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": get_settings().admission_enabled,
+            "rate_limited": self.rate_limited,
+            "queues": {kind: q.stats() for kind, q in self.queues.items()},
+        }
+
+
+_admission: Optional[Admission] = None
+
+
+def get_admission() -> Admission:
+    global _admission
+    if _admission is None:
+        _admission = Admission()
+    return _admission
+
+
+def reset_admission():
+    """Forget buckets and queues (tests / settings changes)."""
+    global _admission
+    _admission = None
+
+
+@asynccontextmanager
+async def http_slot(kind: str, tenant_id: int):
+    """get_admission().slot() for HTTP handlers: a rejection becomes a 429."""
+    try:
+        async with get_admission().slot(kind, tenant_id):
+            yield
+    except AdmissionRejected as exc:
+        raise exc.http()
+
+
+def admit(kind: str):
+    """Route dependency: the caller's token and a *kind* slot, or 401 / 429."""
+
+    async def _admit(user: Principal = Depends(current_principal)):
+        async with http_slot(kind, user.tenant_id):
+            yield
+
+    return _admit
@@ -0,0 +1,295 @@
+"""
+audio.py – bounded-memory ingestion and decoding of uploaded audio.
+
+• Uploads are consumed chunk by chunk with a hard byte cap (HTTP 413) and
+  spooled to a temp file past audio_spool_bytes instead of living in RAM
+• Duration cap is checked from the file header before any decoding
+• Decoding is block-wise through SoundFile into one reused block buffer:
+  mono downmix in place, anti-aliasing low-pass and streaming linear
+  resample to Whisper's 16 kHz, written straight into the preallocated
+  float32 output
+• Outputs longer than audio_mmap_seconds are backed by a memory-mapped
+  temp file rather than anonymous memory
+• trim_silence() is a vectorised voice-activity detector (frame energy
+  against the clip's noise floor, plus zero-crossing rate): silence is cut
+  before Whisper, clips with no speech never reach it, and long speech is
+  split at pauses into segments that can be transcribed in parallel
+• numpy / soundfile are imported on first decode, not with the module,
+  so workers that never see audio don't pay for them
+"""
+
+import math
+import tempfile
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, BinaryIO, Optional
+
+from fastapi import HTTPException
+
+from .config import get_settings
+
+if TYPE_CHECKING:
+    import numpy as np
+
+WHISPER_SR = 16_000
+
+
+class AudioSink:
+    """Write-only spool for incoming audio chunks, capped at audio_max_bytes."""
+
+    def __init__(self):
+        cfg = get_settings()
+        self.limit = cfg.audio_max_bytes
+        self.size = 0
+        self.file = tempfile.SpooledTemporaryFile(max_size=cfg.audio_spool_bytes)
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.limit:
+            raise HTTPException(413, f"Audio larger than {self.limit} bytes")
+        self.file.write(chunk)
+
+    def close(self):
+        self.file.close()
+
+
+async def capped(stream: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    """Pass *stream* through, raising 413 as soon as it exceeds *limit* bytes."""
+    total = 0
+    async for chunk in stream:
+        total += len(chunk)
+        if total > limit:
+            raise HTTPException(413, f"Audio larger than {limit} bytes")
+        yield chunk
+
+
+class _LinearResampler:
+    """
+    Block-streaming linear interpolation from sr_in to sr_out.  When
+    downsampling, a windowed-sinc low-pass just under the output Nyquist
+    runs first, so content above it (fricatives, hiss) is removed instead
+    of folding back into the speech band.  Its delay is compensated, and
+    flush() drains the samples it still holds at the end of the stream.
+    """
+
+    def __init__(self, sr_in: int, sr_out: int):
+        import numpy as np
+
+        self.step = sr_in / sr_out  # input samples per output sample
+        self.t = 0.0                # next output position, global input index
+        self.base = 0               # global index of the current block's first sample
+        self.prev: Optional["np.float32"] = None
+        self.taps: Optional["np.ndarray"] = None
+        self.hist: Optional["np.ndarray"] = None  # the low-pass's last n - 1 inputs
+        self.delay = 0
+        if self.step > 1.0:
+            n = int(32 * self.step) | 1  # odd: linear phase, whole-sample delay
+            fc = 0.45 / self.step  # cycles per input sample: 90 % of the output Nyquist
+            k = np.arange(n) - (n - 1) / 2
+            taps = np.sinc(2 * fc * k) * np.hamming(n)
+            self.taps = (taps / taps.sum()).astype("float32")
+            self.delay = (n - 1) // 2
+            self.t = float(self.delay)  # filtered sample i is input sample i - delay
+
+    @staticmethod
+    def _mirror(edge: "np.float32", side: "np.ndarray", n: int) -> "np.ndarray":
+        """*n* samples beyond *edge*: *side* reflected through it (odd extension)."""
+        import numpy as np
+
+        side = np.pad(side[:n], (0, max(0, n - len(side))), mode="edge")
+        return (2 * edge - side).astype("float32")
+
+    def _filter(self, x: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+
+        if self.hist is None:  # start of stream: no step from silence into the signal
+            self.hist = self._mirror(x[0], x[1:], len(self.taps) - 1)[::-1]
+        z = np.concatenate((self.hist, x))
+        self.hist = z[len(x):]  # the last n - 1 inputs, for the next block
+        return np.convolve(z, self.taps, mode="valid").astype("float32", copy=False)
+
+    def process(self, x: "np.ndarray", out: "np.ndarray") -> int:
+        import numpy as np
+
+        n = len(x)
+        if self.step == 1.0:
+            out[:n] = x
+            return n
+        if self.taps is not None:
+            x = self._filter(x)
+        last = self.base + n - 1
+        count = int((last - self.t) // self.step) + 1 if self.t <= last else 0
+        count = min(count, len(out))
+        if count:
+            ts = self.t + self.step * np.arange(count)
+            if self.prev is None:
+                xp, offset = x, self.base
+            else:
+                xp, offset = np.concatenate(([self.prev], x)), self.base - 1
+            np.subtract(ts, offset, out=ts)
+            out[:count] = np.interp(ts, np.arange(len(xp)), xp)
+        self.t += count * self.step
+        self.base += n
+        self.prev = x[-1]
+        return count
+
+    def flush(self, out: "np.ndarray") -> int:
+        """Output still held back by the low-pass's delay."""
+        if self.hist is None:
+            return 0  # no low-pass, or nothing came in
+        return self.process(self._mirror(self.hist[-1], self.hist[-2::-1], self.delay), out)
+
+
+def _alloc(n: int) -> "np.ndarray":
+    import numpy as np
+
+    if n > get_settings().audio_mmap_seconds * WHISPER_SR:
+        backing = tempfile.TemporaryFile()
+        backing.truncate(n * 4)
+        return np.memmap(backing, dtype="float32", mode="w+", shape=(n,))
+    return np.empty(n, dtype="float32")
+
+
+def decode_for_whisper(fh: BinaryIO) -> "np.ndarray":
+    """
+    Decode WAV/MP3 from a seekable file object into mono float32 @ 16 kHz.
+    Raises HTTPException 400 (undecodable) or 413 (too long).
+    """
+    import numpy as np
+    import soundfile as sf
+
+    cfg = get_settings()
+    fh.seek(0)
+    try:
+        snd = sf.SoundFile(fh)
+    except Exception as exc:
+        raise HTTPException(400, f"Bad audio: {exc}")
+
+    with snd:
+        sr, channels, frames = snd.samplerate, snd.channels, snd.frames
+        if frames / sr > cfg.audio_max_seconds:
+            raise HTTPException(
+                413, f"Audio longer than {cfg.audio_max_seconds:g} s"
+            )
+        out = _alloc(math.ceil(frames * WHISPER_SR / sr) + 1)
+        block = np.empty((cfg.audio_block_frames, channels), dtype="float32")
+        resampler = _LinearResampler(sr, WHISPER_SR)
+        pos = 0
+        try:
+            # block's shape sets the block size; soundfile rejects both at once
+            for chunk in snd.blocks(dtype="float32", always_2d=True, out=block):
+                mono = chunk[:, 0]  # view into the reused block buffer
+                for c in range(1, channels):
+                    np.add(mono, chunk[:, c], out=mono)
+                if channels > 1:
+                    mono *= 1.0 / channels
+                pos += resampler.process(mono, out[pos:])
+            pos += resampler.flush(out[pos:])
+        except Exception as exc:
+            raise HTTPException(400, f"Bad audio: {exc}")
+    return out[:pos]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Voice-activity detection
+# ──────────────────────────────────────────────────────────────────────────────
+@dataclass
+class SpeechCut:
+    """What is left of a clip for Whisper once the silence is cut out."""
+
+    segments: list  # float32 arrays, each at most vad_max_segment_s long
+    kept: int  # samples across all segments
+    total: int  # samples in the decoded clip
+
+    @property
+    def trimmed_ratio(self) -> float:
+        return 1.0 - self.kept / self.total if self.total else 0.0
+
+
+def speech_frames(clip: "np.ndarray", frame: int) -> "np.ndarray":
+    """
+    Boolean speech flag per *frame*-sample frame of *clip*.
+
+    A frame is speech when its energy clears the clip's own noise floor
+    (10th percentile of frame energy) by vad_margin_db, or is quieter by
+    up to half the margin but crosses zero often, as fricatives do.  The
+    threshold is clamped to [vad_floor_db, vad_ceiling_db] dBFS so a clip
+    that is speech throughout still counts as speech.
+    """
+    import numpy as np
+
+    cfg = get_settings()
+    n = len(clip) // frame
+    frames = np.asarray(clip[: n * frame]).reshape(n, frame)  # a view, no copy
+    power = np.einsum("ij,ij->i", frames, frames) / frame
+    db = 10.0 * np.log10(power + 1e-12)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(frame - 1, 1)
+
+    floor = np.percentile(db, 10) if n else 0.0
+    loud = np.clip(floor + cfg.vad_margin_db, cfg.vad_floor_db, cfg.vad_ceiling_db)
+    soft = np.clip(floor + cfg.vad_margin_db / 2, cfg.vad_floor_db, cfg.vad_ceiling_db)
+    return (db > loud) | ((db > soft) & (zcr > cfg.vad_zcr_min))
+
+
+def speech_runs(speech: "np.ndarray", min_frames: int, pad: int) -> "np.ndarray":
+    """
+    [start, end) frame ranges of speech, shape (k, 2): runs shorter than
+    *min_frames* dropped, the rest widened by *pad* frames each side and
+    merged where they then touch.
+    """
+    import numpy as np
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype("int8"), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = ends - starts >= min_frames
+    starts = np.maximum(starts[keep] - pad, 0)
+    ends = np.minimum(ends[keep] + pad, len(speech))
+    if not len(starts):
+        return np.empty((0, 2), dtype="int64")
+    # runs are sorted and padded alike, so a run opens a group unless it
+    # overlaps the previous one, and the group ends where its last run does
+    opens = np.concatenate(([True], starts[1:] > ends[:-1]))
+    last = np.concatenate((np.flatnonzero(opens)[1:] - 1, [len(starts) - 1]))
+    return np.stack((starts[opens], ends[last]), axis=1)
+
+
+def trim_silence(clip: "np.ndarray", sr: int = WHISPER_SR) -> SpeechCut:
+    """
+    Cut the silence out of *clip* before it goes to Whisper.
+
+    Speech runs are concatenated into segments of at most
+    vad_max_segment_s, split only at pauses (a single run longer than that
+    is cut hard), so the segments can be transcribed independently.  No
+    speech at all → no segments.  With vad_enabled off the clip is passed
+    through whole.
+    """
+    import numpy as np
+
+    cfg = get_settings()
+    total = len(clip)
+    if not cfg.vad_enabled:
+        return SpeechCut([clip], total, total)
+
+    frame = max(1, int(sr * cfg.vad_frame_ms / 1000))
+    runs = speech_runs(
+        speech_frames(clip, frame),
+        min_frames=math.ceil(cfg.vad_min_speech_ms / cfg.vad_frame_ms),
+        pad=round(cfg.vad_pad_ms / cfg.vad_frame_ms),
+    ) * frame
+    if len(runs) and runs[-1, 1] == (total // frame) * frame:
+        runs[-1, 1] = total  # the partial frame at the end belongs to the run
+    max_len = int(cfg.vad_max_segment_s * sr)
+
+    segments, parts, length = [], [], 0
+    for start, end in runs.tolist():
+        if parts and length + end - start > max_len:
+            segments.append(np.concatenate(parts))
+            parts, length = [], 0
+        while end - start > max_len:  # one run longer than a segment
+            segments.append(clip[start:start + max_len])
+            start += max_len
+        parts.append(clip[start:end])
+        length += end - start
+    if parts:
+        segments.append(parts[0] if len(parts) == 1 else np.concatenate(parts))
+    return SpeechCut(segments, sum(len(s) for s in segments), total)
@@ -1,3 +1,5 @@
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -5,21 +7,20 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.hash import bcrypt
+from sqlalchemy import event
 
-from sqlmodel import Session, select
+from sqlmodel import Session
+from .cache import TTLCache
 from .models import User, _engine
 from .config import get_settings
+from .metrics import timed
+from .passwords import hash_password
 
 oauth_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
-def _session():
-    with Session(_engine()) as s:
-        yield s
-
-
 def hash_pw(pw: str) -> str:
-    return bcrypt.hash(pw)
+    return hash_password(pw)  # cost from the passwords.py policy
 
 
 def verify_pw(pw: str, pw_hash: str) -> bool:
@@ -36,21 +37,120 @@ def create_token(user_id: int, tenant_id: int) -> str:
     return jwt.encode(payload, cfg.jwt_secret, algorithm=cfg.jwt_algorithm)
 
 
-def current_user(
-    token: str = Depends(oauth_scheme), session: Session = Depends(_session)
-) -> User:
+@dataclass(frozen=True)
+class Principal:
+    """Verified token claims – enough for handlers that only scope by tenant."""
+
+    user_id: int
+    tenant_id: int
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Caches: token → claims (until the token expires) and user id → User (TTL)
+# ──────────────────────────────────────────────────────────────────────────────
+_claims: Optional[TTLCache[Principal]] = None
+_users: Optional[TTLCache[User]] = None
+
+
+def _claims_cache() -> TTLCache[Principal]:
+    global _claims
+    if _claims is None:
+        cfg = get_settings()
+        _claims = TTLCache(cfg.auth_claims_cache_size, cfg.jwt_exp_minutes * 60)
+    return _claims
+
+
+def _user_cache() -> TTLCache[User]:
+    global _users
+    if _users is None:
+        cfg = get_settings()
+        _users = TTLCache(cfg.auth_user_cache_size, cfg.auth_user_cache_ttl_s)
+    return _users
+
+
+def invalidate_user(user_id: int):
+    """Forget the cached record for *user_id* (call after out-of-band edits)."""
+    if _users is not None:
+        _users.pop(user_id)
+
+
+def clear_auth_caches():
+    global _claims, _users
+    _claims = _users = None
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(_mapper, _conn, target: User):
+    # ORM writes through this process invalidate automatically
+    invalidate_user(target.id)
+
+
+def principal_from_token(token: str) -> Optional[Principal]:
+    """Verify *token* and return its claims; None if invalid or expired."""
     cfg = get_settings()
-    cred_exc = HTTPException(
+    cache = _claims_cache() if cfg.auth_cache_enabled else None
+    if cache is not None:
+        principal = cache.get(token)
+        if principal is not None:
+            return principal
+    try:
+        with timed("auth_decode"):
+            payload = jwt.decode(token, cfg.jwt_secret, algorithms=[cfg.jwt_algorithm])
+        principal = Principal(int(payload.get("sub")), int(payload.get("tenant")))
+    except (JWTError, TypeError, ValueError):
+        return None
+    if cache is not None:
+        # never outlive the token itself
+        expires_at = time.monotonic() + (payload["exp"] - time.time())
+        cache.put(token, principal, expires_at=expires_at)
+    return principal
+
+
+def _load_user(user_id: int) -> Optional[User]:
+    # short-lived session: a yield-dependency would hold its pooled
+    # connection until the response is sent, i.e. across the LLM call
+    with timed("user_lookup"), Session(_engine()) as session:
+        return session.get(User, user_id)
+
+
+def user_from_token(token: str) -> Optional[User]:
+    """Decode *token* and load its user; None if invalid or unknown."""
+    principal = principal_from_token(token)
+    if principal is None:
+        return None
+    if not get_settings().auth_cache_enabled:
+        return _load_user(principal.user_id)
+    cache = _user_cache()
+    user = cache.get(principal.user_id)
+    if user is None:
+        user = _load_user(principal.user_id)
+        if user is not None:
+            cache.put(principal.user_id, user)
+    return user
+
+
+def _unauthorized() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid auth",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, cfg.jwt_secret, algorithms=[cfg.jwt_algorithm])
-        user_id: str = payload.get("sub")
-    except JWTError:
-        raise cred_exc
-    user = session.get(User, int(user_id))
+
+
+def current_user(token: str = Depends(oauth_scheme)) -> User:
+    user = user_from_token(token)
     if not user:
-        raise cred_exc
+        raise _unauthorized()
     return user
+
+
+def current_principal(token: str = Depends(oauth_scheme)) -> Principal:
+    """
+    Claims-only auth: no database round trip.  A deleted user keeps access
+    until their token expires, so use current_user where that matters.
+    """
+    principal = principal_from_token(token)
+    if principal is None:
+        raise _unauthorized()
+    return principal
@@ -0,0 +1,142 @@
+"""
+catalog.py – in-memory concept catalog and item-bank index.
+
+• Concepts (one SELECT) and the JSON item bank are loaded once into an
+  immutable Catalog with indexes by id, label, domain and grade
+• The engine resolves concepts and picks items from it with no database
+  round trip; the indexes are plain dict/tuple lookups
+• Refreshes happen on a version bump (bump_catalog(), e.g. after seeding
+  or an item-bank deploy), never per request: readers keep whatever
+  Catalog they grabbed, the swap is a single reference assignment
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from sqlmodel import Session, select
+
+from .config import get_settings
+from .models import Concept, _engine
+
+log = logging.getLogger(__name__)
+
+DEFAULT_ITEM_BANK = os.path.join(os.path.dirname(__file__), "data", "item_bank.json")
+
+
+@dataclass(frozen=True)
+class ConceptEntry:
+    id: int
+    domain: str
+    label: str
+    grade: str
+
+
+@dataclass(frozen=True)
+class Item:
+    id: str
+    concept: str  # concept label
+    prompt: str
+    answer: str
+
+
+@dataclass(frozen=True)
+class Catalog:
+    version: int
+    item_bank_version: int
+    by_id: Mapping[int, ConceptEntry]
+    by_label: Mapping[str, ConceptEntry]
+    by_domain: Mapping[str, tuple[ConceptEntry, ...]]
+    by_grade: Mapping[str, tuple[ConceptEntry, ...]]
+    items_by_id: Mapping[str, Item]
+    items_by_concept: Mapping[str, tuple[Item, ...]] = field(repr=False)
+
+    def concept(self, label: str) -> Optional[ConceptEntry]:
+        return self.by_label.get(label)
+
+    def items(self, label: str) -> tuple[Item, ...]:
+        return self.items_by_concept.get(label, ())
+
+    def pick_item(
+        self, label: str, rng: Optional[random.Random] = None
+    ) -> Optional[Item]:
+        items = self.items(label)
+        if not items:
+            return None
+        return (rng or random).choice(items)
+
+
+def _group(entries, key) -> Mapping:
+    out: dict = {}
+    for entry in entries:
+        out.setdefault(key(entry), []).append(entry)
+    return MappingProxyType({k: tuple(v) for k, v in out.items()})
+
+
+def _load_item_bank(path: str) -> tuple[int, list[Item]]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            raw = json.load(fh)
+    except FileNotFoundError:
+        log.warning("item bank %s not found; catalog has no items", path)
+        return 0, []
+    return int(raw.get("version", 0)), [Item(**item) for item in raw.get("items", [])]
+
+
+def build_catalog(version: int) -> Catalog:
+    """Read concepts + item bank and freeze them into a Catalog."""
+    with Session(_engine()) as session:
+        rows = session.exec(select(Concept)).all()
+    concepts = [ConceptEntry(c.id, c.domain, c.label, c.grade) for c in rows]
+    bank_version, items = _load_item_bank(get_settings().item_bank_path or DEFAULT_ITEM_BANK)
+    return Catalog(
+        version=version,
+        item_bank_version=bank_version,
+        by_id=MappingProxyType({c.id: c for c in concepts}),
+        by_label=MappingProxyType({c.label: c for c in concepts}),
+        by_domain=_group(concepts, lambda c: c.domain),
+        by_grade=_group(concepts, lambda c: c.grade),
+        items_by_id=MappingProxyType({i.id: i for i in items}),
+        items_by_concept=_group(items, lambda i: i.concept),
+    )
+
+
+_catalog: Optional[Catalog] = None
+_version = 0
+_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    global _catalog
+    catalog = _catalog
+    if catalog is None:
+        with _lock:
+            if _catalog is None:
+                _catalog = build_catalog(_version)
+            catalog = _catalog
+    return catalog
+
+
+def bump_catalog() -> Catalog:
+    """Concepts or the item bank changed: rebuild and publish a new version."""
+    global _catalog, _version
+    with _lock:
+        _version += 1
+        _catalog = build_catalog(_version)
+        log.info(
+            "catalog v%d: %d concepts, %d items",
+            _version, len(_catalog.by_id), len(_catalog.items_by_id),
+        )
+        return _catalog
+
+
+def reset_catalog():
+    """Drop the cached catalog; the next get_catalog() reloads it."""
+    global _catalog
+    with _lock:
+        _catalog = None
@@ -1,4 +1,6 @@
 from functools import lru_cache
+from typing import Optional
+
 from pydantic import BaseSettings
 
 
@@ -8,6 +10,145 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_exp_minutes: int = 60
 
+    # Auth caches (decoded claims per token, User rows per id)
+    auth_cache_enabled: bool = True
+    auth_claims_cache_size: int = 10_000
+    auth_user_cache_size: int = 1024
+    auth_user_cache_ttl_s: float = 60.0  # bounds staleness of out-of-band edits
+
+    # Password hashing
+    auth_hash_workers: int = 2  # dedicated bcrypt threads
+    auth_hash_max_queue: int = 64  # waiting hashes before we answer 503
+    auth_bcrypt_rounds: int = 12  # used unless calibrated
+    auth_bcrypt_target_ms: float = 0.0  # >0 → calibrate cost at startup
+    auth_bcrypt_min_rounds: int = 10  # calibration never goes below this
+
+    # Metrics
+    metrics_enabled: bool = True  # request middleware + GET /metrics
+    metrics_server_timing: bool = False  # Server-Timing header on every response
+    metrics_token: Optional[str] = None  # if set, /metrics wants "Bearer <token>"
+
+    # DB pool (ignored for in-memory SQLite, which uses a single connection)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_recycle: int = 1800  # seconds; keeps us under server idle timeouts
+    db_pool_timeout: float = 30.0
+    db_pool_pre_ping: bool = True  # Postgres only
+    db_sqlite_wal: bool = True  # WAL + synchronous=NORMAL on file DBs
+    db_stats_public: bool = False  # expose /health/db without an admin login
+
+    # Tenant shards (shards.py); "default" is DATABASE_URL and holds the directory
+    db_shards: dict[str, str] = {}  # extra shards, name → URL (Postgres schema: ?options=-csearch_path%3D…)
+    db_new_tenant_shards: list[str] = []  # signups go round-robin over these; empty → default
+    db_shard_cache_size: int = 100_000  # tenant → shard entries kept in memory
+    db_shard_cache_ttl_s: float = 60.0  # how long other workers may miss a move
+
+    # GET /learners
+    learners_page_size: int = 100  # when the request gives no limit
+    learners_max_page_size: int = 1000
+
+    # Roster import (POST /learners/import)
+    roster_max_bytes: int = 20 * 1024 * 1024  # 413 beyond this
+    roster_spool_bytes: int = 1024 * 1024  # uploads above this go to a temp file
+    roster_inline_bytes: int = 256 * 1024  # bigger uploads become a background job (202)
+    roster_batch_rows: int = 1000  # learners per INSERT transaction
+    roster_max_errors: int = 100  # row errors kept per import
+    roster_job_ttl_s: float = 3600.0  # finished jobs stay queryable this long
+
+    # Concept catalog
+    item_bank_path: Optional[str] = None  # JSON item bank; default data/item_bank.json
+
+    # Conversation memory
+    memory_enabled: bool = True
+    memory_token_budget: int = 1200  # whole prompt: system + summary + turns + input
+    memory_recent_turns: int = 8  # messages kept verbatim; older ones get summarised
+    memory_summary_tokens: int = 200
+    memory_max_learners: int = 10_000  # sessions kept in memory (LRU)
+    memory_idle_ttl_s: float = 3600.0
+
+    # LLM reply cache
+    reply_cache_enabled: bool = True
+    reply_cache_ttl_s: float = 24 * 3600.0
+    reply_cache_max_entries: int = 50_000
+    reply_cache_max_bytes: int = 32 * 1024 * 1024
+    reply_cache_max_history_turns: int = 2  # earlier exchanges a cacheable prompt may replay
+    reply_cache_tenant_cache_size: int = 10_000  # opt-out flags kept in memory
+    reply_cache_tenant_ttl_s: float = 60.0  # bounds staleness of opt-out changes
+
+    # Moderation (safety layer)
+    moderation_enabled: bool = True
+    moderation_backend: Optional[str] = None  # "module:factory"; default OpenAI moderation
+    moderation_lexicon_path: Optional[str] = None  # default data/moderation_lexicon.json
+    moderation_timeout_s: float = 2.0  # per attempt; one retry
+    moderation_fail_closed: bool = True  # backend down → treat text as flagged
+    moderation_cache_size: int = 50_000  # remote verdicts by content hash
+    moderation_cache_ttl_s: float = 24 * 3600.0
+
+    # Progress write-behind
+    progress_flush_max: int = 200  # buffered attempts that trigger a flush
+    progress_flush_interval_s: float = 0.5
+
+    # LLM gateway
+    openai_base_url: Optional[str] = None  # e.g. http://127.0.0.1:8787/v1 (fake LLM)
+    llm_timeout_s: float = 8.0  # per attempt
+    llm_deadline_s: float = 15.0  # whole call incl. retries
+    llm_max_retries: int = 2
+    llm_backoff_s: float = 0.25  # doubled per retry, ±50 % jitter
+    llm_max_connections: int = 100
+    llm_stub_token_delay_s: float = 0.0  # pace of the offline stub stream
+
+    # Admission control (admission.py): rate per tenant by plan, fair queue per kind
+    admission_enabled: bool = True
+    admission_rate: dict[str, float] = {"free": 0.5, "family": 1.0, "school": 20.0}  # units/s
+    admission_burst: dict[str, float] = {"free": 20.0, "family": 40.0, "school": 400.0}
+    admission_weight: dict[str, float] = {"free": 1.0, "family": 2.0, "school": 8.0}
+    admission_cost: dict[str, float] = {"llm": 1.0, "stt": 2.0, "tts": 0.5}  # units per request
+    admission_slots: dict[str, int] = {"llm": 64, "stt": 8, "tts": 32}  # running at once
+    admission_max_queue: int = 256  # waiting per kind before 429
+    admission_max_queue_per_tenant: int = 32
+    admission_max_wait_s: float = 10.0  # queued longer → 429
+    admission_default_plan: str = "free"  # plans without admission settings of their own
+    admission_plan_cache_ttl_s: float = 60.0
+    admission_stats_public: bool = False  # expose /health/admission without an admin login
+
+    # Speech-to-text pool
+    stt_executor: str = "process"  # process | thread
+    stt_workers: int = 0  # 0 → os.cpu_count()
+    stt_threads_per_worker: int = 1  # torch threads inside each worker
+    stt_preload: bool = False  # spawn workers + load the model at startup
+    startup_warm_audio: bool = False  # import numpy/soundfile at startup, not on first audio
+    stt_model_name: str = "tiny"
+    stt_model_loader: Optional[str] = None  # "module:factory" stand-in for Whisper
+    stt_max_queue: int = 32  # clips in flight before we answer 503
+    stt_batch_window_ms: float = 15.0
+    stt_batch_max: int = 4
+    stt_batch_max_seconds: float = 15.0  # longer clips are never batched
+
+    # Audio ingestion
+    audio_max_bytes: int = 50 * 1024 * 1024  # 413 beyond this
+    audio_max_seconds: float = 900.0  # 413 beyond this (checked from the header)
+    audio_spool_bytes: int = 1024 * 1024  # uploads above this go to a temp file
+    audio_block_frames: int = 65_536  # decode block size
+    audio_mmap_seconds: float = 120.0  # longer decoded clips are memory-mapped
+
+    # Voice-activity detection before STT (audio.trim_silence)
+    vad_enabled: bool = True
+    vad_frame_ms: float = 30.0
+    vad_margin_db: float = 12.0  # speech: this far above the clip's noise floor…
+    vad_floor_db: float = -55.0  # …but never quieter than this (dBFS)…
+    vad_ceiling_db: float = -35.0  # …and always when louder than this
+    vad_zcr_min: float = 0.3  # zero crossings per sample that mark a soft fricative
+    vad_min_speech_ms: float = 90.0  # shorter bursts are clicks, not speech
+    vad_pad_ms: float = 200.0  # kept either side of speech so word edges survive
+    vad_max_segment_s: float = 30.0  # longer speech is split at pauses (one Whisper window)
+
+    # Text-to-speech cache
+    tts_synthesizer: Optional[str] = None  # "module:factory"; default edge-tts
+    tts_cache_dir: str = ".cache/tts"
+    tts_cache_disk_bytes: int = 512 * 1024 * 1024
+    tts_cache_mem_bytes: int = 32 * 1024 * 1024
+    tts_cache_mem_item_bytes: int = 512 * 1024  # bigger clips stay disk-only
+
     class Config:
         env_file = ".env"
 
@@ -1,23 +1,54 @@
 """
 engine.py – minimal tutoring engine for MVP.
 • Builds a persona-based system prompt
-• Calls GPT-4o-mini *only if* OPENAI_API_KEY is present
-• Records simple progress (#attempts / #correct) for one starter concept
+• Calls GPT-4o-mini *only if* OPENAI_API_KEY is present (via llm.py gateway)
+• Records simple progress (#attempts / #correct) for one starter concept,
+  through the write-behind recorder in progress.py
+• Concepts and practice items come from the in-memory catalog (catalog.py)
+• Recent turns + a rolling summary are replayed within a token budget
+  (memory.py)
+• Replies to early-turn prompts are cached per (model, system prompt,
+  history, utterance) in reply_cache.py; the practice item in the prompt
+  is picked from the utterance, not at random, so identical turns build
+  identical prompts
+• stream_tutor_reply() yields tokens as they arrive (SSE / WebSocket routes)
+• Every reply is moderated before the learner sees it (moderation.py);
+  replies are checked sentence by sentence while the LLM keeps generating
+  – tutor_reply() streams too and joins the tokens – so the check adds
+  roughly one sentence's verdict, not a second round trip after the
+  whole reply
 """
 
-import os
-from dotenv import load_dotenv
-load_dotenv(override=True)
-from sqlmodel import Session, select
-from .models import _engine, Learner, Concept, Progress
+import asyncio
+import re
+import zlib
+from collections import deque
+from typing import AsyncIterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+from .models import _engine, Learner, Concept
+from .catalog import bump_catalog, get_catalog
+from .config import get_settings
+from .llm import STUB_REPLY, get_gateway, stub_stream
+from .memory import get_memory
+from .metrics import timed
+from .moderation import SAFE_FALLBACK, get_moderator
+from .progress import get_progress_recorder
+from .reply_cache import cache_key, get_reply_cache, normalize
+from .shards import tenant_session
 
 OPENAI_MODEL = "gpt-4o-mini"  # inexpensive and capable
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Prompt helpers
 # ──────────────────────────────────────────────────────────────────────────────
+def _grade(learner: Learner) -> str:
+    return "K" if int(learner.dob[:4]) >= 2018 else "6"  # ~7 yrs old
+
+
 def build_system_prompt(learner: Learner) -> str:
-    if int(learner.dob[:4]) >= 2018:  # ~7 yrs old
+    if _grade(learner) == "K":
         return (
             "You are a friendly kindergarten math tutor. "
             "Use very short sentences and emojis."
@@ -39,65 +70,218 @@ STARTER_CONCEPTS = [
 
 
 def seed_concepts():
+    # one read builds the catalog and tells us what is missing
+    catalog = bump_catalog()
+    missing = [c for c in STARTER_CONCEPTS if c[1] not in catalog.by_label]
+    if not missing:
+        return
     with Session(_engine()) as s:
-        if s.exec(select(Concept)).first():
-            return
-        for domain, label, grade in STARTER_CONCEPTS:
+        for domain, label, grade in missing:
             s.add(Concept(domain=domain, label=label, grade=grade))
         s.commit()
+    bump_catalog()
 
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Tutor main entry
 # ──────────────────────────────────────────────────────────────────────────────
-def _gpt_reply(messages: list[dict[str, str]]) -> str:
+async def _gpt_reply(
+    messages: list[dict[str, str]], tenant_id: Optional[int] = None
+) -> str:
     """
-    Return GPT reply *or* a stub if OPENAI_API_KEY is missing (CI safety).
+    Return the moderated GPT reply *or* a stub if OPENAI_API_KEY is missing
+    (CI safety) or the gateway gave up (timeout / upstream errors).  The
+    completion is streamed through the safety stage, so moderation runs
+    while the LLM is still generating instead of after it.
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        # CI / offline fallback
-        return "OK, let's keep going!"
-
-    from openai import OpenAI  # local import so module loads without key
-    client = OpenAI(api_key=api_key)
-    print("DEBUG-KEY-START", api_key[:12], "...", api_key[-6:], "DEBUG-KEY-END")
-
-    resp = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=messages,
-        max_tokens=150,
+    async with timed("llm"):
+        tokens = get_gateway().stream_chat(
+            messages, model=OPENAI_MODEL, tenant_id=tenant_id, max_tokens=150, strict=True
+        )
+        try:
+            reply = "".join([t async for t in _safety_stage(tokens, tenant_id)]).strip()
+        except Exception:  # noqa: BLE001 – cut off mid-reply; logged by the gateway
+            return STUB_REPLY
+    # nothing has been shown yet, so a withheld sentence withholds it all
+    return SAFE_FALLBACK if reply.endswith(SAFE_FALLBACK) else reply
+
+
+async def _reply_cache_key(
+    messages: list[dict[str, str]], tenant_id: Optional[int]
+) -> Optional[str]:
+    key = cache_key(OPENAI_MODEL, messages)
+    if key is None or not await get_reply_cache().enabled_for(tenant_id):
+        return None
+    return key
+
+
+async def _cached_reply(
+    messages: list[dict[str, str]], tenant_id: Optional[int] = None
+) -> str:
+    """
+    _gpt_reply() behind the reply cache (identical concurrent misses share
+    one call).  Replies are cached moderated; a withheld one is not cached.
+    """
+    key = await _reply_cache_key(messages, tenant_id)
+    if key is None:
+        return await _gpt_reply(messages, tenant_id)
+    return await get_reply_cache().get_or_compute(
+        key, lambda: _gpt_reply(messages, tenant_id)
     )
-    return resp.choices[0].message.content.strip()
 
 
-def tutor_reply(learner_id: int, user_text: str) -> str:
+# ──────────────────────────────────────────────────────────────────────────────
+# Safety stage
+# ──────────────────────────────────────────────────────────────────────────────
+_SEGMENT_END = re.compile(r"[.!?…\n]\s*$")
+
+
+async def _safety_stage(
+    tokens: AsyncIterator[str], tenant_id: Optional[int] = None
+) -> AsyncIterator[str]:
+    """
+    Moderate a token stream without serialising on it.  Each finished
+    sentence gets its own moderation task right away while generation
+    continues; a sentence's tokens are released only once its verdict is
+    in (and in order).  Tokens the local lexicon knows to be safe skip the
+    wait while nothing is held ahead of them, so an everyday reply still
+    streams word by word.  The first flagged sentence ends the reply with
+    SAFE_FALLBACK and closes the LLM stream.
+    """
+    moderator = get_moderator()
+    checks: deque[tuple[asyncio.Task, list[str]]] = deque()
+    spoken: list[str] = []   # current sentence, already released
+    segment: list[str] = []  # current sentence, held for its verdict
+    said = False
+
+    def check():
+        # the verdict covers the whole sentence, released prefix included
+        text = "".join(spoken + segment)
+        checks.append((asyncio.ensure_future(moderator.is_flagged(text, tenant_id)), segment))
+
+    try:
+        async for token in tokens:
+            if not checks and not segment and moderator.lexicon.verdict(token) is False:
+                said = True
+                spoken.append(token)
+                yield token
+            else:
+                segment.append(token)
+            if _SEGMENT_END.search(token):
+                if segment:
+                    check()
+                spoken, segment = [], []
+            while checks and checks[0][0].done():
+                task, parts = checks.popleft()
+                if task.result():
+                    yield f" {SAFE_FALLBACK}" if said else SAFE_FALLBACK
+                    return
+                for part in parts:
+                    said = True
+                    yield part
+        if segment:
+            check()
+        while checks:
+            task, parts = checks.popleft()
+            if await task:
+                yield f" {SAFE_FALLBACK}" if said else SAFE_FALLBACK
+                return
+            for part in parts:
+                said = True
+                yield part
+    finally:
+        for task, _ in checks:
+            task.cancel()
+        aclose = getattr(tokens, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def _load_learner(learner_id: int, tenant_id: Optional[int] = None) -> Optional[Learner]:
+    with tenant_session(tenant_id) as session:
+        return session.get(Learner, learner_id)
+
+
+def _record_attempt(learner_id: int, tenant_id: int, user_text: str) -> None:
+    """Progress write-back (very naive); batched by the progress recorder."""
+    concept = get_catalog().concept("addition within 10")
+    if concept is not None:
+        get_progress_recorder().record(
+            learner_id, concept.id, correct="+" in user_text, tenant_id=tenant_id
+        )
+
+
+def _practice_item(learner: Learner, user_text: str) -> str:
+    catalog = get_catalog()
+    concepts = catalog.by_grade.get(_grade(learner), ())
+    items = [item for c in concepts for item in catalog.items(c.label)]
+    if not items:
+        return ""
+    # varies from turn to turn, yet the same turn always gets the same
+    # prompt, so the reply cache can serve it
+    item = items[zlib.crc32(normalize(user_text).encode()) % len(items)]
+    return f" If it fits the conversation, practise this ({item.concept}): {item.prompt}"
+
+
+def _build_messages(learner: Learner, user_text: str) -> list[dict[str, str]]:
+    system = build_system_prompt(learner) + _practice_item(learner, user_text)
+    if get_settings().memory_enabled:
+        return get_memory().build_messages(learner.id, system, user_text)
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user_text},
+    ]
+
+
+def _remember(learner: Learner, user_text: str, reply: str):
+    if get_settings().memory_enabled:
+        get_memory().append(learner.id, user_text, reply, tenant_id=learner.tenant_id)
+
+
+async def tutor_reply(
+    learner_id: int, user_text: str, tenant_id: Optional[int] = None
+) -> str:
     """Return tutor reply and update simple progress."""
-    with Session(_engine()) as session:
-        learner = session.get(Learner, learner_id)
-        if not learner:
-            return "Learner not found."
-
-        # GPT (or stub) reply
-        messages = [
-            {"role": "system", "content": build_system_prompt(learner)},
-            {"role": "user", "content": user_text},
-        ]
-        reply = _gpt_reply(messages)
-
-        # Progress write-back (very naive)
-        concept = session.exec(
-            select(Concept).where(Concept.label == "addition within 10")
-        ).first()
-        if concept:
-            prog_pk = (learner.id, concept.id)
-            prog = session.get(Progress, prog_pk)
-            if not prog:
-                prog = Progress(learner_id=learner.id, concept_id=concept.id)
-            prog.attempts += 1
-            if "+" in user_text:
-                prog.correct += 1
-            session.add(prog)
-            session.commit()
-
-        return reply
+    # DB work stays on the threadpool; only the LLM round trip is awaited here
+    learner = await run_in_threadpool(_load_learner, learner_id, tenant_id)
+    if not learner:
+        return "Learner not found."
+
+    # GPT (or stub) reply, moderated as it streams in
+    reply = await _cached_reply(_build_messages(learner, user_text), tenant_id)
+
+    _record_attempt(learner.id, learner.tenant_id, user_text)
+    _remember(learner, user_text, reply)
+    return reply
+
+
+async def stream_tutor_reply(
+    learner_id: int, user_text: str, tenant_id: Optional[int] = None
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of tutor_reply(): yields reply tokens as the LLM
+    produces them, each sentence released once moderation has passed it.
+    Progress is written once the stream has finished, so an abandoned
+    stream does not count as an attempt.
+    """
+    learner = await run_in_threadpool(_load_learner, learner_id, tenant_id)
+    if not learner:
+        yield "Learner not found."
+        return
+
+    messages = _build_messages(learner, user_text)
+    key = await _reply_cache_key(messages, tenant_id)
+    cached = get_reply_cache().lookup(key) if key is not None else None
+    tokens = (
+        stub_stream(cached) if cached is not None
+        else get_gateway().stream_chat(
+            messages, model=OPENAI_MODEL, tenant_id=tenant_id, max_tokens=150
+        )
+    )
+    parts = []
+    async for token in _safety_stage(tokens, tenant_id):
+        parts.append(token)
+        yield token
+
+    _record_attempt(learner.id, learner.tenant_id, user_text)
+    _remember(learner, user_text, "".join(parts).strip())
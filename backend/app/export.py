@@ -0,0 +1,116 @@
+"""
+export.py – streaming progress export for the parent / school dashboard.
+
+GET /tenants/me/progress/export?format=csv|ndjson
+
+• Rows come from one Learner ⋈ Progress ⋈ Concept query read through a
+  server-side cursor (stream_results + yield_per), so memory stays flat
+  whatever the tenant's size
+• Output is produced in ~64 KB chunks by a sync generator that
+  StreamingResponse drives from the threadpool
+• With `Accept-Encoding: gzip` the chunks are compressed on the fly
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Iterator
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+
+from . import mastery
+from .auth import Principal, current_principal
+from .models import Concept, Learner, Progress
+from .shards import tenant_session
+
+router = APIRouter(prefix="/tenants/me", tags=["export"])
+
+COLUMNS = (
+    "learner_id", "learner_name", "concept_id", "domain", "concept", "grade",
+    "attempts", "correct", "rolling_accuracy", "mastered",
+)
+FETCH_ROWS = 2000     # rows per cursor fetch
+CHUNK_BYTES = 64 * 1024
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def export_query(tenant_id: int):
+    """Walks ix_progress_tenant_learner in (learner, concept) order – no sort."""
+    return (
+        select(
+            Learner.id, Learner.name, Concept.id, Concept.domain, Concept.label,
+            Concept.grade, Progress.attempts, Progress.correct,
+            Progress.recent_bits, Progress.recent_count, Progress.mastered,
+        )
+        .join(Progress, Progress.learner_id == Learner.id)
+        .join(Concept, Concept.id == Progress.concept_id)
+        .where(Progress.tenant_id == tenant_id, Learner.tenant_id == tenant_id)
+        .order_by(Progress.learner_id, Progress.concept_id)
+        .execution_options(stream_results=True, yield_per=FETCH_ROWS)
+    )
+
+
+def _rows(tenant_id: int) -> Iterator[tuple]:
+    with tenant_session(tenant_id) as session:
+        rows = session.exec(export_query(tenant_id))
+        for lid, name, cid, domain, label, grade, a, c, bits, n, m in rows:
+            yield (lid, name, cid, domain, label, grade, a, c,
+                   round(mastery.accuracy(bits, n), 3), m)
+
+
+def _encode(rows: Iterator[tuple], fmt: str) -> Iterator[bytes]:
+    buf = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buf)
+        writer.writerow(COLUMNS)
+        write = writer.writerow
+    else:
+        def write(row):
+            buf.write(json.dumps(dict(zip(COLUMNS, row)), separators=(",", ":")))
+            buf.write("\n")
+    for row in rows:
+        write(row)
+        if buf.tell() >= CHUNK_BYTES:
+            yield buf.getvalue().encode()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def export_stream(tenant_id: int, fmt: str, gzip: bool = False) -> Iterator[bytes]:
+    chunks = _encode(_rows(tenant_id), fmt)
+    return _gzip(chunks) if gzip else chunks
+
+
+@router.get("/progress/export")
+def export_progress(
+    request: Request, format: str = "csv", user: Principal = Depends(current_principal)
+):
+    """Every Progress row of the tenant as CSV or NDJSON, streamed."""
+    if format not in MEDIA_TYPES:
+        raise HTTPException(400, "format must be csv or ndjson")
+    gzip = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="progress.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_stream(user.tenant_id, format, gzip),
+        media_type=MEDIA_TYPES[format],
+        headers=headers,
+    )
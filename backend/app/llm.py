@@ -0,0 +1,282 @@
+"""
+llm.py – async gateway in front of the OpenAI chat API.
+
+• One long-lived AsyncOpenAI client → HTTP keep-alive / connection reuse
+• No concurrency limit of its own: admission.py bounds in-flight LLM work
+  per tenant by plan (token bucket + the "llm" fair queue) before a
+  request gets here, and llm_max_connections caps the upstream pool
+• Per-attempt timeout inside an overall deadline, retry with exponential
+  backoff + jitter on transient errors
+• Falls back to STUB_REPLY when OPENAI_API_KEY is missing (CI) or when
+  every attempt failed / timed out
+• stream_chat() yields deltas as they arrive; the stub streams too, word by
+  word, so offline tests see the same shape as the real thing
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from typing import AsyncIterator, Optional
+
+from .config import get_settings
+from .metrics import LLM_TOKENS
+
+log = logging.getLogger(__name__)
+
+STUB_REPLY = "OK, let's keep going!"
+
+_retiring: set[asyncio.Task] = set()  # strong refs until stale clients are closed
+
+
+async def stub_stream(text: str = STUB_REPLY) -> AsyncIterator[str]:
+    """Yield *text* word by word (leading space kept, like real deltas)."""
+    delay = get_settings().llm_stub_token_delay_s
+    for token in re.findall(r"\s*\S+", text):
+        if delay:
+            await asyncio.sleep(delay)
+        yield token
+
+
+def _count_usage(model: str, usage) -> None:
+    """Token counters from the API's own usage block (absent on fakes / stubs)."""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    import openai
+
+    return isinstance(
+        exc,
+        (
+            openai.APIConnectionError,  # includes APITimeoutError
+            openai.RateLimitError,
+            openai.InternalServerError,
+        ),
+    )
+
+
+async def _quiet_close(stream):
+    try:
+        await stream.close()
+    except Exception:  # noqa: BLE001 – best effort, the response may be gone
+        pass
+
+
+class LLMGateway:
+    """Shared client + retry policy for chat completions."""
+
+    def __init__(self):
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ── client / per-loop state ──────────────────────────────────────────────
+    def _bind_loop(self):
+        """
+        Clients belong to one event loop.  Uvicorn keeps a single loop, but
+        the TestClient spins one up per request, so drop loop-bound state
+        whenever the running loop changes.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            old_client, old_loop = self._client, self._loop
+            self._loop = loop
+            self._client = None
+            if old_client is not None:
+                self._retire(old_client, old_loop)
+
+    @staticmethod
+    def _retire(client, loop: Optional[asyncio.AbstractEventLoop]):
+        """Close a client left behind by a previous loop (its httpx pool)."""
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.close(), loop)
+            return
+
+        async def _close():
+            try:
+                await client.close()
+            except Exception:  # noqa: BLE001 – transports died with their loop
+                pass
+
+        task = asyncio.get_running_loop().create_task(_close())
+        _retiring.add(task)
+        task.add_done_callback(_retiring.discard)
+
+    def client(self):
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        self._bind_loop()
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI  # local import so module loads without key
+
+            cfg = get_settings()
+            self._client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=cfg.openai_base_url,
+                max_retries=0,  # retries are ours, see chat()
+                timeout=cfg.llm_timeout_s,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=cfg.llm_max_connections,
+                        max_keepalive_connections=cfg.llm_max_connections,
+                    ),
+                    timeout=cfg.llm_timeout_s,
+                ),
+            )
+        return self._client
+
+    # ── calls ────────────────────────────────────────────────────────────────
+    async def chat(
+        self,
+        messages: list[dict[str, str]],
+        *,
+        model: str,
+        tenant_id: Optional[int] = None,
+        max_tokens: int = 150,
+    ) -> str:
+        """Return the completion text, or STUB_REPLY if the LLM is unavailable."""
+        client = self.client()
+        if client is None:
+            return STUB_REPLY  # CI / offline fallback
+
+        cfg = get_settings()
+        deadline = time.monotonic() + cfg.llm_deadline_s
+        for attempt in range(cfg.llm_max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                resp = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=model, messages=messages, max_tokens=max_tokens
+                    ),
+                    timeout=min(cfg.llm_timeout_s, remaining),
+                )
+                _count_usage(model, getattr(resp, "usage", None))
+                return resp.choices[0].message.content.strip()
+            except Exception as exc:  # noqa: BLE001 – we always degrade to the stub
+                if not _retryable(exc):
+                    log.warning("LLM call failed (tenant=%s): %r", tenant_id, exc)
+                    break
+                log.info("LLM attempt %d failed: %r", attempt + 1, exc)
+                backoff = cfg.llm_backoff_s * (2 ** attempt)
+                backoff *= random.uniform(0.5, 1.5)
+                if time.monotonic() + backoff >= deadline:
+                    break
+                await asyncio.sleep(backoff)
+        return STUB_REPLY
+
+    async def stream_chat(
+        self,
+        messages: list[dict[str, str]],
+        *,
+        model: str,
+        tenant_id: Optional[int] = None,
+        max_tokens: int = 150,
+        strict: bool = False,
+    ) -> AsyncIterator[str]:
+        """
+        Yield completion deltas.  Retries only happen before the first
+        delta; once text has reached the caller a failure just ends the
+        stream (we can't take words back) – or, with *strict*, raises, for
+        callers that collect the whole reply and must not keep half of it.
+        """
+        client = self.client()
+        if client is None:
+            async for token in stub_stream():
+                yield token
+            return
+
+        cfg = get_settings()
+        deadline = time.monotonic() + cfg.llm_deadline_s
+        for attempt in range(cfg.llm_max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            started = False
+            stream = None
+            try:
+                stream = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        # usage arrives as a last chunk with no choices
+                        stream_options={"include_usage": True},
+                    ),
+                    timeout=min(cfg.llm_timeout_s, remaining),
+                )
+                chunks = stream.__aiter__()
+                while True:
+                    # the overall deadline covers the body, not just the headers
+                    try:
+                        chunk = await asyncio.wait_for(
+                            chunks.__anext__(),
+                            timeout=max(deadline - time.monotonic(), 0),
+                        )
+                    except StopAsyncIteration:
+                        break
+                    if not chunk.choices:
+                        _count_usage(model, getattr(chunk, "usage", None))
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        started = True
+                        yield delta
+                if started:
+                    return
+                break  # empty completion → stub
+            except Exception as exc:  # noqa: BLE001
+                if started:
+                    log.warning("LLM stream aborted (tenant=%s): %r", tenant_id, exc)
+                    if strict:
+                        raise
+                    return
+                if not _retryable(exc):
+                    log.warning("LLM call failed (tenant=%s): %r", tenant_id, exc)
+                    break
+                log.info("LLM stream attempt %d failed: %r", attempt + 1, exc)
+                backoff = cfg.llm_backoff_s * (2 ** attempt)
+                backoff *= random.uniform(0.5, 1.5)
+                if time.monotonic() + backoff >= deadline:
+                    break
+                await asyncio.sleep(backoff)
+            finally:
+                if stream is not None and hasattr(stream, "close"):
+                    await _quiet_close(stream)  # release the HTTP connection
+        async for token in stub_stream():
+            yield token
+
+    async def aclose(self):
+        if self._client is not None:
+            try:
+                await self._client.close()
+            except RuntimeError:
+                pass  # loop it was bound to is already gone
+        self._client = None
+        self._loop = None
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway()
+    return _gateway
+
+
+async def close_gateway():
+    if _gateway is not None:
+        await _gateway.aclose()
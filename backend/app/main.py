@@ -1,24 +1,120 @@
-from fastapi import FastAPI, Depends, HTTPException
+import json
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 from .models import (
-    init_db,
     Tenant,
     User,
     Learner,
     Concept,    # ← ensures Concept is in scope
     Progress,   # ← ensures Progress is in scope
+    TenantProgress,
     _engine,
+    pool_stats,
+)
+from .auth import (
+    Principal,
+    create_token,
+    current_principal,
+    current_user,
+    user_from_token,
 )
-from .auth import hash_pw, verify_pw, create_token, current_user
-from .schemas import UserCreate, TokenOut, LearnerCreate
+from .schemas import UserCreate, TokenOut, LearnerCreate, TenantSettings
+from .admission import AdmissionRejected, admit, get_admission
 from .voice import router as voice_router
-from .engine import tutor_reply, seed_concepts
+from .export import router as export_router
+from .roster import router as roster_router, shutdown_roster_imports
+from .engine import tutor_reply, stream_tutor_reply, seed_concepts
+from .llm import close_gateway
+from .memory import get_memory
+from .migrations import init_db
+from .stt import get_stt_pool, shutdown_stt_pool
+from .passwords import HashBusy, get_hash_pool, shutdown_hash_pool
+from .progress import get_progress_recorder, shutdown_progress_recorder, touch_tenant
+from .reply_cache import get_reply_cache
+from .shards import (
+    get_router, init_shards, mirror_tenant, register_learners, tenant_engine, tenant_session,
+)
+from .catalog import get_catalog
+from . import mastery, metrics
+from .config import get_settings
+
+log = logging.getLogger(__name__)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Startup / shutdown
+# ──────────────────────────────────────────────────────────────────────────────
+def _load_env():
+    from dotenv import load_dotenv
+
+    load_dotenv()  # .env fills gaps; the real environment wins
+
 
-app = FastAPI(title="LearnPal API")
+def _warm_audio():
+    import numpy  # noqa: F401
+    import soundfile  # noqa: F401
+
+
+# Synchronous init, in order.  Importing this module does none of it; the
+# lifespan (or a script / benchmark) calls run_startup_phases(), and each
+# phase runs once per process however often that happens.
+STARTUP_PHASES = (
+    ("env", _load_env),
+    ("database", init_db),
+    ("concepts", seed_concepts),
+    ("shards", init_shards),
+)
+_done_phases: set[str] = set()
+_phases_lock = threading.Lock()
+
+
+def run_startup_phases() -> dict[str, float]:
+    """Run the phases not done yet; returns {phase: ms} for those."""
+    took: dict[str, float] = {}
+    with _phases_lock:
+        for name, phase in STARTUP_PHASES:
+            if name in _done_phases:
+                continue
+            t0 = time.perf_counter()
+            phase()
+            took[name] = round((time.perf_counter() - t0) * 1000, 1)
+            _done_phases.add(name)
+    return took
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    took = await run_in_threadpool(run_startup_phases)
+    cfg = get_settings()
+    if cfg.auth_bcrypt_target_ms > 0:
+        await get_hash_pool().calibrate()
+    if cfg.startup_warm_audio:
+        await run_in_threadpool(_warm_audio)
+    if cfg.stt_preload:
+        await get_stt_pool().start(warm=True)
+    log.info("startup phases (ms): %s", took)
+    yield
+    await get_memory().drain()  # let pending summaries finish with the gateway
+    await close_gateway()
+    shutdown_stt_pool()
+    shutdown_hash_pool()
+    shutdown_roster_imports()  # a running import finishes first
+    shutdown_progress_recorder()  # durable: buffered attempts reach the DB
+
+
+app = FastAPI(title="LearnPal API", lifespan=lifespan)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # CORS – allow both hosts or use ["*"] in dev                   # type: ignore
@@ -34,11 +130,12 @@ app.add_middleware(  # type: ignore
     allow_headers=["*"],
 )
 
-app.include_router(voice_router)
+if get_settings().metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)  # outermost: times CORS too
 
-# run once at startup
-init_db()
-seed_concepts()
+app.include_router(voice_router)
+app.include_router(export_router)
+app.include_router(roster_router)
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -49,43 +146,104 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/health/db")
+def health_db(user: User = Depends(current_user)):
+    """Connection-pool occupancy and checkout/wait counters (admins only)."""
+    if user.role != "admin" and not get_settings().db_stats_public:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return pool_stats()
+
+
+@app.get("/health/admission")
+def health_admission(user: User = Depends(current_user)):
+    """Admission queues: busy slots, depth per tenant, wait percentiles (admins only)."""
+    if user.role != "admin" and not get_settings().admission_stats_public:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return get_admission().stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    """Prometheus text exposition; optionally behind a static bearer token."""
+    token = get_settings().metrics_token
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid auth")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Auth
 # ──────────────────────────────────────────────────────────────────────────────
-@app.post("/auth/signup", response_model=TokenOut)
-def signup(payload: UserCreate):
+async def _hash(coro):
+    try:
+        return await coro
+    except HashBusy:
+        raise HTTPException(
+            status_code=503, detail="Too many logins, try again", headers={"Retry-After": "1"}
+        )
+
+
+def _create_account(payload: UserCreate, password_hash: str) -> str:
     with Session(_engine()) as session:
         tenant = Tenant(name=payload.tenant_name)
         session.add(tenant)
         session.flush()
+        shard = get_router().place(session, tenant)
 
         user = User(
             tenant_id=tenant.id,
             email=payload.email,
-            password_hash=hash_pw(payload.password),
+            password_hash=password_hash,
         )
         session.add(user)
-        session.commit()
+        try:
+            session.commit()
+        except IntegrityError:  # ix_user_email; the tenant is rolled back too
+            raise HTTPException(status_code=409, detail="Email already registered")
 
-        token = create_token(user.id, tenant.id)
-        return TokenOut(access_token=token)
+        mirror_tenant(tenant, shard)
+        return create_token(user.id, tenant.id)
 
 
-@app.post("/auth/token", response_model=TokenOut)
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
+@app.post("/auth/signup", response_model=TokenOut)
+async def signup(payload: UserCreate):
+    password_hash = await _hash(get_hash_pool().hash(payload.password))
+    token = await run_in_threadpool(_create_account, payload, password_hash)
+    return TokenOut(access_token=token)
+
+
+def _user_by_email(email: str) -> User | None:
+    with Session(_engine()) as session:
+        return session.exec(select(User).where(User.email == email)).first()
+
+
+def _store_hash(user_id: int, password_hash: str):
     with Session(_engine()) as session:
-        user = session.exec(
-            select(User).where(User.email == form_data.username)
-        ).first()
+        user = session.get(User, user_id)
+        if user is not None:
+            user.password_hash = password_hash
+            session.add(user)
+            session.commit()
 
-        if user is None or not verify_pw(form_data.password, user.password_hash):
-            raise HTTPException(
-                status_code=400,
-                detail="Incorrect email or password",
-            )
 
-        token = create_token(user.id, user.tenant_id)
-        return TokenOut(access_token=token)
+@app.post("/auth/token", response_model=TokenOut)
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await run_in_threadpool(_user_by_email, form_data.username)
+    ok, upgraded = (
+        await _hash(get_hash_pool().verify(form_data.password, user.password_hash))
+        if user is not None else (False, None)
+    )
+    if not ok:
+        raise HTTPException(
+            status_code=400,
+            detail="Incorrect email or password",
+        )
+    if upgraded is not None:
+        # stored cost is below the current policy → rehash transparently
+        await run_in_threadpool(_store_hash, user.id, upgraded)
+
+    token = create_token(user.id, user.tenant_id)
+    return TokenOut(access_token=token)
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -93,23 +251,68 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
 # ──────────────────────────────────────────────────────────────────────────────
 @app.post("/learners", status_code=201)
 def create_learner(payload: LearnerCreate, user: User = Depends(current_user)):
+    (learner_id,) = register_learners(user.tenant_id)
     learner = Learner(
+        id=learner_id,
         tenant_id=user.tenant_id,
         name=payload.name,
         dob=payload.dob,
     )
-    with Session(_engine()) as session:
+    with tenant_session(user.tenant_id) as session:
         session.add(learner)
+        touch_tenant(session, user.tenant_id)  # new heat-map row
         session.commit()
         session.refresh(learner)
         return learner
 
 
+LEARNER_FIELDS = ("id", "name", "dob", "persona_json")
+DEFAULT_LEARNER_FIELDS = "id,name,dob"
+
+
+def learner_page_query(tenant_id: int, after: int, limit: int, fields: tuple[str, ...]):
+    """One page of the roster in id order – a range scan of ix_learner_tenant_id_id."""
+    columns = [getattr(Learner, f) for f in fields]
+    return (
+        select(*columns)
+        .where(Learner.tenant_id == tenant_id, Learner.id > after)
+        .order_by(Learner.id)
+        .limit(limit)
+    )
+
+
 @app.get("/learners")
-def list_learners(user: User = Depends(current_user)):
-    with Session(_engine()) as session:
-        stmt = select(Learner).where(Learner.tenant_id == user.tenant_id)
-        return session.exec(stmt).all()
+def list_learners(
+    request: Request,
+    after: int = 0,
+    limit: int = 0,
+    fields: str = DEFAULT_LEARNER_FIELDS,
+    user: Principal = Depends(current_principal),
+):
+    """
+    The tenant's learners in id order, `limit` at a time (keyset
+    pagination: pass the last id seen as `after`).  `fields` picks the
+    columns from LEARNER_FIELDS; `id` is always included.  When more rows
+    follow, a `Link: <…>; rel="next"` header carries the next page's URL.
+    """
+    cfg = get_settings()
+    wanted = ("id",) + tuple(f for f in dict.fromkeys(fields.split(",")) if f and f != "id")
+    unknown = [f for f in wanted if f not in LEARNER_FIELDS]
+    if unknown:
+        raise HTTPException(400, f"unknown fields: {', '.join(unknown)}")
+    limit = min(limit or cfg.learners_page_size, cfg.learners_max_page_size)
+    if limit < 1 or after < 0:
+        raise HTTPException(400, "limit must be >= 1 and after >= 0")
+
+    with tenant_engine(user.tenant_id).connect() as conn:  # Core rows, also for one column
+        # one extra row tells us whether there is a next page
+        rows = conn.execute(learner_page_query(user.tenant_id, after, limit + 1, wanted)).all()
+    items = [dict(zip(wanted, row)) for row in rows[:limit]]
+    headers = {}
+    if len(rows) > limit:
+        next_url = request.url.include_query_params(after=items[-1]["id"], limit=limit)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return JSONResponse(items, headers=headers)
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -124,21 +327,110 @@ def who_am_i(user: User = Depends(current_user)):
 # Progress endpoint
 # ──────────────────────────────────────────────────────────────────────────────
 @app.get("/progress/{learner_id}")
-def learner_progress(learner_id: int, user: User = Depends(current_user)):
-    with Session(_engine()) as s:
+def learner_progress(learner_id: int, user: Principal = Depends(current_principal)):
+    with tenant_session(user.tenant_id) as s:
         learner = s.get(Learner, learner_id)
         if not learner or learner.tenant_id != user.tenant_id:
             raise HTTPException(status_code=403, detail="Forbidden")
 
         stmt = (
-            select(Concept.label, Progress.correct, Progress.attempts)  # type: ignore
+            select(Concept.id, Concept.label, Progress)  # type: ignore
             .join(Progress, Concept.id == Progress.concept_id)
             .where(Progress.learner_id == learner_id)                  # type: ignore
         )
-        return {
-            row.label: {"correct": row.correct, "attempts": row.attempts}
-            for row in s.exec(stmt)
-        }
+        # attempts still buffered in the recorder are added on top
+        with get_progress_recorder().overlay(learner_id) as pending:
+            rows = {row.id: row for row in s.exec(stmt)}
+        out = {}
+        for concept_id in rows.keys() | pending.keys():
+            attempts, correct, bits, count = pending.get(concept_id, (0, 0, 0, 0))
+            row = rows.get(concept_id)
+            if row is not None:
+                label, prog = row.label, row.Progress
+                attempts, correct = attempts + prog.attempts, correct + prog.correct
+                bits, count = mastery.merge(prog.recent_bits, prog.recent_count, bits, count)
+            else:
+                label = s.get(Concept, concept_id).label
+            out[label] = {
+                "correct": correct,
+                "attempts": attempts,
+                **mastery.summary(bits, count),
+            }
+        return out
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Tenant dashboard
+# ──────────────────────────────────────────────────────────────────────────────
+@app.patch("/tenants/me/settings")
+def update_tenant_settings(payload: TenantSettings, user: User = Depends(current_user)):
+    with Session(_engine()) as s:
+        tenant = s.get(Tenant, user.tenant_id)
+        if payload.reply_cache_opt_out is not None:
+            tenant.reply_cache_opt_out = payload.reply_cache_opt_out
+        s.add(tenant)
+        s.commit()
+        opted_out = tenant.reply_cache_opt_out
+    get_reply_cache().forget_tenant(user.tenant_id)
+    return {"reply_cache_opt_out": opted_out}
+
+
+@app.get("/tenants/me/progress")
+def tenant_progress(request: Request, user: Principal = Depends(current_principal)):
+    """
+    Heat-map for the whole tenant: learners × concepts, one matrix per
+    metric.  The ETag is the tenant's aggregate version (bumped by every
+    progress flush and roster change), so an unchanged poll costs one
+    primary-key read and returns 304.  Attempts still buffered in the
+    progress recorder show up after its next flush.
+    """
+    catalog = get_catalog()
+    concepts = sorted(catalog.by_id.values(), key=lambda c: c.id)
+    with tenant_session(user.tenant_id) as s:
+        agg = s.get(TenantProgress, user.tenant_id)
+        version = agg.version if agg else 0
+        # concept ids are part of the tag: the column set can change too
+        columns = f"{len(concepts)}-{concepts[-1].id if concepts else 0}"
+        etag = f'W/"{user.tenant_id}.{version}.{columns}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        learners = s.exec(
+            select(Learner.id, Learner.name)
+            .where(Learner.tenant_id == user.tenant_id)
+            .order_by(Learner.id)
+        ).all()
+        cells = s.exec(
+            select(
+                Progress.learner_id, Progress.concept_id,
+                Progress.attempts, Progress.correct, Progress.mastered,
+            ).where(Progress.tenant_id == user.tenant_id)
+        ).all()
+
+    row_of = {lid: i for i, (lid, _) in enumerate(learners)}
+    col_of = {c.id: j for j, c in enumerate(concepts)}
+    attempts = [[0] * len(concepts) for _ in learners]
+    correct = [[0] * len(concepts) for _ in learners]
+    mastered = [[False] * len(concepts) for _ in learners]
+    for lid, cid, a, c, m in cells:
+        i, j = row_of.get(lid), col_of.get(cid)
+        if i is None or j is None:
+            continue
+        attempts[i][j], correct[i][j], mastered[i][j] = a, c, m
+    payload = {
+        "version": version,
+        "learners": {"id": [l.id for l in learners], "name": [l.name for l in learners]},
+        "concepts": {
+            "id": [c.id for c in concepts],
+            "label": [c.label for c in concepts],
+            "domain": [c.domain for c in concepts],
+        },
+        "attempts": attempts,
+        "correct": correct,
+        "mastered": mastered,
+    }
+    return JSONResponse(payload, headers=headers)
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -149,14 +441,97 @@ class LessonIn(BaseModel):
     user_text: str
 
 
-@app.post("/lesson")
-def lesson(payload: LessonIn, user: User = Depends(current_user)):
-    with Session(_engine()) as session:
-        learner = session.get(Learner, payload.learner_id)
-        if learner is None:
-            raise HTTPException(status_code=404, detail="Learner not found")
-        if learner.tenant_id != user.tenant_id:
-            raise HTTPException(status_code=403, detail="Forbidden")
+def _lesson_learner(learner_id: int, tenant_id: int) -> Learner | None:
+    with tenant_session(tenant_id) as session:
+        return session.get(Learner, learner_id)
 
-    reply = tutor_reply(payload.learner_id, payload.user_text)
+
+async def _check_learner(learner_id: int, user: Principal | User) -> None:
+    learner = await run_in_threadpool(_lesson_learner, learner_id, user.tenant_id)
+    if learner is None:
+        raise HTTPException(status_code=404, detail="Learner not found")
+    if learner.tenant_id != user.tenant_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.post("/lesson")
+async def lesson(
+    payload: LessonIn,
+    user: Principal = Depends(current_principal),
+    _slot: None = Depends(admit("llm")),
+):
+    await _check_learner(payload.learner_id, user)
+    reply = await tutor_reply(
+        payload.learner_id, payload.user_text, tenant_id=user.tenant_id
+    )
     return {"reply": reply}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/lesson/stream")
+async def lesson_stream(
+    payload: LessonIn,
+    user: Principal = Depends(current_principal),
+    _slot: None = Depends(admit("llm")),  # held until the stream ends
+):
+    """Server-Sent Events: `token` events as they arrive, then one `done`."""
+    await _check_learner(payload.learner_id, user)
+
+    async def _events():
+        parts = []
+        async for token in stream_tutor_reply(
+            payload.learner_id, payload.user_text, tenant_id=user.tenant_id
+        ):
+            parts.append(token)
+            yield _sse("token", {"text": token})
+        yield _sse("done", {"reply": "".join(parts).strip()})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=headers)
+
+
+@app.websocket("/ws/lesson")
+async def lesson_ws(websocket: WebSocket, token: str = ""):
+    """
+    Browsers can't set headers on a WebSocket, so the JWT comes as
+    `?token=`.  Each client message {"learner_id", "user_text"} is answered
+    with {"type": "token"} frames followed by one {"type": "done"}, or an
+    {"type": "error", "retry_after": s} frame when admission control turns
+    it away.
+    """
+    user = await run_in_threadpool(user_from_token, token)
+    if user is None:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                payload = LessonIn(**await websocket.receive_json())
+                await _check_learner(payload.learner_id, user)
+            except HTTPException as exc:
+                await websocket.send_json({"type": "error", "detail": exc.detail})
+                continue
+            except (ValueError, TypeError) as exc:
+                await websocket.send_json({"type": "error", "detail": str(exc)})
+                continue
+
+            parts = []
+            try:
+                async with get_admission().slot("llm", user.tenant_id):
+                    async for tok in stream_tutor_reply(
+                        payload.learner_id, payload.user_text, tenant_id=user.tenant_id
+                    ):
+                        parts.append(tok)
+                        await websocket.send_json({"type": "token", "text": tok})
+            except AdmissionRejected as exc:
+                await websocket.send_json(
+                    {"type": "error", "detail": exc.detail, "retry_after": exc.retry_after}
+                )
+                continue
+            await websocket.send_json({"type": "done", "reply": "".join(parts).strip()})
+    except WebSocketDisconnect:
+        pass
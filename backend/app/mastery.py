@@ -0,0 +1,79 @@
+"""
+mastery.py – rolling-window mastery ("≥ 80 % over the last 10 attempts").
+
+Each Progress row keeps its recent outcomes as a bitfield rather than one
+row per attempt:
+
+    recent_bits   last WINDOW outcomes, newest in bit 0 (1 = correct)
+    recent_count  how many of those bits are real (≤ WINDOW)
+    mastered      recent_count == WINDOW and popcount(recent_bits) ≥ NEEDED
+
+Pushing an outcome is a shift, an OR and a mask – O(1) whatever the
+learner's history.  A batch of n outcomes merges the same way (shift by
+n), which lets the progress recorder fold it into its bulk upsert as a
+pure SQL expression instead of a read-modify-write.
+"""
+
+import math
+
+from sqlalchemy import and_, case, false, literal, true
+from sqlalchemy.sql.elements import ColumnElement
+
+WINDOW = 10
+THRESHOLD = 0.8
+MASK = (1 << WINDOW) - 1
+NEEDED = math.ceil(THRESHOLD * WINDOW)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Python side (recorder buffers, fallbacks, reads)
+# ──────────────────────────────────────────────────────────────────────────────
+def push(bits: int, count: int, correct: bool) -> tuple[int, int]:
+    return ((bits << 1) | int(correct)) & MASK, min(count + 1, WINDOW)
+
+
+def merge(bits: int, count: int, new_bits: int, new_count: int) -> tuple[int, int]:
+    """Append a batch (*new_bits*, *new_count* ≤ WINDOW) after (*bits*, *count*)."""
+    return ((bits << new_count) | new_bits) & MASK, min(count + new_count, WINDOW)
+
+
+def is_mastered(bits: int, count: int) -> bool:
+    return count >= WINDOW and bin(bits & MASK).count("1") >= NEEDED
+
+
+def accuracy(bits: int, count: int) -> float:
+    """Share correct over the last *count* attempts (0.0 with no attempts)."""
+    return bin(bits & MASK).count("1") / count if count else 0.0
+
+
+def summary(bits: int, count: int) -> dict:
+    return {
+        "recent": [(bits >> i) & 1 for i in reversed(range(count))],  # oldest first
+        "rolling_accuracy": round(accuracy(bits, count), 3),
+        "mastered": is_mastered(bits, count),
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# SQL side (ON CONFLICT DO UPDATE expressions)
+# ──────────────────────────────────────────────────────────────────────────────
+def _popcount(bits: ColumnElement) -> ColumnElement:
+    # WINDOW-term sum: constant size, and portable (no popcount in SQLite)
+    total = literal(0)
+    for i in range(WINDOW):
+        total = total + bits.op(">>")(i).op("&")(1)
+    return total
+
+
+def sql_merge(
+    bits: ColumnElement, count: ColumnElement, new_bits: ColumnElement, new_count: ColumnElement
+) -> dict[str, ColumnElement]:
+    """SET clause for recent_bits / recent_count / mastered after a batch."""
+    merged_bits = bits.op("<<")(new_count).op("|")(new_bits).op("&")(MASK)
+    total = count + new_count
+    merged_count = case((total >= WINDOW, WINDOW), else_=total)
+    mastered = case(
+        (and_(merged_count >= WINDOW, _popcount(merged_bits) >= NEEDED), true()),
+        else_=false(),
+    )
+    return {"recent_bits": merged_bits, "recent_count": merged_count, "mastered": mastered}
@@ -0,0 +1,224 @@
+"""
+memory.py – per-learner conversation memory under a token budget.
+
+• Each learner's session keeps its most recent turns in a bounded window
+  (memory_recent_turns messages), each with its token count
+• Turns that fall out of the window are folded into a rolling summary by
+  a background task – never on the request path.  Until the new summary
+  lands, prompts keep using the previous one
+• build_messages() assembles system prompt + summary + as many recent
+  turns as fit in memory_token_budget + the new utterance, so prompt size
+  stays flat however long the session runs
+• Sessions are LRU-bounded (memory_max_learners) and expire after
+  memory_idle_ttl_s; everything lives in process memory
+• Tokens are counted with tiktoken when its encoding is available
+  locally, otherwise estimated at ~4 characters per token
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from .config import get_settings
+from .llm import STUB_REPLY, get_gateway
+
+log = logging.getLogger(__name__)
+
+SUMMARY_MODEL = "gpt-4o-mini"
+MESSAGE_OVERHEAD = 4  # role + separators per chat message
+
+_encode: Optional[Callable[[str], list]] = None
+_encoder_checked = False
+
+
+def count_tokens(text: str) -> int:
+    global _encode, _encoder_checked
+    if not _encoder_checked:
+        _encoder_checked = True
+        try:
+            import tiktoken  # optional; needs its encoding file cached locally
+
+            _encode = tiktoken.get_encoding("o200k_base").encode
+        except Exception:  # noqa: BLE001 – not installed / offline
+            _encode = None
+    if _encode is not None:
+        return len(_encode(text))
+    return math.ceil(len(text) / 4)
+
+
+@dataclass
+class Turn:
+    role: str  # "user" | "assistant"
+    content: str
+    tokens: int
+
+
+@dataclass
+class Conversation:
+    tenant_id: Optional[int] = None
+    turns: deque = field(default_factory=deque)  # recent Turns, oldest first
+    folding: list = field(default_factory=list)  # left the window, not yet summarised
+    summary: str = ""
+    summary_tokens: int = 0
+    task: Optional[asyncio.Task] = None
+    touched: float = field(default_factory=time.monotonic)
+
+
+def _extractive_summary(previous: str, turns: list[Turn], max_tokens: int) -> str:
+    """Offline fallback: keep the learner's side of the folded turns, trimmed."""
+    said = "; ".join(t.content.strip() for t in turns if t.role == "user")
+    text = f"{previous} Earlier the learner said: {said}." if said else previous
+    text = text.strip()
+    while text and count_tokens(text) > max_tokens:
+        text = text[len(text) // 4:]  # drop the oldest quarter
+        text = text[text.find(" ") + 1:] if " " in text else text
+    return text
+
+
+async def _summarize(
+    previous: str, turns: list[Turn], tenant_id: Optional[int], max_tokens: int
+) -> str:
+    transcript = "\n".join(f"{t.role}: {t.content}" for t in turns)
+    if get_gateway().client() is None:
+        return _extractive_summary(previous, turns, max_tokens)
+    reply = await get_gateway().chat(
+        [
+            {
+                "role": "system",
+                "content": (
+                    "Summarise this tutoring conversation for the tutor's memory: "
+                    "what the learner worked on, what they got right or wrong, "
+                    f"and anything personal they shared. At most {max_tokens} tokens."
+                ),
+            },
+            {"role": "user", "content": f"Summary so far: {previous or '(none)'}\n\n{transcript}"},
+        ],
+        model=SUMMARY_MODEL,
+        tenant_id=tenant_id,
+        max_tokens=max_tokens,
+    )
+    if reply == STUB_REPLY:  # gateway gave up; don't store the stub as memory
+        return _extractive_summary(previous, turns, max_tokens)
+    return reply
+
+
+class MemoryStore:
+    def __init__(self):
+        cfg = get_settings()
+        self.budget = cfg.memory_token_budget
+        self.window = cfg.memory_recent_turns
+        self.summary_max = cfg.memory_summary_tokens
+        self.max_learners = cfg.memory_max_learners
+        self.ttl = cfg.memory_idle_ttl_s
+        self._sessions: OrderedDict[int, Conversation] = OrderedDict()
+        self.summaries = 0
+
+    def _get(self, learner_id: int) -> Conversation:
+        now = time.monotonic()
+        conv = self._sessions.get(learner_id)
+        if conv is None or now - conv.touched > self.ttl:
+            conv = self._sessions[learner_id] = Conversation()
+        conv.touched = now
+        self._sessions.move_to_end(learner_id)
+        while len(self._sessions) > self.max_learners:
+            self._sessions.popitem(last=False)
+        return conv
+
+    def build_messages(
+        self, learner_id: int, system_prompt: str, user_text: str
+    ) -> list[dict[str, str]]:
+        """System + summary + newest turns that fit the budget + *user_text*."""
+        conv = self._get(learner_id)
+        system = system_prompt
+        if conv.summary:
+            system += f"\n\nWhat you remember from earlier in this session: {conv.summary}"
+        used = (
+            count_tokens(system) + count_tokens(user_text) + 2 * MESSAGE_OVERHEAD
+        )
+        history: list[dict[str, str]] = []
+        for turn in reversed(conv.turns):
+            cost = turn.tokens + MESSAGE_OVERHEAD
+            if used + cost > self.budget:
+                break
+            used += cost
+            history.append({"role": turn.role, "content": turn.content})
+        history.reverse()
+        return [
+            {"role": "system", "content": system},
+            *history,
+            {"role": "user", "content": user_text},
+        ]
+
+    def append(
+        self, learner_id: int, user_text: str, reply: str, tenant_id: Optional[int] = None
+    ):
+        """Store a finished exchange; schedules summarisation if the window overflowed."""
+        conv = self._get(learner_id)
+        conv.tenant_id = tenant_id
+        conv.turns.append(Turn("user", user_text, count_tokens(user_text)))
+        conv.turns.append(Turn("assistant", reply, count_tokens(reply)))
+        while len(conv.turns) > self.window:
+            conv.folding.append(conv.turns.popleft())
+        self._schedule(conv)
+
+    def _schedule(self, conv: Conversation):
+        if not conv.folding:
+            return
+        task = conv.task
+        if task is not None and not task.done() and not task.get_loop().is_closed():
+            return  # one summariser per learner; it picks up new folds when done
+        try:
+            conv.task = asyncio.get_running_loop().create_task(self._fold(conv))
+        except RuntimeError:
+            conv.task = None  # no loop (sync caller); retried on the next append
+
+    async def _fold(self, conv: Conversation):
+        while conv.folding:
+            batch = list(conv.folding)
+            try:
+                summary = await _summarize(
+                    conv.summary, batch, conv.tenant_id, self.summary_max
+                )
+            except Exception:  # noqa: BLE001 – keep the turns, retry next time
+                log.exception("conversation summary failed")
+                return
+            del conv.folding[:len(batch)]
+            conv.summary = summary
+            conv.summary_tokens = count_tokens(summary)
+            self.summaries += 1
+
+    async def drain(self):
+        """Wait for in-flight summaries (shutdown / tests)."""
+        tasks = [
+            c.task for c in self._sessions.values()
+            if c.task is not None and not c.task.done()
+            and c.task.get_loop() is asyncio.get_running_loop()
+        ]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "summaries": self.summaries,
+            "folding_turns": sum(len(c.folding) for c in self._sessions.values()),
+        }
+
+
+_store: Optional[MemoryStore] = None
+
+
+def get_memory() -> MemoryStore:
+    global _store
+    if _store is None:
+        _store = MemoryStore()
+    return _store
+
+
+def reset_memory():
+    global _store
+    _store = None
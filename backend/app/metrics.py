@@ -0,0 +1,309 @@
+"""
+metrics.py – request / stage instrumentation, exposed in Prometheus text
+format on GET /metrics.
+
+• MetricsMiddleware (pure ASGI, so streaming bodies pass straight
+  through) times every HTTP request per route template and status
+• SQLAlchemy cursor hooks count queries and their time, globally and per
+  request (learnpal_request_db_queries / _seconds histograms)
+• timed("llm" | "stt" | "tts" | "auth_decode" | …) wraps a stage: one
+  histogram for all stages, and the time is added to the current request
+• LLM token usage is counted from the OpenAI response (llm.py)
+• The share of each clip cut as silence before STT, and the clips with no
+  speech that never reached the model, are recorded by voice.py
+• With metrics_server_timing the response carries a Server-Timing header
+  (app, db and every stage finished before the headers went out)
+
+No dependency on prometheus_client: the few metric types we need are
+small, thread-safe (threadpool endpoints, the progress flusher) and
+render themselves.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import get_settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+UNMATCHED = "<unmatched>"  # 404s: keep arbitrary paths out of the label set
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[n] for n in self.labelnames), 0.0)
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                out.append(f"{self.name}{_labels(self.labelnames, key)} {_fmt(v)}")
+        return out
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series: dict[tuple, list] = {}  # key → [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(labels[n] for n in self.labelnames))
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, n) in sorted(self._series.items()):
+                running = 0
+                for bound, c in zip(self.buckets, counts):
+                    running += c
+                    le = _labels(self.labelnames, key, f'le="{_fmt(bound)}"')
+                    out.append(f"{self.name}_bucket{le} {running}")
+                out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+                out.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return out
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Metric families
+# ──────────────────────────────────────────────────────────────────────────────
+REQUESTS = Counter(
+    "learnpal_http_requests_total", "HTTP requests by route and status.",
+    ("method", "route", "status"),
+)
+REQUEST_SECONDS = Histogram(
+    "learnpal_http_request_duration_seconds", "HTTP request latency (whole body sent).",
+    ("method", "route"),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "learnpal_request_db_queries", "SQL statements issued per request.",
+    ("route",), QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "learnpal_request_db_seconds", "Time spent in SQL per request.", ("route",),
+)
+DB_QUERIES = Counter("learnpal_db_queries_total", "SQL statements executed.")
+DB_QUERY_SECONDS = Histogram("learnpal_db_query_duration_seconds", "SQL statement latency.")
+STAGE_SECONDS = Histogram(
+    "learnpal_stage_duration_seconds", "Time spent in one stage of a request.", ("stage",),
+)
+LLM_TOKENS = Counter(
+    "learnpal_llm_tokens_total", "LLM tokens reported by the API.", ("model", "kind"),
+)
+
+STT_TRIMMED = Histogram(
+    "learnpal_stt_trimmed_ratio", "Share of each clip cut as silence before STT.",
+    buckets=RATIO_BUCKETS,
+)
+STT_SKIPPED = Counter(
+    "learnpal_stt_skipped_clips_total", "Clips with no speech, never sent to the model.",
+)
+ADMISSION_WAIT = Histogram(
+    "learnpal_admission_wait_seconds", "Time queued for a slot (admission.py).", ("kind",),
+)
+ADMISSION_REJECTED = Counter(
+    "learnpal_admission_rejected_total", "Requests answered 429 by admission control.",
+    ("kind", "reason"),
+)
+
+FAMILIES = (
+    REQUESTS, REQUEST_SECONDS, REQUEST_DB_QUERIES, REQUEST_DB_SECONDS,
+    DB_QUERIES, DB_QUERY_SECONDS, STAGE_SECONDS, LLM_TOKENS, STT_TRIMMED, STT_SKIPPED,
+    ADMISSION_WAIT, ADMISSION_REJECTED,
+)
+
+
+def render() -> str:
+    lines: list[str] = []
+    for family in FAMILIES:
+        lines.extend(family.render())
+    return "\n".join(lines) + "\n"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Per-request accounting
+# ──────────────────────────────────────────────────────────────────────────────
+@dataclass
+class RequestTimings:
+    start: float = field(default_factory=time.perf_counter)
+    stages: dict[str, float] = field(default_factory=dict)  # seconds, summed per stage
+    db_queries: int = 0
+    db_seconds: float = 0.0
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        parts = [f"app;dur={(time.perf_counter() - self.start) * 1000:.1f}"]
+        if self.db_queries:
+            parts.append(
+                f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries"'
+            )
+        parts.extend(f"{name};dur={s * 1000:.1f}" for name, s in self.stages.items())
+        return ", ".join(parts)
+
+
+# a mutable object, so threadpool work (which runs in a copied context)
+# still adds to the request that started it
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+class timed:
+    """`with timed("stage"):` / `async with timed("stage"):`"""
+
+    __slots__ = ("stage", "_t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._t0
+        STAGE_SECONDS.observe(elapsed, stage=self.stage)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(self.stage, elapsed)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        return self.__exit__(*exc)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# SQLAlchemy hooks
+# ──────────────────────────────────────────────────────────────────────────────
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_t0", []).append(time.perf_counter())
+
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_t0")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    DB_QUERIES.inc()
+    DB_QUERY_SECONDS.observe(elapsed)
+    timings = _current.get()
+    if timings is not None:
+        timings.db_queries += 1
+        timings.db_seconds += elapsed
+
+
+def _on_error(context):
+    starts = context.connection.info.get("metrics_t0") if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine: Engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor)
+    event.listen(engine, "after_cursor_execute", _after_cursor)
+    event.listen(engine, "handle_error", _on_error)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# ASGI middleware
+# ──────────────────────────────────────────────────────────────────────────────
+def _route(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        server_timing = get_settings().metrics_server_timing
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if server_timing:
+                    headers = list(message.get("headers", ()))
+                    headers.append((b"server-timing", timings.server_timing().encode()))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - timings.start
+            route, method = _route(scope), scope["method"]
+            REQUESTS.inc(method=method, route=route, status=str(status))
+            REQUEST_SECONDS.observe(elapsed, method=method, route=route)
+            REQUEST_DB_QUERIES.observe(timings.db_queries, route=route)
+            REQUEST_DB_SECONDS.observe(timings.db_seconds, route=route)
+            _current.reset(token)
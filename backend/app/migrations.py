@@ -0,0 +1,137 @@
+"""
+migrations.py – versioned schema changes, applied at startup by init_db().
+
+• A fresh database gets the whole schema from create_all() (models.py
+  declares every table and index) and is stamped with every version
+• An existing one runs the migrations it has not seen yet, in order, each
+  in its own transaction together with its schemamigration row
+• The version row is written first, so when several workers start at once
+  the others block on it, hit the primary key and skip that migration
+
+Migrations spell out their DDL instead of reading models.py, so what they
+do stays fixed when the models change later.  New ones go at the end of
+MIGRATIONS with the next version number; never edit an applied one.
+"""
+
+import logging
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import inspect, insert, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel
+
+from .models import SchemaMigration, _engine
+
+log = logging.getLogger(__name__)
+
+
+class MigrationError(RuntimeError):
+    """The database needs manual attention before it can be migrated."""
+
+
+def _add_column(conn: Connection, table: str, column: str):
+    """ALTER *table* for a column the model has but the table lacks."""
+    if column in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return
+    col = SQLModel.metadata.tables[table].columns[column]
+    ddl = col.type.compile(dialect=conn.dialect)
+    default = col.server_default.arg.compile(dialect=conn.dialect)
+    conn.execute(text(
+        f"ALTER TABLE {table} ADD COLUMN {column} {ddl} NOT NULL DEFAULT {default}"
+    ))
+
+
+def _baseline(conn: Connection):
+    """Columns added before migrations existed, plus their backfill."""
+    for table, column in (
+        ("tenant", "reply_cache_opt_out"),
+        ("progress", "recent_bits"),
+        ("progress", "recent_count"),
+        ("progress", "mastered"),
+        ("progress", "tenant_id"),
+    ):
+        _add_column(conn, table, column)
+    conn.execute(text(
+        "UPDATE progress SET tenant_id = "
+        "(SELECT learner.tenant_id FROM learner WHERE learner.id = progress.learner_id) "
+        "WHERE tenant_id = 0"
+    ))
+
+
+def _unique_user_email(conn: Connection):
+    dupes = conn.execute(text(
+        'SELECT COUNT(*) FROM (SELECT email FROM "user" GROUP BY email HAVING COUNT(*) > 1) d'
+    )).scalar_one()
+    if dupes:
+        raise MigrationError(
+            f"{dupes} e-mail address(es) belong to more than one user; "
+            "merge or rename those accounts, then restart"
+        )
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_user_email ON "user" (email)'))
+
+
+def _lookup_indexes(conn: Connection):
+    for ddl in (
+        "CREATE INDEX IF NOT EXISTS ix_learner_tenant_id_id ON learner (tenant_id, id)",
+        "DROP INDEX IF EXISTS ix_learner_tenant_id",  # a prefix of the one above
+        "CREATE INDEX IF NOT EXISTS ix_concept_label ON concept (label)",
+        "CREATE INDEX IF NOT EXISTS ix_progress_tenant_learner "
+        "ON progress (tenant_id, learner_id, concept_id)",
+        "DROP INDEX IF EXISTS ix_progress_tenant_id",
+    ):
+        conn.execute(text(ddl))
+
+
+def _learner_registry(conn: Connection):
+    """Register existing learners so new ids (shards.py) never reuse theirs."""
+    conn.execute(text(
+        "INSERT INTO learnerregistry (id, tenant_id) "
+        "SELECT id, tenant_id FROM learner "
+        "WHERE id NOT IN (SELECT id FROM learnerregistry)"
+    ))
+    if conn.dialect.name == "postgresql":  # explicit ids don't advance the sequence
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('learnerregistry', 'id'), "
+            "COALESCE(MAX(id), 0) + 1, false) FROM learnerregistry"
+        ))
+
+
+MIGRATIONS: tuple[tuple[int, str, Callable[[Connection], None]], ...] = (
+    (1, "baseline", _baseline),
+    (2, "unique_user_email", _unique_user_email),
+    (3, "lookup_indexes", _lookup_indexes),
+    (4, "learner_registry", _learner_registry),
+)
+
+
+def migrate(engine: Engine) -> list[int]:
+    """Bring *engine*'s schema up to date; returns the versions applied."""
+    fresh = not inspect(engine).has_table("tenant")
+    SQLModel.metadata.create_all(engine)
+    table = SchemaMigration.__table__
+    with engine.connect() as conn:
+        done = set(conn.execute(table.select().with_only_columns(table.c.version)).scalars())
+
+    applied = []
+    for version, name, apply in MIGRATIONS:
+        if version in done:
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(table).values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                ))
+                if not fresh:  # create_all() already built this version's schema
+                    apply(conn)
+        except IntegrityError:
+            continue  # another worker applied it meanwhile
+        applied.append(version)
+        log.info("schema migration %d (%s) %s", version, name, "stamped" if fresh else "applied")
+    return applied
+
+
+def init_db():
+    """Startup phase "database": tables, then pending migrations."""
+    migrate(_engine())
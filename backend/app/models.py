@@ -1,13 +1,25 @@
 """
 Core SQLModel tables for multi-tenant MVP.
 Only Tenant, User and Learner are needed in Sprint-0.
+
+Indexes declared here are what a fresh database gets from create_all();
+existing databases reach the same schema through migrations.py.
 """
 
 import os
+import threading
+import time
+from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Index, event, false, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool, StaticPool
 from sqlmodel import SQLModel, Field, create_engine
 
+from .config import get_settings
+from .metrics import instrument_engine
+
 ###############################################################################
 # Tables
 ###############################################################################
@@ -17,18 +29,25 @@ class Tenant(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     plan: str = "free"  # free / family / school
+    # never serve or store this tenant's turns in the LLM reply cache
+    reply_cache_opt_out: bool = Field(
+        default=False, sa_column_kwargs={"server_default": false()}
+    )
 
 
 class User(SQLModel, table=True):
     """Parent or admin login – NOT a learner."""
     id: Optional[int] = Field(default=None, primary_key=True)
     tenant_id: int = Field(foreign_key="tenant.id")
-    email: str
+    email: str = Field(index=True, unique=True)  # login lookup
     password_hash: str
     role: str = "parent"  # parent | admin
 
 
 class Learner(SQLModel, table=True):
+    # tenant roster in id order: the keyset pagination of GET /learners
+    __table_args__ = (Index("ix_learner_tenant_id_id", "tenant_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     tenant_id: int = Field(foreign_key="tenant.id")
     name: str
@@ -39,26 +58,217 @@ class Learner(SQLModel, table=True):
 class Concept(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     domain: str        # "math" | "reading"
-    label: str         # "addition within 10"
+    label: str = Field(index=True)  # "addition within 10"
     grade: str         # "K" | "1" | "6" etc.
 
 
 class Progress(SQLModel, table=True):
+    # tenant-wide reads (heat-map, export) in (learner, concept) order
+    __table_args__ = (
+        Index("ix_progress_tenant_learner", "tenant_id", "learner_id", "concept_id"),
+    )
+
     learner_id: int = Field(foreign_key="learner.id", primary_key=True)
     concept_id: int = Field(foreign_key="concept.id", primary_key=True)
     correct: int = 0
     attempts: int = 0
+    # rolling window of recent outcomes, see mastery.py
+    recent_bits: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    recent_count: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    mastered: bool = Field(default=False, sa_column_kwargs={"server_default": false()})
+    # copy of learner.tenant_id so tenant-wide reads need no join
+    tenant_id: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+
+
+class TenantProgress(SQLModel, table=True):
+    """Per-tenant aggregate, maintained by every progress flush."""
+    tenant_id: int = Field(foreign_key="tenant.id", primary_key=True)
+    version: int = 0  # bumped on any progress or roster change → heat-map ETag
+    attempts: int = 0
+    correct: int = 0
+
+
+class TenantShard(SQLModel, table=True):
+    """Directory: tenants living outside the default database (shards.py)."""
+    tenant_id: int = Field(foreign_key="tenant.id", primary_key=True)
+    shard: str
+
+
+class LearnerRegistry(SQLModel, table=True):
+    """Directory: hands out learner ids, unique across every shard."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    tenant_id: int = Field(index=True)
+
+
+class SchemaMigration(SQLModel, table=True):
+    """One row per migration applied to this database (migrations.py)."""
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
 
 ###############################################################################
 # Helpers
 ###############################################################################
 
 
+DEFAULT_DATABASE_URL = "sqlite:///./learnpal.db"
+
+_engines: dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+class _PoolMetrics:
+    """Counters fed by pool events + the checkout wait timer below."""
+
+    def __init__(self):
+        # pool events fire on whichever thread checks out/in; serialise updates
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def incr(self, name: str):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def observe_wait(self, seconds: float):
+        with self.lock:
+            self.wait_seconds_total += seconds
+            if seconds > self.wait_seconds_max:
+                self.wait_seconds_max = seconds
+
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    metrics: _PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _sqlite_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.close()
+
+
+def _build_engine(url: str) -> Engine:
+    cfg = get_settings()
+    u = make_url(url)
+    is_sqlite = u.get_backend_name() == "sqlite"
+    kwargs: dict = {"echo": False}
+
+    if is_sqlite:
+        kwargs["connect_args"] = {"check_same_thread": False}
+    else:
+        kwargs["pool_pre_ping"] = cfg.db_pool_pre_ping
+
+    in_memory = is_sqlite and u.database in (None, "", ":memory:")
+    if in_memory:
+        # one shared connection, otherwise every checkout sees an empty DB
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(
+            poolclass=_TimedQueuePool,
+            pool_size=cfg.db_pool_size,
+            max_overflow=cfg.db_max_overflow,
+            pool_recycle=cfg.db_pool_recycle,
+            pool_timeout=cfg.db_pool_timeout,
+        )
+
+    engine = create_engine(url, **kwargs)
+    metrics = _PoolMetrics()
+    engine.pool.metrics = metrics  # type: ignore[attr-defined]
+
+    if is_sqlite and not in_memory and cfg.db_sqlite_wal:
+        event.listen(engine, "connect", _sqlite_pragmas)
+    instrument_engine(engine)  # per-query / per-request SQL metrics
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(*_):
+        metrics.incr("connects")
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(*_):
+        metrics.incr("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(*_):
+        metrics.incr("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(*_):
+        metrics.incr("invalidations")
+
+    return engine
+
+
+def get_engine(url: Optional[str] = None) -> Engine:
+    """
+    Return the process-wide engine for *url* (default: $DATABASE_URL).
+
+    Engines are created lazily, once per URL, and shared by every request so
+    the connection pool actually gets reused.
+    """
+    url = url or os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL)
+    engine = _engines.get(url)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(url)
+            if engine is None:
+                engine = _engines[url] = _build_engine(url)
+    return engine
+
+
 def _engine():
-    url = os.getenv("DATABASE_URL", "sqlite:///./learnpal.db")
-    return create_engine(url, echo=False, connect_args={"check_same_thread": False})
+    return get_engine()
+
+
+def dispose_engines():
+    """Close every pooled connection (shutdown / tests switching URLs)."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
 
 
-def init_db():
-    """Call once at startup (we’ll wire it in later)."""
-    SQLModel.metadata.create_all(_engine())
+def pool_stats() -> dict[str, dict]:
+    """Snapshot of pool occupancy + checkout counters per engine."""
+    out = {}
+    for url, engine in list(_engines.items()):
+        pool = engine.pool
+        m: _PoolMetrics = getattr(pool, "metrics", None) or _PoolMetrics()
+        stats = {
+            "pool": type(pool).__name__,
+            "connects": m.connects,
+            "checkouts": m.checkouts,
+            "checkins": m.checkins,
+            "invalidations": m.invalidations,
+            "wait_seconds_total": round(m.wait_seconds_total, 6),
+            "wait_seconds_max": round(m.wait_seconds_max, 6),
+        }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        # keyed by backend + database only: no user, password or host
+        u = make_url(url)
+        out[f"{u.get_backend_name()}:{u.database or ''}"] = stats
+    return out
@@ -0,0 +1,172 @@
+"""
+moderation.py – safety checks on tutor text before it reaches the learner.
+
+Every piece of text goes through three tiers, cheapest first:
+
+• Local lexicon (data/moderation_lexicon.json): a blocked word flags the
+  text outright; text made only of known-safe words, numbers and
+  punctuation ("Great job! What is 3 + 4?") is passed without a remote call
+• Verdict cache: remote verdicts are kept per sha256 of the text, so a
+  repeated reply or sentence is never sent twice
+• Remote backend: the OpenAI moderation endpoint through the shared
+  gateway client (pluggable via moderation_backend="module:factory", e.g.
+  benchmarks.fakes:FakeModerator).  A timeout / error is retried once,
+  then the text is treated as flagged (moderation_fail_closed)
+
+Without OPENAI_API_KEY (CI) the default backend passes everything the
+lexicon did not flag.  The engine streams replies through this in
+parallel with generation – see engine._safety_stage().
+"""
+
+import asyncio
+import hashlib
+import importlib
+import json
+import logging
+import os
+import re
+from typing import Optional, Protocol
+
+from .cache import TTLCache
+from .config import get_settings
+from .llm import get_gateway
+from .metrics import timed
+
+log = logging.getLogger(__name__)
+
+SAFE_FALLBACK = "Let's get back to our lesson! What would you like to practise next?"
+DEFAULT_LEXICON = os.path.join(os.path.dirname(__file__), "data", "moderation_lexicon.json")
+MODERATION_MODEL = "omni-moderation-latest"
+
+_WORDS = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+
+class ModerationBackend(Protocol):
+    async def flagged(self, text: str, tenant_id: Optional[int] = None) -> bool:
+        """True if *text* must not be shown / spoken."""
+
+
+class OpenAIModerationBackend:
+    async def flagged(self, text: str, tenant_id: Optional[int] = None) -> bool:
+        client = get_gateway().client()
+        if client is None:
+            return False  # CI / offline: lexicon only
+        resp = await client.moderations.create(model=MODERATION_MODEL, input=text)
+        return any(r.flagged for r in resp.results)
+
+
+class Lexicon:
+    def __init__(self, blocked: frozenset[str], safe: frozenset[str]):
+        self.blocked = blocked
+        self.safe = safe
+
+    @classmethod
+    def load(cls, path: str) -> "Lexicon":
+        try:
+            with open(path, encoding="utf-8") as fh:
+                raw = json.load(fh)
+        except FileNotFoundError:
+            log.warning("moderation lexicon %s not found; every text goes remote", path)
+            return cls(frozenset(), frozenset())
+        return cls(frozenset(raw.get("blocked", ())), frozenset(raw.get("safe", ())))
+
+    def verdict(self, text: str) -> Optional[bool]:
+        """True = flagged, False = obviously safe, None = ask the backend."""
+        words = _WORDS.findall(text.replace("’", "'").casefold())
+        if any(w in self.blocked for w in words):
+            return True
+        if all(w in self.safe for w in words):
+            return False
+        return None
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.strip().encode()).hexdigest()
+
+
+class Moderator:
+    def __init__(self, backend: Optional[ModerationBackend] = None):
+        cfg = get_settings()
+        self.enabled = cfg.moderation_enabled
+        self.timeout = cfg.moderation_timeout_s
+        self.fail_closed = cfg.moderation_fail_closed
+        self.lexicon = Lexicon.load(cfg.moderation_lexicon_path or DEFAULT_LEXICON)
+        self.backend = backend or _load_backend(cfg.moderation_backend)
+        self._verdicts: TTLCache[bool] = TTLCache(
+            cfg.moderation_cache_size, cfg.moderation_cache_ttl_s
+        )
+        self.local_safe = 0
+        self.local_flagged = 0
+        self.remote_calls = 0
+        self.errors = 0
+        self.flagged_total = 0
+
+    async def is_flagged(self, text: str, tenant_id: Optional[int] = None) -> bool:
+        if not self.enabled or not text.strip():
+            return False
+        local = self.lexicon.verdict(text)
+        if local is not None:
+            if local:
+                self.local_flagged += 1
+                self.flagged_total += 1
+            else:
+                self.local_safe += 1
+            return local
+        key = text_key(text)
+        cached = self._verdicts.get(key)
+        if cached is not None:
+            self.flagged_total += cached
+            return cached
+        verdict = await self._remote(text, tenant_id)
+        if verdict is not None:
+            self._verdicts.put(key, verdict)
+        else:
+            verdict = self.fail_closed
+        self.flagged_total += verdict
+        return verdict
+
+    async def _remote(self, text: str, tenant_id: Optional[int]) -> Optional[bool]:
+        for attempt in range(2):
+            self.remote_calls += 1
+            try:
+                async with timed("moderation"):
+                    return await asyncio.wait_for(
+                        self.backend.flagged(text, tenant_id), timeout=self.timeout
+                    )
+            except Exception as exc:  # noqa: BLE001 – retried once, then fail closed
+                self.errors += 1
+                log.warning("moderation attempt %d failed: %r", attempt + 1, exc)
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "local_safe": self.local_safe,
+            "local_flagged": self.local_flagged,
+            "cache_hits": self._verdicts.hits,
+            "remote_calls": self.remote_calls,
+            "errors": self.errors,
+            "flagged": self.flagged_total,
+        }
+
+
+def _load_backend(loader: Optional[str]) -> ModerationBackend:
+    if loader:
+        mod, _, attr = loader.partition(":")
+        return getattr(importlib.import_module(mod), attr)()
+    return OpenAIModerationBackend()
+
+
+_moderator: Optional[Moderator] = None
+
+
+def get_moderator() -> Moderator:
+    global _moderator
+    if _moderator is None:
+        _moderator = Moderator()
+    return _moderator
+
+
+def set_moderator(moderator: Optional[Moderator]):
+    """Swap the moderator (None → rebuild from settings on next use)."""
+    global _moderator
+    _moderator = moderator
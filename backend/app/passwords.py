@@ -0,0 +1,173 @@
+"""
+passwords.py – bcrypt hashing off the request threadpool.
+
+• hash/verify run in a small dedicated thread pool (bcrypt releases the
+  GIL), so a classroom login burst queues here instead of occupying every
+  AnyIO worker thread that /lesson and friends need
+• Backpressure: once auth_hash_max_queue calls are waiting, new ones get
+  HashBusy, which the routes turn into HTTP 503
+• Cost policy: auth_bcrypt_rounds, or – when auth_bcrypt_target_ms is set –
+  the highest cost that hashes within that budget on this machine,
+  measured once at startup (never below auth_bcrypt_min_rounds)
+• verify() also reports a replacement hash when the stored one was made
+  with a lower cost than the current policy, so logins upgrade old hashes
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from passlib.hash import bcrypt
+
+from .config import get_settings
+
+log = logging.getLogger(__name__)
+
+MIN_ROUNDS, MAX_ROUNDS = 4, 16
+
+_rounds: Optional[int] = None  # set by calibrate(); else from settings
+
+
+class HashBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Cost policy
+# ──────────────────────────────────────────────────────────────────────────────
+def current_rounds() -> int:
+    return _rounds if _rounds is not None else get_settings().auth_bcrypt_rounds
+
+
+def calibrate(target_ms: float, floor: int) -> int:
+    """Pick the highest cost whose hash takes at most *target_ms*."""
+    global _rounds
+    chosen = max(floor, MIN_ROUNDS)
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        t0 = time.perf_counter()
+        bcrypt.using(rounds=rounds).hash("calibration")
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        if elapsed_ms > target_ms:
+            break
+        chosen = max(chosen, rounds)
+        if elapsed_ms * 2 > target_ms:
+            break  # each step doubles the cost; the next one won't fit
+    _rounds = chosen
+    log.info("bcrypt cost calibrated to %d (target %.0f ms)", chosen, target_ms)
+    return chosen
+
+
+def reset_policy():
+    global _rounds
+    _rounds = None
+
+
+def hash_cost(pw_hash: str) -> int:
+    """Cost factor of a modular-crypt bcrypt hash ($2b$12$…)."""
+    try:
+        return int(pw_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def hash_password(pw: str) -> str:
+    return bcrypt.using(rounds=current_rounds()).hash(pw)
+
+
+def _verify_and_upgrade(pw: str, pw_hash: str) -> tuple[bool, Optional[str]]:
+    if not bcrypt.verify(pw, pw_hash):
+        return False, None
+    if hash_cost(pw_hash) < current_rounds():
+        return True, hash_password(pw)
+    return True, None
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Pool
+# ──────────────────────────────────────────────────────────────────────────────
+class HashPool:
+    def __init__(self):
+        cfg = get_settings()
+        self.workers = cfg.auth_hash_workers
+        self.max_queue = cfg.auth_hash_max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="bcrypt"
+        )
+        self.depth = 0  # accepted, not yet finished
+        self.max_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.run_seconds_total = 0.0
+        self._lock = threading.Lock()  # timings are added from worker threads
+
+    async def _run(self, fn, *args):
+        if self.depth >= self.max_queue:
+            self.rejected += 1
+            raise HashBusy(f"{self.depth} hashes queued")
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.wait_seconds_total += started - submitted
+                    self.run_seconds_total += time.perf_counter() - started
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.depth -= 1
+            self.completed += 1
+
+    async def hash(self, pw: str) -> str:
+        return await self._run(hash_password, pw)
+
+    async def verify(self, pw: str, pw_hash: str) -> tuple[bool, Optional[str]]:
+        """(matches, upgraded hash or None)."""
+        return await self._run(_verify_and_upgrade, pw, pw_hash)
+
+    async def calibrate(self) -> int:
+        cfg = get_settings()
+        return await self._run(
+            calibrate, cfg.auth_bcrypt_target_ms, cfg.auth_bcrypt_min_rounds
+        )
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "rounds": current_rounds(),
+            "queue_depth": self.depth,
+            "max_queue_depth": self.max_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_total": round(self.wait_seconds_total, 4),
+            "run_seconds_total": round(self.run_seconds_total, 4),
+        }
+
+
+_pool: Optional[HashPool] = None
+
+
+def get_hash_pool() -> HashPool:
+    global _pool
+    if _pool is None:
+        _pool = HashPool()
+    return _pool
+
+
+def shutdown_hash_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
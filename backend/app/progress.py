@@ -0,0 +1,322 @@
+"""
+progress.py – write-behind recorder for lesson attempts.
+
+• Turns call record(); nothing touches the database on the request path
+• Attempts are coalesced per (learner_id, concept_id) in memory – counts
+  plus the batch's rolling-window bits (mastery.py) – and a background
+  thread writes them as one bulk upsert
+  (INSERT … ON CONFLICT DO UPDATE attempts = attempts + excluded.attempts,
+  recent_bits = recent_bits << n | excluded.recent_bits, …)
+  once progress_flush_max attempts are pending or every
+  progress_flush_interval_s, whichever comes first
+• The same transaction bumps each touched tenant's TenantProgress row
+  (version + totals), which the heat-map endpoint uses as its ETag
+• Each flush writes one transaction per tenant shard (shards.py); a failed
+  one puts its rows back, so attempts are retried, not dropped
+• close() flushes synchronously – called from the shutdown hook and atexit
+• Read-your-writes: overlay() adds attempts that are buffered or mid-flush
+  to rows read from the database, under the same lock the flusher commits
+  with, so /progress never double-counts or misses a turn
+"""
+
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlmodel import Session
+
+from . import mastery
+from .config import get_settings
+from .metrics import timed
+from .models import Progress, TenantProgress
+from .shards import get_router
+
+log = logging.getLogger(__name__)
+
+Key = tuple[int, int]  # (learner_id, concept_id)
+Delta = list[int]  # [attempts, correct, recent_bits, recent_count]
+
+
+def _new_delta() -> Delta:
+    return [0, 0, 0, 0]
+
+
+def _absorb(into: Delta, later: Delta):
+    """Fold *later* (newer attempts) into *into* in place."""
+    into[0] += later[0]
+    into[1] += later[1]
+    into[2], into[3] = mastery.merge(into[2], into[3], later[2], later[3])
+
+
+def _insert_for(session: Session):
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+def _upsert_tenants(session: Session, totals: dict[int, list[int]]):
+    """Bump version (+ add totals) of each tenant's TenantProgress row."""
+    insert = _insert_for(session)
+    if insert is None:
+        for tenant_id, (attempts, correct) in totals.items():
+            agg = session.get(TenantProgress, tenant_id) or TenantProgress(tenant_id=tenant_id)
+            agg.version += 1
+            agg.attempts += attempts
+            agg.correct += correct
+            session.add(agg)
+        return
+    table = TenantProgress.__table__
+    stmt = insert(table).values([
+        {"tenant_id": tid, "version": 1, "attempts": a, "correct": c}
+        for tid, (a, c) in totals.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.tenant_id],
+        set_={
+            "version": table.c.version + 1,
+            "attempts": table.c.attempts + stmt.excluded.attempts,
+            "correct": table.c.correct + stmt.excluded.correct,
+        },
+    )
+    session.exec(stmt)  # type: ignore[call-overload]
+
+
+def touch_tenant(session: Session, tenant_id: int):
+    """Roster changed: invalidate the tenant's heat-map ETag inside *session*."""
+    _upsert_tenants(session, {tenant_id: [0, 0]})
+
+
+def _bulk_upsert(session: Session, batch: dict[Key, Delta], tenants: dict[int, int]):
+    totals: dict[int, list[int]] = {}
+    for (lid, _), (a, c, _, _) in batch.items():
+        total = totals.setdefault(tenants[lid], [0, 0])
+        total[0] += a
+        total[1] += c
+    _upsert_tenants(session, totals)
+
+    rows = [
+        {
+            "learner_id": lid,
+            "concept_id": cid,
+            "tenant_id": tenants[lid],
+            "attempts": a,
+            "correct": c,
+            "recent_bits": bits,
+            "recent_count": n,
+            "mastered": mastery.is_mastered(bits, n),
+        }
+        for (lid, cid), (a, c, bits, n) in batch.items()
+    ]
+    insert = _insert_for(session)
+    if insert is None:
+        for row in rows:  # no portable upsert: fall back to read-modify-write
+            prog = session.get(Progress, (row["learner_id"], row["concept_id"]))
+            if prog is None:
+                prog = Progress(
+                    learner_id=row["learner_id"],
+                    concept_id=row["concept_id"],
+                    tenant_id=row["tenant_id"],
+                )
+            prog.attempts += row["attempts"]
+            prog.correct += row["correct"]
+            prog.recent_bits, prog.recent_count = mastery.merge(
+                prog.recent_bits, prog.recent_count, row["recent_bits"], row["recent_count"]
+            )
+            prog.mastered = mastery.is_mastered(prog.recent_bits, prog.recent_count)
+            session.add(prog)
+        return
+
+    table = Progress.__table__
+    stmt = insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.learner_id, table.c.concept_id],
+        set_={
+            "attempts": table.c.attempts + stmt.excluded.attempts,
+            "correct": table.c.correct + stmt.excluded.correct,
+            **mastery.sql_merge(
+                table.c.recent_bits,
+                table.c.recent_count,
+                stmt.excluded.recent_bits,
+                stmt.excluded.recent_count,
+            ),
+        },
+    )
+    session.exec(stmt)  # type: ignore[call-overload]
+
+
+class ProgressRecorder:
+    def __init__(self):
+        cfg = get_settings()
+        self.flush_max = cfg.progress_flush_max
+        self.interval = cfg.progress_flush_interval_s
+        self._pending: dict[Key, Delta] = {}
+        self._pending_count = 0
+        self._inflight: dict[Key, Delta] = {}
+        self._tenants: dict[int, int] = {}  # learner_id → tenant_id
+        self._cond = threading.Condition()
+        self._commit_lock = threading.Lock()  # flush commit vs. overlay reads
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+
+    # ── producer side ────────────────────────────────────────────────────────
+    def record(self, learner_id: int, concept_id: int, correct: bool, tenant_id: int):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("progress recorder is closed")
+            self._tenants[learner_id] = tenant_id
+            entry = self._pending.setdefault((learner_id, concept_id), _new_delta())
+            entry[0] += 1
+            entry[1] += int(correct)
+            entry[2], entry[3] = mastery.push(entry[2], entry[3], correct)
+            self._pending_count += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="progress-flusher", daemon=True
+                )
+                self._thread.start()
+            if self._pending_count >= self.flush_max:
+                self._cond.notify()
+
+    # ── flusher ──────────────────────────────────────────────────────────────
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and self._pending_count < self.flush_max:
+                    self._cond.wait(self.interval)
+                if self._closed:
+                    return  # close() does the final flush itself
+            self.flush()
+
+    def flush(self) -> int:
+        """Write everything pending now; returns the number of rows upserted."""
+        with self._commit_lock:
+            return self._flush_locked()
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Flush, then hold off further commits until the block exits."""
+        with self._commit_lock:
+            self._flush_locked()
+            yield
+
+    def _requeue(self, batch: dict[Key, Delta]):
+        with self._cond:
+            for key, delta in batch.items():
+                self._pending_count += delta[0]
+                # the failed batch is older than anything recorded since
+                newer = self._pending.get(key)
+                if newer is not None:
+                    _absorb(delta, newer)
+                self._pending[key] = delta
+
+    def _flush_locked(self) -> int:
+        with self._cond:
+            batch, self._pending = self._pending, {}
+            self._pending_count = 0
+            self._inflight = batch
+            tenants = dict(self._tenants)
+        if not batch:
+            return 0
+        # one transaction per shard; a failing shard only re-queues its rows
+        router = get_router()
+        by_shard: dict[str, dict[Key, Delta]] = {}
+        for key, delta in batch.items():
+            by_shard.setdefault(router.shard_of(tenants[key[0]]), {})[key] = delta
+        written = 0
+        try:
+            for shard, part in by_shard.items():
+                try:
+                    with timed("progress_flush"), Session(router.engine(shard)) as session:
+                        _bulk_upsert(session, part, tenants)
+                        session.commit()
+                except Exception:
+                    self.failures += 1
+                    log.exception(
+                        "progress flush to shard %s failed; %d rows re-queued", shard, len(part)
+                    )
+                    self._requeue(part)
+                    continue
+                written += len(part)
+        finally:
+            with self._cond:
+                self._inflight = {}
+        if not written:
+            return 0
+        with self._cond:
+            still_pending = {lid for lid, _ in self._pending}
+            for lid in tenants.keys() - still_pending:
+                self._tenants.pop(lid, None)
+        self.flushes += 1
+        self.rows_written += written
+        return written
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    # ── read-your-writes ─────────────────────────────────────────────────────
+    @contextmanager
+    def overlay(self, learner_id: int) -> Iterator[dict[int, Delta]]:
+        """
+        Hold off commits while the caller reads the learner's rows; yields
+        {concept_id: [attempts, correct, recent_bits, recent_count]} not yet
+        visible in the database (apply with mastery.merge for the bits).
+        """
+        with self._commit_lock:
+            with self._cond:
+                deltas: dict[int, Delta] = {}
+                for source in (self._inflight, self._pending):  # oldest first
+                    for (lid, cid), delta in source.items():
+                        if lid == learner_id:
+                            _absorb(deltas.setdefault(cid, _new_delta()), delta)
+            yield deltas
+
+    def stats(self) -> dict:
+        return {
+            "pending_attempts": self._pending_count,
+            "pending_rows": len(self._pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+        }
+
+
+_recorder: Optional[ProgressRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_progress_recorder() -> ProgressRecorder:
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = ProgressRecorder()
+    return _recorder
+
+
+def shutdown_progress_recorder():
+    """Flush and stop; a later record() starts a fresh recorder."""
+    global _recorder
+    with _recorder_lock:
+        recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.close()
+
+
+atexit.register(shutdown_progress_recorder)
@@ -0,0 +1,220 @@
+"""
+reply_cache.py – cache of tutor replies in front of the LLM gateway.
+
+• Key = sha256(model, system prompt, history, normalized utterance);
+  normalisation folds case, Unicode width, whitespace and trailing
+  punctuation, so "What is 2+3?" and "what is 2+3" share a reply
+• Early turns are cacheable too: with at most reply_cache_max_history_turns
+  earlier exchanges replayed, the history is part of the key (learner
+  turns normalized, tutor turns verbatim), so every learner who opened
+  with "hi" and got the same answer shares the reply to "I don't know".
+  Longer conversations are practically unique and are not cached
+• Entries expire after reply_cache_ttl_s; the least-recently-used ones are
+  evicted once reply_cache_max_entries or reply_cache_max_bytes is reached
+• Concurrent misses for one key are coalesced: the first caller asks the
+  LLM, the others await its answer
+• Replies are stored as moderated.  Stub replies (no API key / gateway
+  gave up) and withheld ones (SAFE_FALLBACK, possibly a moderation
+  outage) are never stored, and neither are streamed replies – a stream cut short still looks finished
+  – but streams are served from the cache on a hit
+• Tenants can opt out (Tenant.reply_cache_opt_out); the flag is cached for
+  reply_cache_tenant_ttl_s so the check costs no query per turn
+"""
+
+import asyncio
+import hashlib
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+
+from .cache import TTLCache
+from .config import get_settings
+from .llm import STUB_REPLY
+from .moderation import SAFE_FALLBACK
+from .models import Tenant, _engine
+
+ENTRY_OVERHEAD = 200  # OrderedDict slot + tuple + float, roughly
+
+_SPACES = re.compile(r"\s+")
+_EDGE_PUNCT = " \t\n.,!?;:…¡¿"
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _SPACES.sub(" ", text).strip(_EDGE_PUNCT)
+
+
+def cache_key(model: str, messages: list[dict[str, str]]) -> Optional[str]:
+    """
+    Key for [system, (user, assistant)…, user]; None for any other shape or
+    more than reply_cache_max_history_turns earlier exchanges.
+    """
+    if len(messages) % 2 or messages[0]["role"] != "system":
+        return None
+    turns = messages[1:]
+    if len(turns) // 2 > get_settings().reply_cache_max_history_turns:
+        return None
+    parts = [model, messages[0]["content"]]
+    for i, msg in enumerate(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        if msg["role"] != role:
+            return None
+        parts.append(normalize(msg["content"]) if role == "user" else msg["content"])
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def _entry_bytes(key: str, reply: str) -> int:
+    return sys.getsizeof(key) + sys.getsizeof(reply) + ENTRY_OVERHEAD
+
+
+def _tenant_opted_out(tenant_id: int) -> bool:
+    with Session(_engine()) as session:
+        tenant = session.get(Tenant, tenant_id)
+        return bool(tenant and tenant.reply_cache_opt_out)
+
+
+class ReplyCache:
+    def __init__(self):
+        cfg = get_settings()
+        self.enabled = cfg.reply_cache_enabled
+        self.ttl = cfg.reply_cache_ttl_s
+        self.max_entries = cfg.reply_cache_max_entries
+        self.max_bytes = cfg.reply_cache_max_bytes
+        self._data: OrderedDict[str, tuple[float, str, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()  # TestClient / several loops share the cache
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._opt_out: TTLCache[bool] = TTLCache(
+            cfg.reply_cache_tenant_cache_size, cfg.reply_cache_tenant_ttl_s
+        )
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    # ── storage ──────────────────────────────────────────────────────────────
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, reply: str):
+        size = _entry_bytes(key, reply)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, reply, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def _drop(self, key: str):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+        self._opt_out.clear()
+
+    # ── tenant opt-out ───────────────────────────────────────────────────────
+    async def enabled_for(self, tenant_id: Optional[int]) -> bool:
+        if not self.enabled:
+            return False
+        if tenant_id is None:
+            return True
+        opted_out = self._opt_out.get(tenant_id)
+        if opted_out is None:
+            opted_out = await run_in_threadpool(_tenant_opted_out, tenant_id)
+            self._opt_out.put(tenant_id, opted_out)
+        return not opted_out
+
+    def forget_tenant(self, tenant_id: int):
+        """The tenant's opt-out flag changed; re-read it on the next turn."""
+        self._opt_out.pop(tenant_id)
+
+    # ── lookup with single-flight ────────────────────────────────────────────
+    def lookup(self, key: str) -> Optional[str]:
+        """get() that counts towards hits / misses (streaming path)."""
+        reply = self.get(key)
+        if reply is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return reply
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        loop = asyncio.get_running_loop()
+        while True:
+            reply = self.get(key)
+            if reply is not None:
+                self.hits += 1
+                return reply
+            pending = self._inflight.get(key)
+            if pending is None or pending.get_loop() is not loop:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except Exception:
+                continue  # leader failed / was cancelled → try ourselves
+
+        self.misses += 1
+        done: asyncio.Future = loop.create_future()
+        self._inflight[key] = done
+        try:
+            reply = await compute()
+            if reply != STUB_REPLY and SAFE_FALLBACK not in reply:
+                self.put(key, reply)
+            done.set_result(reply)
+            return reply
+        except BaseException as exc:
+            done.set_exception(exc if isinstance(exc, Exception) else RuntimeError("abandoned"))
+            done.exception()  # mark retrieved; waiters handle it themselves
+            raise
+        finally:
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
+
+
+_cache: Optional[ReplyCache] = None
+
+
+def get_reply_cache() -> ReplyCache:
+    global _cache
+    if _cache is None:
+        _cache = ReplyCache()
+    return _cache
+
+
+def reset_reply_cache():
+    global _cache
+    _cache = None
@@ -0,0 +1,295 @@
+"""
+roster.py – bulk learner import for classroom tenants.
+
+POST /learners/import?format=csv|ndjson   body: the roster file, streamed
+GET  /learners/import/{job_id}
+
+• The body streams into a spool (RAM up to roster_spool_bytes, then a temp
+  file) with a hard cap of roster_max_bytes (413)
+• Rows are read one line at a time and validated against LearnerCreate; a
+  bad row is reported with its line number and skipped, it never fails the
+  whole import
+• Valid rows are written roster_batch_rows at a time: one id reservation
+  in the directory, then one executemany INSERT plus the heat-map touch in
+  a single transaction on the tenant's shard
+• Uploads up to roster_inline_bytes are imported before the response
+  (200 + summary).  Larger ones, or ?background=true, become a job on a
+  single import thread: 202 + Location of the job, which reports progress
+  and then the same summary.  Jobs live in this worker's memory
+
+CSV: a header naming at least name and dob, then one learner per line.
+NDJSON: one {"name": …, "dob": …} object per line.
+"""
+
+import csv
+import io
+import json
+import logging
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from .auth import Principal, current_principal, current_user
+from .cache import TTLCache
+from .config import get_settings
+from .models import Learner, User
+from .progress import touch_tenant
+from .schemas import LearnerCreate
+from .shards import register_learners, tenant_session
+
+log = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/learners", tags=["roster"])
+
+FORMATS = ("csv", "ndjson")
+REQUIRED_COLUMNS = ("name", "dob")
+
+
+class RosterError(ValueError):
+    """The file as a whole can't be imported (bad header, not UTF-8)."""
+
+
+@dataclass
+class ImportJob:
+    id: str
+    tenant_id: int
+    status: str = "queued"  # queued | running | done | failed
+    rows: int = 0  # data rows read so far
+    created: int = 0
+    failed: int = 0
+    errors: list[dict] = field(default_factory=list)  # first roster_max_errors
+    detail: Optional[str] = None  # why a failed job stopped
+
+    def error(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < get_settings().roster_max_errors:
+            self.errors.append({"row": row, "error": message})
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "detail": self.detail,
+        }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Parsing
+# ──────────────────────────────────────────────────────────────────────────────
+def _lines(file: BinaryIO) -> Iterator[tuple[int, str]]:
+    file.seek(0)
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        for n, line in enumerate(text, 1):
+            if line.strip():
+                yield n, line
+    except UnicodeDecodeError:
+        raise RosterError("roster is not UTF-8 text")
+    finally:
+        text.detach()  # the caller closes the spool
+
+
+def _records(file: BinaryIO, fmt: str) -> Iterator[tuple[int, Optional[dict], str]]:
+    """(line number, fields, error) per data row; fields is None on error."""
+    if fmt == "ndjson":
+        for n, line in _lines(file):
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                yield n, None, "invalid JSON"
+                continue
+            if isinstance(obj, dict):
+                yield n, obj, ""
+            else:
+                yield n, None, "expected a JSON object"
+        return
+
+    header: Optional[list[str]] = None
+    for n, line in _lines(file):
+        try:
+            fields = next(csv.reader([line]))
+        except csv.Error as exc:
+            yield n, None, f"invalid CSV: {exc}"
+            continue
+        if header is None:
+            header = [h.strip().lower() for h in fields]
+            missing = [c for c in REQUIRED_COLUMNS if c not in header]
+            if missing:
+                raise RosterError(f"CSV header lacks {', '.join(missing)}")
+            continue
+        if len(fields) != len(header):
+            yield n, None, f"expected {len(header)} fields, got {len(fields)}"
+            continue
+        yield n, dict(zip(header, fields)), ""
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors()
+    )
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Import
+# ──────────────────────────────────────────────────────────────────────────────
+def _insert(tenant_id: int, rows: list[LearnerCreate]):
+    ids = register_learners(tenant_id, len(rows))
+    with tenant_session(tenant_id) as session:
+        session.exec(  # type: ignore[call-overload]
+            insert(Learner),
+            params=[
+                {"id": i, "tenant_id": tenant_id, "name": r.name, "dob": r.dob,
+                 "persona_json": "{}"}
+                for i, r in zip(ids, rows)
+            ],
+        )
+        touch_tenant(session, tenant_id)  # new heat-map rows
+        session.commit()
+
+
+def _write(job: ImportJob, batch: list[tuple[int, LearnerCreate]]):
+    if not batch:
+        return
+    try:
+        _insert(job.tenant_id, [row for _, row in batch])
+    except SQLAlchemyError:
+        log.exception("roster batch of %d rows failed (job %s)", len(batch), job.id)
+        for n, _ in batch:
+            job.error(n, "not saved: database error")
+        return
+    job.created += len(batch)
+
+
+def run_import(job: ImportJob, file: BinaryIO, fmt: str):
+    """Read, validate and insert the spooled roster; closes *file*."""
+    batch_rows = get_settings().roster_batch_rows
+    job.status = "running"
+    batch: list[tuple[int, LearnerCreate]] = []
+    try:
+        for n, fields, error in _records(file, fmt):
+            job.rows += 1
+            if fields is None:
+                job.error(n, error)
+                continue
+            try:
+                batch.append((n, LearnerCreate.parse_obj(fields)))
+            except ValidationError as exc:
+                job.error(n, _validation_message(exc))
+                continue
+            if len(batch) >= batch_rows:
+                _write(job, batch)
+                batch = []
+        _write(job, batch)
+    except RosterError as exc:
+        job.status, job.detail = "failed", str(exc)
+    except Exception:  # noqa: BLE001 – a background job has nobody to raise to
+        log.exception("roster import %s failed", job.id)
+        job.status, job.detail = "failed", "import failed"
+    else:
+        job.status = "done"
+    finally:
+        file.close()
+
+
+class RosterImports:
+    """One background import thread plus the jobs it has seen."""
+
+    def __init__(self):
+        cfg = get_settings()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="roster-import")
+        self._jobs: TTLCache[ImportJob] = TTLCache(10_000, cfg.roster_job_ttl_s)
+
+    def submit(self, job: ImportJob, file: BinaryIO, fmt: str):
+        self._jobs.put(job.id, job)
+        self._executor.submit(self._run, job, file, fmt)
+
+    def _run(self, job: ImportJob, file: BinaryIO, fmt: str):
+        run_import(job, file, fmt)
+        self._jobs.put(job.id, job)  # a finished job stays for a full TTL
+
+    def job(self, job_id: str) -> Optional[ImportJob]:
+        return self._jobs.get(job_id)
+
+    def shutdown(self):
+        """Let the running import finish; queued ones are dropped."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_imports: Optional[RosterImports] = None
+
+
+def get_roster_imports() -> RosterImports:
+    global _imports
+    if _imports is None:
+        _imports = RosterImports()
+    return _imports
+
+
+def shutdown_roster_imports():
+    global _imports
+    if _imports is not None:
+        _imports.shutdown()
+        _imports = None
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Routes
+# ──────────────────────────────────────────────────────────────────────────────
+async def _spool(request: Request) -> tuple[BinaryIO, int]:
+    cfg = get_settings()
+    spool = tempfile.SpooledTemporaryFile(max_size=cfg.roster_spool_bytes)
+    size = 0
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > cfg.roster_max_bytes:
+                raise HTTPException(413, f"Roster larger than {cfg.roster_max_bytes} bytes")
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    return spool, size
+
+
+@router.post("/import")
+async def import_roster(
+    request: Request,
+    format: str = "csv",
+    background: bool = False,
+    user: User = Depends(current_user),
+):
+    """Create the learners in a CSV / NDJSON roster; see the module docstring."""
+    if format not in FORMATS:
+        raise HTTPException(400, "format must be csv or ndjson")
+    spool, size = await _spool(request)
+    job = ImportJob(id=uuid.uuid4().hex, tenant_id=user.tenant_id)
+    if background or size > get_settings().roster_inline_bytes:
+        get_roster_imports().submit(job, spool, format)
+        return JSONResponse(
+            job.summary(), status_code=202, headers={"Location": f"/learners/import/{job.id}"}
+        )
+    await run_in_threadpool(run_import, job, spool, format)
+    if job.status == "failed":
+        raise HTTPException(400, job.detail)
+    return job.summary()
+
+
+@router.get("/import/{job_id}")
+def import_status(job_id: str, user: Principal = Depends(current_principal)):
+    job = get_roster_imports().job(job_id)
+    if job is None or job.tenant_id != user.tenant_id:
+        raise HTTPException(404, "Unknown import job")
+    return job.summary()
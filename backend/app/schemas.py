@@ -1,4 +1,9 @@
-from pydantic import BaseModel, EmailStr
+import re
+from typing import Optional
+
+from pydantic import BaseModel, EmailStr, validator
+
+_YEAR_MONTH = re.compile(r"\d{4}-(0[1-9]|1[0-2])")
 
 
 class UserCreate(BaseModel):
@@ -15,3 +20,21 @@ class TokenOut(BaseModel):
 class LearnerCreate(BaseModel):
     name: str
     dob: str      # YYYY-MM
+
+    @validator("name")
+    def _name(cls, v: str) -> str:
+        v = v.strip()
+        if not 0 < len(v) <= 100:
+            raise ValueError("name must be 1-100 characters")
+        return v
+
+    @validator("dob")
+    def _dob(cls, v: str) -> str:
+        v = v.strip()
+        if not _YEAR_MONTH.fullmatch(v):
+            raise ValueError("dob must be YYYY-MM")
+        return v
+
+
+class TenantSettings(BaseModel):
+    reply_cache_opt_out: Optional[bool] = None  # keep tutor replies out of the shared cache
@@ -0,0 +1,246 @@
+"""
+shards.py – per-tenant database routing.
+
+Tenants live on one of the databases named in db_shards ({name: URL};
+separate SQLite files, Postgres URLs or schemas of one server).  The
+"default" shard is DATABASE_URL, which also holds the directory:
+
+• Directory tables (default database only): Tenant, User, Concept,
+  TenantShard (tenant → shard; no row = default) and LearnerRegistry,
+  which hands out learner ids so they never collide between shards and
+  survive a move
+• Tenant tables (the tenant's shard): Learner, Progress, TenantProgress.
+  Every shard has the full schema plus copies of its tenants' Tenant rows
+  and of the concepts, so foreign keys hold on Postgres as well
+• shard_of() answers from a TTL cache of the directory; with no extra
+  shards configured it never reads it at all
+• Signups are spread round-robin over db_new_tenant_shards
+• move_tenant() copies a tenant's rows, flips the directory and deletes the
+  old copies.  It is a maintenance operation: other workers follow the
+  move within db_shard_cache_ttl_s, so quiesce the tenant meanwhile
+
+Call sites just ask for tenant_session(tenant_id) / tenant_engine(...)
+where they used Session(_engine()).
+"""
+
+import itertools
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from .cache import TTLCache
+from .config import get_settings
+from .migrations import migrate
+from .models import (
+    Concept, Learner, LearnerRegistry, Progress, Tenant, TenantProgress, TenantShard,
+    _engine, get_engine,
+)
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SHARD = "default"
+COPY_ROWS = 5000  # rows per INSERT when moving a tenant
+
+
+class TenantRouter:
+    def __init__(self):
+        cfg = get_settings()
+        # None → get_engine() falls back to $DATABASE_URL
+        self.urls: dict[str, Optional[str]] = {DEFAULT_SHARD: None, **cfg.db_shards}
+        unknown = set(cfg.db_new_tenant_shards) - self.urls.keys()
+        if unknown:
+            raise ValueError(f"db_new_tenant_shards names unknown shards: {sorted(unknown)}")
+        self.sharded = len(self.urls) > 1
+        self.placement = list(cfg.db_new_tenant_shards) or [DEFAULT_SHARD]
+        self._next = itertools.count()
+        self._directory: TTLCache[str] = TTLCache(
+            cfg.db_shard_cache_size, cfg.db_shard_cache_ttl_s
+        )
+        self.lookups = 0
+
+    def _lookup(self, tenant_id: int) -> str:
+        self.lookups += 1
+        with Session(_engine()) as session:
+            row = session.get(TenantShard, tenant_id)
+        return row.shard if row is not None else DEFAULT_SHARD
+
+    def shard_of(self, tenant_id: Optional[int]) -> str:
+        if not self.sharded or tenant_id is None:
+            return DEFAULT_SHARD
+        shard = self._directory.get(tenant_id)
+        if shard is None:
+            shard = self._lookup(tenant_id)
+            self._directory.put(tenant_id, shard)
+        return shard
+
+    def engine(self, shard: str) -> Engine:
+        return get_engine(self.urls[shard])
+
+    def engine_for(self, tenant_id: Optional[int]) -> Engine:
+        return self.engine(self.shard_of(tenant_id))
+
+    def forget(self, tenant_id: int):
+        self._directory.pop(tenant_id)
+
+    def place(self, session: Session, tenant: Tenant) -> str:
+        """Pick a shard for a new tenant; adds its directory row to *session*."""
+        shard = self.placement[next(self._next) % len(self.placement)]
+        if shard != DEFAULT_SHARD:
+            session.add(TenantShard(tenant_id=tenant.id, shard=shard))
+        self._directory.put(tenant.id, shard)
+        return shard
+
+    def stats(self) -> dict:
+        return {
+            "shards": sorted(self.urls),
+            "directory_lookups": self.lookups,
+            "cache_hits": self._directory.hits,
+        }
+
+
+_router: Optional[TenantRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> TenantRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = TenantRouter()
+    return _router
+
+
+def reset_router():
+    """Forget the router (tests / settings changes); rebuilt on next use."""
+    global _router
+    _router = None
+
+
+def tenant_engine(tenant_id: Optional[int]) -> Engine:
+    return get_router().engine_for(tenant_id)
+
+
+def tenant_session(tenant_id: Optional[int]) -> Session:
+    """Session on the shard holding *tenant_id*'s learners and progress."""
+    return Session(tenant_engine(tenant_id))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Writes that span the directory and a shard
+# ──────────────────────────────────────────────────────────────────────────────
+def register_learners(tenant_id: int, n: int = 1) -> list[int]:
+    """Reserve *n* learner ids in the directory, in order."""
+    with _engine().begin() as conn:
+        return list(conn.execute(
+            insert(LearnerRegistry)
+            .returning(LearnerRegistry.id, sort_by_parameter_order=True),
+            [{"tenant_id": tenant_id}] * n,
+        ).scalars())
+
+
+def mirror_tenant(tenant: Tenant, shard: str):
+    """Copy the Tenant row to *shard*, for its learners' foreign key."""
+    if shard == DEFAULT_SHARD:
+        return
+    with Session(get_router().engine(shard)) as session:
+        if session.get(Tenant, tenant.id) is None:
+            session.add(Tenant(id=tenant.id, name=tenant.name, plan=tenant.plan))
+            session.commit()
+
+
+def _sync_concepts(engine: Engine, concepts: list[dict]):
+    with engine.begin() as conn:
+        have = set(conn.execute(select(Concept.id)).scalars())
+        missing = [c for c in concepts if c["id"] not in have]
+        if missing:
+            conn.execute(insert(Concept), missing)
+
+
+def init_shards():
+    """Startup phase "shards": schema + concept copies on every extra shard."""
+    router = get_router()
+    if not router.sharded:
+        return
+    with _engine().connect() as conn:
+        concepts = [dict(r._mapping) for r in conn.execute(select(Concept.__table__))]
+    for name in router.urls:
+        if name == DEFAULT_SHARD:
+            continue
+        engine = router.engine(name)
+        migrate(engine)
+        _sync_concepts(engine, concepts)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Moving a tenant
+# ──────────────────────────────────────────────────────────────────────────────
+TENANT_TABLES = (Learner, Progress, TenantProgress)  # parents first
+
+
+def _copy(src: Engine, dst_conn, table, tenant_id: int) -> int:
+    stmt = (
+        select(table.__table__)
+        .where(table.tenant_id == tenant_id)
+        .execution_options(stream_results=True, yield_per=COPY_ROWS)
+    )
+    copied = 0
+    with src.connect() as src_conn:
+        for rows in src_conn.execute(stmt).mappings().partitions(COPY_ROWS):
+            dst_conn.execute(insert(table), [dict(r) for r in rows])
+            copied += len(rows)
+    return copied
+
+
+def _delete_tenant_rows(conn, tenant_id: int):
+    for table in reversed(TENANT_TABLES):  # children first
+        conn.execute(delete(table).where(table.tenant_id == tenant_id))
+
+
+def move_tenant(tenant_id: int, target: str) -> dict[str, int]:
+    """Move *tenant_id*'s learners and progress to shard *target*."""
+    from .progress import get_progress_recorder
+
+    router = get_router()
+    if target not in router.urls:
+        raise ValueError(f"unknown shard {target!r}")
+    source = router._lookup(tenant_id)  # the directory itself, not the cache
+    if source == target:
+        return {}
+    with Session(_engine()) as session:
+        tenant = session.get(Tenant, tenant_id)
+    if tenant is None:
+        raise ValueError(f"unknown tenant {tenant_id}")
+
+    src, dst = router.engine(source), router.engine(target)
+    mirror_tenant(tenant, target)
+    copied = {}
+    # buffered attempts land on the source first; no flush runs until the flip
+    with get_progress_recorder().paused():
+        with dst.begin() as conn:
+            _delete_tenant_rows(conn, tenant_id)  # leftovers of an interrupted move
+            for table in TENANT_TABLES:
+                copied[table.__tablename__] = _copy(src, conn, table, tenant_id)
+        with Session(_engine()) as session:
+            row = session.get(TenantShard, tenant_id)
+            if target == DEFAULT_SHARD:
+                if row is not None:
+                    session.delete(row)
+            elif row is None:
+                session.add(TenantShard(tenant_id=tenant_id, shard=target))
+            else:
+                row.shard = target
+                session.add(row)
+            session.commit()
+        router.forget(tenant_id)
+
+    with src.begin() as conn:
+        _delete_tenant_rows(conn, tenant_id)
+        if source != DEFAULT_SHARD:
+            conn.execute(delete(Tenant).where(Tenant.id == tenant_id))
+    log.info("moved tenant %d %s → %s: %s", tenant_id, source, target, copied)
+    return copied
@@ -0,0 +1,223 @@
+"""
+stt.py – Whisper inference pool used by the voice routes.
+
+• transcribe() never blocks the event loop: the CPU-bound Whisper call
+  runs in a ProcessPoolExecutor (one model per worker, all cores used)
+  or, with stt_executor="thread", a small in-process thread pool
+• Optional preload at startup: workers are spawned and the model loaded
+  before the first request instead of inside it
+• Micro-batching: short clips arriving within stt_batch_window_ms are
+  shipped to one worker as a single task (one IPC round trip, warm caches)
+• Backpressure: once stt_max_queue clips are waiting, new uploads get
+  STTBusy, which the routes turn into HTTP 503
+"""
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional
+
+from .config import get_settings
+
+if TYPE_CHECKING:
+    import numpy as np
+
+log = logging.getLogger(__name__)
+
+WHISPER_SR = 16_000  # Whisper expects 16 kHz mono float32
+
+
+class STTBusy(Exception):
+    """Raised when the transcription queue is full."""
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Worker side (runs in the pool processes / threads)
+# ──────────────────────────────────────────────────────────────────────────────
+_stt_model = None
+_model_name = "tiny"
+_model_loader: Optional[str] = None
+
+
+def _init_worker(
+    model_name: str, loader: Optional[str], threads: int, preload: bool = False
+):
+    global _model_name, _model_loader
+    _model_name, _model_loader = model_name, loader
+    if threads:
+        try:
+            import torch
+
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    if preload:
+        # every process loads before taking work; warm-up tasks alone can
+        # all land on whichever worker happens to be idle first
+        _get_whisper_model()
+
+
+def _get_whisper_model():
+    """Load the Whisper model (or the configured stand-in) on first use."""
+    global _stt_model
+    if _stt_model is None:
+        if _model_loader:
+            # "package.module:factory" – lets benchmarks/tests plug in a fake
+            mod, _, attr = _model_loader.partition(":")
+            _stt_model = getattr(importlib.import_module(mod), attr)()
+        else:
+            import whisper  # local import → avoids CI import failure
+            _stt_model = whisper.load_model(_model_name)
+    return _stt_model
+
+
+def _warm_up() -> int:
+    _get_whisper_model()
+    return os.getpid()
+
+
+def _transcribe_batch(clips: list["np.ndarray"]) -> list[str]:
+    model = _get_whisper_model()
+    return [model.transcribe(clip)["text"].strip() for clip in clips]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Pool (event-loop side)
+# ──────────────────────────────────────────────────────────────────────────────
+class STTPool:
+    def __init__(self):
+        cfg = get_settings()
+        self.workers = cfg.stt_workers or os.cpu_count() or 1
+        self.kind = cfg.stt_executor
+        self._executor: Optional[Executor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: list[tuple["np.ndarray", asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.depth = 0  # clips accepted but not yet answered
+        self.batches = 0
+        self.clips = 0
+
+    def _ensure_executor(self) -> Executor:
+        if self._executor is None:
+            cfg = get_settings()
+            init_args = (cfg.stt_model_name, cfg.stt_model_loader, cfg.stt_threads_per_worker)
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # spawn: forking a process that already holds torch threads can deadlock
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=init_args + (cfg.stt_preload,),
+                )
+            else:
+                _init_worker(*init_args)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="stt"
+                )
+        return self._executor
+
+    async def start(self, warm: bool = True):
+        """
+        Spawn workers and (optionally) wait until they are ready.  Process
+        workers load the model in their initializer when stt_preload is on,
+        so one task per worker forces every process up; threads share one
+        module-level model, so a single warm-up covers them all.
+        """
+        executor = self._ensure_executor()
+        if warm:
+            loop = asyncio.get_running_loop()
+            n = self.workers if self.kind == "process" else 1
+            pids = await asyncio.gather(
+                *(loop.run_in_executor(executor, _warm_up) for _ in range(n))
+            )
+            log.info("STT pool warm: %d worker(s) %s", len(set(pids)), sorted(set(pids)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "queue_depth": self.depth,
+            "batches": self.batches,
+            "clips": self.clips,
+        }
+
+    async def transcribe(self, clip: "np.ndarray", batch: bool = True) -> str:
+        """
+        Text of *clip*.  batch=False sends it to a worker on its own, so the
+        segments of one recording (audio.trim_silence) run side by side
+        instead of one after another inside a batch.
+        """
+        cfg = get_settings()
+        if self.depth >= cfg.stt_max_queue:
+            raise STTBusy(f"{self.depth} clips queued")
+
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # a batch left on a previous (closed) loop can never be flushed
+            self._loop, self._pending, self._timer = loop, [], None
+
+        fut = loop.create_future()
+        self.depth += 1
+        try:
+            if not batch or len(clip) > cfg.stt_batch_max_seconds * WHISPER_SR:
+                self._submit([(clip, fut)])  # long clip: no point waiting for company
+            else:
+                self._pending.append((clip, fut))
+                if len(self._pending) >= cfg.stt_batch_max:
+                    self._flush()
+                elif self._timer is None:
+                    self._timer = loop.call_later(cfg.stt_batch_window_ms / 1000, self._flush)
+            return await fut
+        finally:
+            self.depth -= 1
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._submit(batch)
+
+    def _submit(self, batch: list[tuple["np.ndarray", asyncio.Future]]):
+        self.batches += 1
+        self.clips += len(batch)
+        cf = self._ensure_executor().submit(_transcribe_batch, [clip for clip, _ in batch])
+        futures = [fut for _, fut in batch]
+
+        def _done(result: asyncio.Future):
+            exc = result.exception()
+            for i, fut in enumerate(futures):
+                if fut.done():
+                    continue
+                if exc is not None:
+                    fut.set_exception(exc)
+                else:
+                    fut.set_result(result.result()[i])
+
+        asyncio.wrap_future(cf, loop=self._loop).add_done_callback(_done)
+
+
+_pool: Optional[STTPool] = None
+
+
+def get_stt_pool() -> STTPool:
+    global _pool
+    if _pool is None:
+        _pool = STTPool()
+    return _pool
+
+
+def shutdown_stt_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
@@ -0,0 +1,255 @@
+"""
+tts_cache.py – content-addressed cache in front of text-to-speech.
+
+• Key = sha256(voice, text); the same reply in the same voice is never
+  synthesized twice (stub reply, encouragement phrases, re-plays…)
+• Two tiers: in-memory LRU (small clips, bounded by total bytes) and an
+  on-disk directory bounded by size, evicted least-recently-used by mtime
+• Concurrent misses for one key are coalesced: the first caller streams
+  from the synthesizer and tees into the cache, the others wait for it
+• Synthesizer is pluggable (tts_synthesizer="module:factory") so tests and
+  benchmarks can swap edge-tts for a local fake
+"""
+
+import asyncio
+import hashlib
+import importlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Protocol
+
+from .config import get_settings
+from .metrics import timed
+
+
+class Synthesizer(Protocol):
+    def stream(self, text: str, voice: str) -> AsyncIterator[bytes]:
+        """Yield MP3 chunks for *text*."""
+
+
+class EdgeTTSSynthesizer:
+    async def stream(self, text: str, voice: str) -> AsyncIterator[bytes]:
+        import edge_tts  # local import → safe for CI
+
+        communicator = edge_tts.Communicate(text, voice)
+        async for chunk in communicator.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
+
+_synthesizer: Optional[Synthesizer] = None
+
+
+def get_synthesizer() -> Synthesizer:
+    global _synthesizer
+    if _synthesizer is None:
+        loader = get_settings().tts_synthesizer
+        if loader:
+            mod, _, attr = loader.partition(":")
+            _synthesizer = getattr(importlib.import_module(mod), attr)()
+        else:
+            _synthesizer = EdgeTTSSynthesizer()
+    return _synthesizer
+
+
+def set_synthesizer(synth: Optional[Synthesizer]):
+    """Swap the backend (None → rebuild from settings on next use)."""
+    global _synthesizer
+    _synthesizer = synth
+
+
+def cache_key(text: str, voice: str) -> str:
+    return hashlib.sha256(f"{voice}\0{text}".encode()).hexdigest()
+
+
+@dataclass
+class CachedAudio:
+    key: str
+    data: Optional[bytes] = None  # memory tier
+    path: Optional[str] = None    # disk tier
+
+
+class TTSCache:
+    def __init__(self):
+        cfg = get_settings()
+        self.mem_budget = cfg.tts_cache_mem_bytes
+        self.mem_item_max = cfg.tts_cache_mem_item_bytes
+        self.disk_budget = cfg.tts_cache_disk_bytes
+        self.dir = cfg.tts_cache_dir
+        self._mem: OrderedDict[str, bytes] = OrderedDict()
+        self._mem_bytes = 0
+        self._disk_sizes: Optional[OrderedDict[str, int]] = None
+        self._disk_bytes = 0
+        self._lock = threading.Lock()  # disk bookkeeping is touched from threads
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self.coalesced = 0
+
+    # ── memory tier ──────────────────────────────────────────────────────────
+    def _mem_get(self, key: str) -> Optional[bytes]:
+        data = self._mem.get(key)
+        if data is not None:
+            self._mem.move_to_end(key)
+        return data
+
+    def _mem_put(self, key: str, data: bytes):
+        if len(data) > self.mem_item_max or key in self._mem:
+            return
+        self._mem[key] = data
+        self._mem_bytes += len(data)
+        while self._mem_bytes > self.mem_budget and self._mem:
+            _, old = self._mem.popitem(last=False)
+            self._mem_bytes -= len(old)
+
+    # ── disk tier ────────────────────────────────────────────────────────────
+    def _path(self, key: str) -> str:
+        return os.path.join(self.dir, f"{key}.mp3")
+
+    def _disk_index(self) -> OrderedDict[str, int]:
+        if self._disk_sizes is None:
+            os.makedirs(self.dir, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.dir):
+                if name.endswith(".mp3"):
+                    st = os.stat(os.path.join(self.dir, name))
+                    entries.append((st.st_mtime, name[:-4], st.st_size))
+            entries.sort()
+            self._disk_sizes = OrderedDict((k, size) for _, k, size in entries)
+            self._disk_bytes = sum(self._disk_sizes.values())
+        return self._disk_sizes
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            index = self._disk_index()
+            if key not in index:
+                return None
+            path = self._path(key)
+            try:
+                os.utime(path)  # mtime doubles as LRU clock across restarts
+            except FileNotFoundError:
+                self._disk_bytes -= index.pop(key)
+                return None
+            index.move_to_end(key)
+            return path
+
+    def _disk_put(self, key: str, data: bytes):
+        with self._lock:
+            index = self._disk_index()
+            if key in index or len(data) > self.disk_budget:
+                return
+            fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".part")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, self._path(key))  # atomic: readers never see half a file
+            index[key] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.disk_budget and index:
+                old, size = index.popitem(last=False)
+                self._disk_bytes -= size
+                try:
+                    os.remove(self._path(old))
+                except FileNotFoundError:
+                    pass
+
+    # ── public API ───────────────────────────────────────────────────────────
+    async def lookup(self, key: str) -> Optional[CachedAudio]:
+        data = self._mem_get(key)
+        if data is not None:
+            self.hits["memory"] += 1
+            return CachedAudio(key, data=data)
+        path = await asyncio.to_thread(self._disk_get, key)
+        if path is not None:
+            self.hits["disk"] += 1
+            return CachedAudio(key, path=path)
+        return None
+
+    async def stream(self, text: str, voice: str) -> AsyncIterator[bytes]:
+        """Yield MP3 for *text*, from cache or (once per key) the synthesizer."""
+        key = cache_key(text, voice)
+        while True:
+            hit = await self.lookup(key)
+            if hit is not None:
+                yield hit.data if hit.data is not None else await asyncio.to_thread(
+                    _read_file, hit.path
+                )
+                return
+
+            loop = asyncio.get_running_loop()
+            pending = self._inflight.get(key)
+            if pending is None or pending.get_loop() is not loop:
+                break
+            self.coalesced += 1
+            try:
+                data = await asyncio.shield(pending)
+            except Exception:
+                continue  # leader failed / went away → try again ourselves
+            yield data
+            return
+
+        # we are the leader for this key
+        self.misses += 1
+        done: asyncio.Future = loop.create_future()
+        self._inflight[key] = done
+        parts: list[bytes] = []
+        try:
+            async with timed("tts"):
+                async for chunk in get_synthesizer().stream(text, voice):
+                    parts.append(chunk)
+                    yield chunk
+            data = b"".join(parts)
+            if data:
+                self._mem_put(key, data)
+                await asyncio.to_thread(self._disk_put, key, data)
+            done.set_result(data)
+        except BaseException as exc:
+            # abandoned or failed: let waiters retry rather than cache half a clip
+            done.set_exception(exc if isinstance(exc, Exception) else RuntimeError("abandoned"))
+            done.exception()  # mark retrieved; waiters handle it themselves
+            raise
+        finally:
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+
+    async def fetch(self, text: str, voice: str) -> CachedAudio:
+        """Make sure *text* is cached and return where it lives."""
+        key = cache_key(text, voice)
+        hit = await self.lookup(key)
+        if hit is not None:
+            return hit
+        data = b"".join([chunk async for chunk in self.stream(text, voice)])
+        return CachedAudio(key, data=data)
+
+    def stats(self) -> dict:
+        return {
+            "hits_memory": self.hits["memory"],
+            "hits_disk": self.hits["disk"],
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "memory_bytes": self._mem_bytes,
+            "memory_entries": len(self._mem),
+            "disk_bytes": self._disk_bytes,
+        }
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+_cache: Optional[TTSCache] = None
+
+
+def get_tts_cache() -> TTSCache:
+    global _cache
+    if _cache is None:
+        _cache = TTSCache()
+    return _cache
+
+
+def reset_tts_cache():
+    global _cache
+    _cache = None
@@ -3,85 +3,372 @@ voice.py – STT and TTS helpers for the MVP.
 
 Endpoints
 ---------
-POST /voice/stt   multipart/form-data: file=<wav|mp3>  → {"text": "..."}
+POST /voice/stt   multipart/form-data: file=<wav|mp3>  → {"text": "...", "trimmed_ratio": 0.4}
 GET  /voice/tts   ?text=hello                          → streams MP3
+WS   /voice/turn  ?token=<jwt>                         → one pipelined voice turn
 
 Key design notes
 ----------------
 • Whisper and edge-tts are **lazy-loaded** so this module imports cleanly
   on CI (no heavy downloads / GPU libs during import).
-• WAV/MP3 bytes are decoded to a NumPy mono-float32 array via SoundFile
-  before passing to Whisper.
+• Uploads are ingested and decoded with bounded memory (audio.py): chunked,
+  size/duration capped, spooled to disk, resampled to 16 kHz mono float32.
+• Silence is cut before Whisper (audio.trim_silence): a clip without
+  speech never reaches the model, and long speech is split at pauses into
+  segments the stt.py worker pool transcribes in parallel.
+• Whisper itself runs in the stt.py worker pool, never on the event loop.
+• /voice/turn runs STT → tutor → TTS in one connection and starts speaking
+  the first sentence while the LLM is still generating the rest.
+• All speech goes through tts_cache.py; /voice/tts serves cache hits with
+  ETag / Range support.
+• Every route needs a bearer token and goes through admission.py ("stt" /
+  "tts" slots; a voice turn holds "stt" while transcribing, then "llm"),
+  so one tenant can't take all of Whisper or the LLM.  /voice/tts only
+  takes a slot on a cache miss: replaying cached speech costs nothing.
 """
 
-import io
-import uuid
-from fastapi import APIRouter, UploadFile, HTTPException
-from fastapi.responses import StreamingResponse
-import soundfile as sf
-import numpy as np
+import asyncio
+import json
+import logging
+import re
+import time
+from typing import AsyncIterator, BinaryIO, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from .admission import AdmissionRejected, admit, get_admission, http_slot
+from .audio import AudioSink, SpeechCut, capped, decode_for_whisper, trim_silence
+from .auth import Principal, current_principal, user_from_token
+from .config import get_settings
+from .metrics import STT_SKIPPED, STT_TRIMMED, timed
+from .engine import _load_learner, stream_tutor_reply
+from .stt import STTBusy, get_stt_pool
+from .tts_cache import CachedAudio, cache_key, get_tts_cache
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/voice", tags=["voice"])
 
 VOICE_NAME = "en-US-JennyNeural"
+AUDIO_TYPES = ("audio/wav", "audio/x-wav", "audio/mpeg")
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Lazy loaders
+# Audio helpers
 # ──────────────────────────────────────────────────────────────────────────────
-_stt_model = None
+def _prepare(file: BinaryIO) -> SpeechCut:
+    """Decode and cut the silence; both CPU-bound, so one threadpool hop."""
+    cut = trim_silence(decode_for_whisper(file))
+    STT_TRIMMED.observe(cut.trimmed_ratio)
+    return cut
+
+
+async def _transcribe(cut: SpeechCut) -> str:
+    if not cut.segments:
+        STT_SKIPPED.inc()
+        return ""
+    pool = get_stt_pool()
+    batch = len(cut.segments) == 1  # several: one worker each, side by side
+    try:
+        async with timed("stt"):
+            texts = await asyncio.gather(
+                *(pool.transcribe(segment, batch=batch) for segment in cut.segments)
+            )
+    except STTBusy:
+        raise HTTPException(
+            503, "Speech recognizer busy, try again", headers={"Retry-After": "1"}
+        )
+    return " ".join(t for t in texts if t)
 
 
-def _get_whisper_model():
-    """Load Whisper tiny model the first time it’s needed."""
-    global _stt_model
-    if _stt_model is None:
-        import whisper  # local import → avoids CI import failure
-        _stt_model = whisper.load_model("tiny")
-    return _stt_model
+def _synthesize(text: str) -> AsyncIterator[bytes]:
+    """Yield MP3 chunks for *text* (cached; synthesized at most once)."""
+    return get_tts_cache().stream(text, VOICE_NAME)
+
+
+async def _tts_lookup(
+    text: str, request: Request, user: Principal = Depends(current_principal)
+) -> AsyncIterator[Optional[CachedAudio]]:
+    """
+    The cached audio for *text*, or None with a "tts" slot held for the
+    synthesis – admission only for the requests that cost something.
+    """
+    if not text:
+        raise HTTPException(400, "No text")
+    key = cache_key(text, VOICE_NAME)
+    if request.headers.get("if-none-match") == f'"{key}"':
+        yield None  # answered with 304
+        return
+    hit = await get_tts_cache().lookup(key)
+    if hit is not None:
+        yield hit
+        return
+    async with http_slot("tts", user.tenant_id):
+        yield None
+
+
+def _byte_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Parse a single `bytes=a-b` range; None if absent/unsupported."""
+    m = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not m or m.groups() == ("", ""):
+        return None
+    first, last = m.groups()
+    if first == "":                       # suffix: last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start, end = int(first), int(last) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(416, headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+class SentenceChunker:
+    """Accumulates streamed tokens and releases complete sentences."""
+
+    def __init__(self):
+        self._buf = ""
+
+    def feed(self, token: str) -> list[str]:
+        self._buf += token
+        parts = _SENTENCE_END.split(self._buf)
+        self._buf = parts.pop()
+        return [p.strip() for p in parts if p.strip()]
+
+    def flush(self) -> list[str]:
+        rest, self._buf = self._buf.strip(), ""
+        return [rest] if rest else []
 
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Endpoints
 # ──────────────────────────────────────────────────────────────────────────────
 @router.post("/stt")
-async def stt(file: UploadFile):
-    """Speech-to-text → {"text": "..."}"""
-    if file.content_type not in ("audio/wav", "audio/x-wav", "audio/mpeg"):
-        raise HTTPException(400, "Audio must be WAV or MP3")
+async def stt(request: Request, _slot: None = Depends(admit("stt"))):
+    """
+    Speech-to-text → {"text": "...", "trimmed_ratio": share cut as silence}
 
-    # read bytes
-    audio_bytes = await file.read()
+    multipart/form-data with a `file` part.  The body is parsed as it
+    streams in (capped at audio_max_bytes) and the part is spooled to disk
+    past audio_spool_bytes, so it is never held in memory as one blob.
+    """
+    cfg = get_settings()
+    length = request.headers.get("content-length")
+    if length and int(length) > cfg.audio_max_bytes + 64 * 1024:  # + multipart overhead
+        raise HTTPException(413, f"Audio larger than {cfg.audio_max_bytes} bytes")
+
+    parser = MultiPartParser(
+        request.headers, capped(request.stream(), cfg.audio_max_bytes + 64 * 1024)
+    )
+    parser.spool_max_size = cfg.audio_spool_bytes
+    try:
+        form = await parser.parse()
+    except MultiPartException as exc:
+        raise HTTPException(400, exc.message)
 
-    # decode to mono float32 NumPy array
+    file = form.get("file")
     try:
-        data, _ = sf.read(io.BytesIO(audio_bytes), dtype="float32")
-        if data.ndim > 1:                        # stereo → mono
-            data = np.mean(data, axis=1)
-    except Exception as exc:
-        raise HTTPException(400, f"Bad audio: {exc}")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(422, "Missing `file` part")
+        if file.content_type not in AUDIO_TYPES:
+            raise HTTPException(400, "Audio must be WAV or MP3")
+        if file.size is not None and file.size > cfg.audio_max_bytes:
+            raise HTTPException(413, f"Audio larger than {cfg.audio_max_bytes} bytes")
 
-    text = _get_whisper_model().transcribe(data)["text"].strip()
-    return {"text": text}
+        # decode to mono float32 @ 16 kHz, block by block, then drop the silence
+        cut = await run_in_threadpool(_prepare, file.file)
+    finally:
+        await form.close()
+
+    text = await _transcribe(cut)
+    return {"text": text, "trimmed_ratio": round(cut.trimmed_ratio, 3)}
 
 
 @router.get("/tts")
-async def tts(text: str):
-    """Text-to-speech: streams MP3 using edge-tts."""
+async def tts(
+    text: str, request: Request, hit: Optional[CachedAudio] = Depends(_tts_lookup)
+):
+    """Text-to-speech: MP3 from the TTS cache, synthesized on a miss."""
+    key = cache_key(text, VOICE_NAME)
+    headers = {
+        "ETag": f'"{key}"',
+        "Cache-Control": "public, max-age=86400",
+        "Content-Disposition": f'inline; filename="{key[:16]}.mp3"',
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    if hit is None:
+        return StreamingResponse(_synthesize(text), media_type="audio/mpeg", headers=headers)
+    if hit.path is not None:
+        # FileResponse streams from disk and handles Range itself
+        return FileResponse(hit.path, media_type="audio/mpeg", headers=headers)
+
+    headers["Accept-Ranges"] = "bytes"
+    rng = request.headers.get("range")
+    span = _byte_range(rng, len(hit.data)) if rng else None
+    if span is None:
+        return Response(hit.data, media_type="audio/mpeg", headers=headers)
+    start, end = span
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(hit.data)}"
+    return Response(
+        hit.data[start:end + 1], status_code=206, media_type="audio/mpeg", headers=headers
+    )
+
+
+async def _run_turn(
+    ws: WebSocket, learner_id: int, tenant_id: int, audio: AudioSink
+) -> None:
+    t0 = time.perf_counter()
+    timings: dict[str, float] = {}
+
+    def mark(stage: str):
+        timings.setdefault(stage, round((time.perf_counter() - t0) * 1000, 1))
+
+    admission = get_admission()
+    try:
+        async with admission.slot("stt", tenant_id):
+            cut = await run_in_threadpool(_prepare, audio.file)
+            text = await _transcribe(cut)
+    finally:
+        audio.close()
+    mark("stt_ms")
+    await ws.send_json({"type": "transcript", "text": text})
     if not text:
-        raise HTTPException(400, "No text")
+        mark("total_ms")
+        await ws.send_json(
+            {"type": "done", "transcript": "", "reply": "", "timings": timings,
+             "trimmed_ratio": round(cut.trimmed_ratio, 3)}
+        )
+        return
 
-    import edge_tts  # local import → safe for CI
+    sentences: asyncio.Queue[Optional[str]] = asyncio.Queue()
 
-    communicator = edge_tts.Communicate(text, VOICE_NAME)
-    gen = communicator.stream()
+    async def produce() -> str:
+        chunker = SentenceChunker()
+        parts = []
+        try:
+            async for tok in stream_tutor_reply(learner_id, text, tenant_id=tenant_id):
+                mark("llm_first_token_ms")
+                parts.append(tok)
+                await ws.send_json({"type": "token", "text": tok})
+                for sentence in chunker.feed(tok):
+                    await sentences.put(sentence)
+            for sentence in chunker.flush():
+                await sentences.put(sentence)
+            mark("llm_total_ms")
+        finally:
+            await sentences.put(None)
+        return "".join(parts).strip()
 
-    async def _chunks():
-        async for chunk in gen:
-            if chunk["type"] == "audio":
-                yield chunk["data"]
+    async def speak():
+        index = 0
+        while (sentence := await sentences.get()) is not None:
+            await ws.send_json({"type": "audio", "index": index, "text": sentence})
+            async for chunk in _synthesize(sentence):
+                mark("tts_first_audio_ms")
+                await ws.send_bytes(chunk)
+            index += 1
+        mark("tts_total_ms")
 
-    headers = {
-        "Content-Disposition": f'inline; filename="{uuid.uuid4()}.mp3"',
-        "Content-Type": "audio/mpeg",
-    }
-    return StreamingResponse(_chunks(), headers=headers)
+    async with admission.slot("llm", tenant_id):
+        producer = asyncio.create_task(produce())
+        speaker = asyncio.create_task(speak())
+        try:
+            reply, _ = await asyncio.gather(producer, speaker)
+        except Exception as exc:
+            # gather() leaves the sibling running; stop both before reporting
+            for task in (producer, speaker):
+                task.cancel()
+            await asyncio.gather(producer, speaker, return_exceptions=True)
+            if isinstance(exc, (WebSocketDisconnect, HTTPException)):
+                raise
+            log.exception("voice turn failed (learner=%s)", learner_id)
+            await ws.send_json({"type": "error", "detail": "Voice turn failed"})
+            return
+    mark("total_ms")
+    await ws.send_json(
+        {"type": "done", "transcript": text, "reply": reply, "timings": timings,
+         "trimmed_ratio": round(cut.trimmed_ratio, 3)}
+    )
+
+
+async def _receive_start(ws: WebSocket) -> dict:
+    """Next start frame as a JSON object; anything else → ValueError."""
+    msg = await ws.receive()
+    if msg["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(msg.get("code", 1000))
+    if msg.get("text") is None:
+        raise ValueError("Expected a JSON start frame")
+    frame = json.loads(msg["text"])  # JSONDecodeError is a ValueError
+    if not isinstance(frame, dict):
+        raise ValueError("Start frame must be a JSON object")
+    return frame
+
+
+@router.websocket("/turn")
+async def voice_turn(websocket: WebSocket, token: str = ""):
+    """
+    One voice turn per exchange, pipelined:
+
+    client → {"learner_id": 1}, <binary audio frames…>, {"type": "end"}
+    server → transcript, token…, audio + <mp3 bytes…> per sentence, done
+
+    Timings in the `done` frame are ms since the end of the upload;
+    trimmed_ratio is the share of the audio cut as silence before STT.
+    """
+    user = await run_in_threadpool(user_from_token, token)
+    if user is None:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                start = await _receive_start(websocket)
+            except ValueError as exc:
+                await websocket.send_json({"type": "error", "detail": str(exc)})
+                continue
+            learner_id = start.get("learner_id")
+            learner = (
+                await run_in_threadpool(_load_learner, learner_id, user.tenant_id)
+                if isinstance(learner_id, int) else None
+            )
+            if learner is None or learner.tenant_id != user.tenant_id:
+                await websocket.send_json({"type": "error", "detail": "Forbidden"})
+                continue
+
+            audio = AudioSink()
+            rejected: Optional[HTTPException] = None
+            try:
+                while True:
+                    msg = await websocket.receive()
+                    if msg["type"] == "websocket.disconnect":
+                        raise WebSocketDisconnect(msg.get("code", 1000))
+                    if msg.get("bytes") is not None:
+                        if rejected is None:
+                            try:
+                                audio.write(msg["bytes"])
+                            except HTTPException as exc:
+                                # keep reading up to `end` so the stream stays in sync
+                                rejected = exc
+                                audio.close()
+                    elif msg.get("text") is not None:
+                        break  # {"type": "end"}
+                if rejected is not None:
+                    raise rejected
+                await _run_turn(websocket, learner_id, user.tenant_id, audio)
+            except HTTPException as exc:
+                audio.close()
+                await websocket.send_json({"type": "error", "detail": exc.detail})
+            except AdmissionRejected as exc:
+                await websocket.send_json(
+                    {"type": "error", "detail": exc.detail, "retry_after": exc.retry_after}
+                )
+    except WebSocketDisconnect:
+        pass
@@ -0,0 +1,199 @@
+"""
+bench_admission.py – per-tenant /voice/stt latency next to a noisy neighbour.
+
+Usage
+-----
+    python -m benchmarks.bench_admission --seconds 20
+    python -m benchmarks.bench_admission --noisy-concurrency 64 --cost-per-second 1200
+
+Through the ASGI app (httpx ASGITransport) against one STT worker thread
+running FakeWhisper at --cost-per-second (~50 ms per 1 s clip by default):
+
+• --victims well-behaved tenants per plan (free, family, school) each
+  upload a 1 s clip every --interval seconds from a random phase, whether
+  or not the last one is back (within every plan's rate and fair share)
+• one noisy tenant keeps --noisy-concurrency uploads in flight; on a 429
+  it waits out Retry-After (capped at 0.5 s) and tries again
+
+Scenarios, each for --seconds:
+
+• "off"          admission_enabled = False: the STT pool's FIFO only
+• "noisy_free"   admission on, the noisy tenant on the free plan: its
+                 token bucket turns most of the flood away with 429
+• "noisy_school" admission on, the noisy tenant on the school plan (its
+                 bucket never runs dry): only the fair queue over
+                 --stt-slots slots stands between it and the others
+
+Per plan of victims and for the noisy tenant: requests answered 200, 429
+(admission) and 503 (STT queue full), with p50 / p99 latency of the 200s.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+VICTIMS = ("free", "family", "school")
+
+
+def slow_whisper():
+    """STT_MODEL_LOADER target: FakeWhisper at the cost main() was given."""
+    from benchmarks.fakes import FakeWhisper
+
+    return FakeWhisper(cost_per_second=int(os.environ["BENCH_WHISPER_COST"]))
+
+
+def _wav(seconds: float, sr: int = 16_000) -> bytes:
+    t = np.arange(int(seconds * sr)) / sr
+    buf = io.BytesIO()
+    sf.write(buf, (0.1 * np.sin(2 * np.pi * 220 * t)).astype("float32"), sr, format="WAV")
+    return buf.getvalue()
+
+
+def _tenant(name: str, plan: str) -> dict:
+    from sqlmodel import Session
+
+    from backend.app import auth, models
+
+    with Session(models.get_engine()) as s:
+        t = models.Tenant(name=name, plan=plan); s.add(t); s.flush()
+        u = models.User(tenant_id=t.id, email=f"{name}@bench.com", password_hash="x")
+        s.add(u)
+        s.commit()
+        return {"Authorization": f"Bearer {auth.create_token(u.id, t.id)}"}
+
+
+class _Tally:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.codes: dict[int, int] = {}
+
+    def add(self, status: int, seconds: float):
+        self.codes[status] = self.codes.get(status, 0) + 1
+        if status == 200:
+            self.latencies.append(seconds)
+
+    def summary(self) -> dict:
+        lat = sorted(self.latencies)
+
+        def pct(q: float):
+            return round(lat[int(q * (len(lat) - 1))] * 1000, 1) if lat else None
+
+        return {
+            "ok": self.codes.get(200, 0),
+            "rejected_429": self.codes.get(429, 0),
+            "busy_503": self.codes.get(503, 0),
+            "p50_ms": pct(0.5),
+            "p99_ms": pct(0.99),
+        }
+
+
+async def _post(client, hdrs: dict, clip: bytes, tally: _Tally):
+    t0 = time.perf_counter()
+    r = await client.post(
+        "/voice/stt", files={"file": ("c.wav", clip, "audio/wav")}, headers=hdrs
+    )
+    tally.add(r.status_code, time.perf_counter() - t0)
+    return r
+
+
+async def _victim(client, hdrs, clip, interval: float, deadline: float, tally: _Tally):
+    await asyncio.sleep(random.uniform(0, interval))
+    sent = []
+    while time.perf_counter() < deadline:
+        sent.append(asyncio.create_task(_post(client, hdrs, clip, tally)))
+        await asyncio.sleep(interval)
+    await asyncio.gather(*sent)
+
+
+async def _noisy(client, hdrs, clip, deadline: float, tally: _Tally):
+    while time.perf_counter() < deadline:
+        r = await _post(client, hdrs, clip, tally)
+        if r.status_code == 429:
+            await asyncio.sleep(min(float(r.headers["retry-after"]), 0.5))
+        elif r.status_code == 503:
+            await asyncio.sleep(0.05)
+
+
+async def _scenario(client, clip, args, enabled: bool, noisy_plan: str, run: int) -> dict:
+    from backend.app.admission import get_admission, reset_admission
+    from backend.app.config import get_settings
+
+    get_settings().admission_enabled = enabled
+    reset_admission()
+    victims = [
+        (plan, _tenant(f"r{run}-{plan}{i}", plan))
+        for plan in VICTIMS for i in range(args.victims)
+    ]
+    noisy = _tenant(f"r{run}-noisy", noisy_plan)
+    tallies = {plan: _Tally() for plan in VICTIMS}  # per plan, all its tenants
+    noisy_tally = _Tally()
+
+    deadline = time.perf_counter() + args.seconds
+    await asyncio.gather(
+        *(_victim(client, hdrs, clip, args.interval, deadline, tallies[plan])
+          for plan, hdrs in victims),
+        *(_noisy(client, noisy, clip, deadline, noisy_tally)
+          for _ in range(args.noisy_concurrency)),
+    )
+    out = {f"victim_{p}": t.summary() for p, t in tallies.items()}
+    out[f"noisy_{noisy_plan}"] = noisy_tally.summary()
+    if enabled:
+        out["stt_queue"] = get_admission().stats()["queues"]["stt"]
+    return out
+
+
+async def _run(args) -> dict:
+    import httpx
+    from sqlmodel import SQLModel
+
+    from backend.app import models
+    from backend.app.config import get_settings
+    from backend.app.main import app
+    from backend.app.stt import get_stt_pool
+
+    SQLModel.metadata.create_all(models.get_engine())
+    get_settings().admission_slots = {**get_settings().admission_slots, "stt": args.stt_slots}
+    pool = get_stt_pool()
+    await pool.start(warm=True)
+    clip = _wav(1.0)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as c:
+        out = {
+            "off": await _scenario(c, clip, args, False, "free", 0),
+            "noisy_free": await _scenario(c, clip, args, True, "free", 1),
+            "noisy_school": await _scenario(c, clip, args, True, "school", 2),
+        }
+    pool.shutdown()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=20.0)
+    ap.add_argument("--victims", type=int, default=3, help="well-behaved tenants per plan")
+    ap.add_argument("--interval", type=float, default=4.0, help="victim upload period")
+    ap.add_argument("--noisy-concurrency", type=int, default=32)
+    ap.add_argument("--stt-slots", type=int, default=2)
+    ap.add_argument("--cost-per-second", type=int, default=600)
+    args = ap.parse_args()
+
+    os.environ["BENCH_WHISPER_COST"] = str(args.cost_per_second)
+    os.environ["STT_MODEL_LOADER"] = "benchmarks.bench_admission:slow_whisper"
+    os.environ["STT_EXECUTOR"] = "thread"
+    os.environ["STT_WORKERS"] = "1"
+    print(json.dumps(asyncio.run(_run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
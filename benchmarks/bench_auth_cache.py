@@ -0,0 +1,93 @@
+"""
+bench_auth_cache.py – /me and /learners latency with the auth caches on and off.
+
+Usage
+-----
+    python -m benchmarks.bench_auth_cache --requests 500 --concurrency 8
+
+"off" decodes the JWT on every request and /me loads the User row each
+time (the old behaviour); "on" serves claims and User records from
+auth.py's caches.  /learners uses the claims-only dependency in both
+modes, so it never loads the User row at all.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+import httpx  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from backend.app import auth, models  # noqa: E402
+from backend.app.config import get_settings  # noqa: E402
+from backend.app.main import app  # noqa: E402
+
+
+def _seed() -> str:
+    engine = models.get_engine()
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as s:
+        t = models.Tenant(name="bench"); s.add(t); s.flush()
+        u = models.User(tenant_id=t.id, email="b@x.com", password_hash="x")
+        s.add(u)
+        for i in range(20):
+            s.add(models.Learner(tenant_id=t.id, name=f"kid{i}", dob="2018-01"))
+        s.commit()
+        return auth.create_token(u.id, t.id)
+
+
+async def _drive(path: str, hdrs: dict, n: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sem = asyncio.Semaphore(concurrency)
+        latencies: list[float] = []
+
+        async def one():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.get(path, headers=hdrs)
+                latencies.append(time.perf_counter() - t0)
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": round(n / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def _run(mode: str, n: int, concurrency: int) -> dict:
+    cfg = get_settings()
+    cfg.auth_cache_enabled = mode == "on"
+    auth.clear_auth_caches()
+    hdrs = {"Authorization": f"Bearer {_seed()}"}
+    return {
+        "cache": mode,
+        "/me": asyncio.run(_drive("/me", hdrs, n, concurrency)),
+        "/learners": asyncio.run(_drive("/learners", hdrs, n, concurrency)),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=8)
+    args = ap.parse_args()
+    results = [_run(mode, args.requests, args.concurrency) for mode in ("off", "on")]
+    print(json.dumps({"database_url": os.environ["DATABASE_URL"], "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
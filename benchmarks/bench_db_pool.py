@@ -0,0 +1,97 @@
+"""
+bench_db_pool.py – requests/sec on /lesson and /learners, per-call engine vs pooled.
+
+Usage
+-----
+    python -m benchmarks.bench_db_pool --requests 500 --concurrency 16
+
+Runs the ASGI app in-process against a throw-away SQLite file.  The
+"fresh" mode reproduces the old behaviour (a brand-new engine for every
+`_engine()` call); "pooled" uses the shared registry in models.py.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+import httpx  # noqa: E402
+from sqlmodel import Session, SQLModel, select  # noqa: E402
+
+from backend.app import models  # noqa: E402
+from backend.app.main import app  # noqa: E402
+from backend.app.auth import hash_pw, create_token  # noqa: E402
+from backend.app.engine import seed_concepts  # noqa: E402
+
+
+def _seed() -> tuple[str, int]:
+    engine = models.get_engine()
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    seed_concepts()
+    with Session(engine) as s:
+        t = models.Tenant(name="bench"); s.add(t); s.flush()
+        u = models.User(tenant_id=t.id, email="b@x.com", password_hash=hash_pw("pw"))
+        s.add(u)
+        for i in range(20):
+            s.add(models.Learner(tenant_id=t.id, name=f"kid{i}", dob="2018-01"))
+        s.commit()
+        learner = s.exec(select(models.Learner)).first()
+        # pre-create the Progress row: tutor_reply's get-then-insert races otherwise
+        for concept in s.exec(select(models.Concept)):
+            s.add(models.Progress(learner_id=learner.id, concept_id=concept.id))
+        s.commit()
+        return create_token(u.id, t.id), learner.id
+
+
+async def _drive(method: str, path: str, body, hdrs, n: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with sem:
+                r = await client.request(method, path, json=body, headers=hdrs)
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n)))
+        return n / (time.perf_counter() - start)
+
+
+def _run(mode: str, n: int, concurrency: int) -> dict:
+    real_get_engine = models.get_engine
+    if mode == "fresh":
+        models.get_engine = lambda url=None: models._build_engine(  # type: ignore
+            url or os.environ["DATABASE_URL"]
+        )
+    try:
+        jwt, learner_id = _seed()
+        hdrs = {"Authorization": f"Bearer {jwt}"}
+        lesson = {"learner_id": learner_id, "user_text": "2+3"}
+        return {
+            "mode": mode,
+            "/learners rps": round(asyncio.run(_drive("GET", "/learners", None, hdrs, n, concurrency)), 1),
+            "/lesson rps": round(asyncio.run(_drive("POST", "/lesson", lesson, hdrs, n, concurrency)), 1),
+        }
+    finally:
+        models.get_engine = real_get_engine
+        models.dispose_engines()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--concurrency", type=int, default=8)
+    args = ap.parse_args()
+    results = [_run(mode, args.requests, args.concurrency) for mode in ("fresh", "pooled")]
+    print(json.dumps({"database_url": os.environ["DATABASE_URL"], "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+bench_learners.py – roster listing and login lookup at school scale.
+
+Usage
+-----
+    python -m benchmarks.bench_learners --learners 100000 --tenants 2
+
+Seeds --tenants × --learners learners and as many users into a
+throw-away SQLite file, then measures the same queries twice:
+
+• "legacy"   the pre-migration schema (learner.tenant_id index only, no
+             user.email index) and the old `/learners` – every column of
+             every learner of the tenant
+• "indexed"  after migrations.migrate() – keyset pages of --page rows with
+             the default projection, first page and a deep one
+
+Times are medians of --repeat runs in ms; `json_kb` is the size of the
+serialised response body.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+from sqlalchemy import insert, select, text  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+from backend.app import migrations, models  # noqa: E402
+from backend.app.main import learner_page_query  # noqa: E402
+from backend.app.models import Learner, Tenant, User  # noqa: E402
+
+LEGACY_DDL = (
+    "DROP INDEX ix_user_email",
+    "DROP INDEX ix_learner_tenant_id_id",
+    "DROP INDEX ix_concept_label",
+    "DROP INDEX ix_progress_tenant_learner",
+    "CREATE INDEX ix_learner_tenant_id ON learner (tenant_id)",
+    "DELETE FROM schemamigration WHERE version > 1",
+)
+
+
+def _seed(engine, tenants: int, learners: int):
+    rng = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(insert(Tenant.__table__), [{"name": f"school{t}"} for t in range(tenants)])
+        for t in range(1, tenants + 1):
+            conn.execute(insert(Learner.__table__), [
+                {"tenant_id": t, "name": f"kid{t}-{i}", "dob": "2017-0%d" % rng.randint(1, 9),
+                 "persona_json": json.dumps({"tone": "warm", "reading_level": rng.randint(1, 6)})}
+                for i in range(learners)
+            ])
+            conn.execute(insert(User.__table__), [
+                {"tenant_id": t, "email": f"parent{t}-{i}@school.test",
+                 "password_hash": "x", "role": "parent"}
+                for i in range(learners)
+            ])
+
+
+def _median_ms(fn, repeat: int):
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(times), 2), out
+
+
+def _measure(engine, args, legacy: bool) -> dict:
+    rng = random.Random(2)
+    emails = [f"parent1-{rng.randrange(args.learners)}@school.test" for _ in range(args.repeat)]
+    result = {}
+    with engine.connect() as conn:
+        login = iter(emails)
+        result["login_lookup_ms"], _ = _median_ms(
+            lambda: conn.execute(select(User).where(User.email == next(login))).first(),
+            args.repeat,
+        )
+        if legacy:
+            ms, rows = _median_ms(
+                lambda: conn.execute(select(Learner).where(Learner.tenant_id == 1)).all(),
+                args.repeat,
+            )
+            body = json.dumps([dict(r._mapping) for r in rows])
+            result["list_all"] = {"ms": ms, "rows": len(rows), "json_kb": len(body) // 1024}
+            return result
+
+        fields = ("id", "name", "dob")
+        deep_after = conn.execute(text(
+            "SELECT id FROM learner WHERE tenant_id = 1 ORDER BY id LIMIT 1 OFFSET :n"
+        ), {"n": args.learners - args.page - 1}).scalar_one()
+        for label, after in (("first_page", 0), ("deep_page", deep_after)):
+            stmt = learner_page_query(1, after, args.page + 1, fields)
+            ms, rows = _median_ms(lambda: conn.execute(stmt).all(), args.repeat)
+            body = json.dumps([dict(zip(fields, r)) for r in rows[:args.page]])
+            result[label] = {"ms": ms, "rows": min(len(rows), args.page), "json_kb": len(body) // 1024}
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--learners", type=int, default=100_000, help="per tenant")
+    ap.add_argument("--tenants", type=int, default=2)
+    ap.add_argument("--page", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    engine = models.get_engine()
+    SQLModel.metadata.drop_all(engine)
+    migrations.migrate(engine)  # fresh: stamped at the latest version
+    t0 = time.perf_counter()
+    _seed(engine, args.tenants, args.learners)
+    seed_s = time.perf_counter() - t0
+
+    with engine.begin() as conn:
+        for ddl in LEGACY_DDL:
+            conn.execute(text(ddl))
+    legacy = _measure(engine, args, legacy=True)
+
+    t0 = time.perf_counter()
+    applied = migrations.migrate(engine)
+    migrate_s = time.perf_counter() - t0
+    indexed = _measure(engine, args, legacy=False)
+
+    print(json.dumps({
+        "tenants": args.tenants,
+        "learners_per_tenant": args.learners,
+        "seed_s": round(seed_s, 1),
+        "migrations_applied": applied,
+        "migrate_s": round(migrate_s, 2),
+        "legacy": legacy,
+        "indexed": indexed,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+bench_llm_gateway.py – /lesson throughput against the fake LLM server.
+
+Usage
+-----
+    python -m benchmarks.bench_llm_gateway --latency-ms 300 --requests 200
+
+With the old sync handler every turn held a threadpool worker (40 by
+default) for the whole LLM round trip, capping throughput at roughly
+40 / latency.  The async gateway has no limit of its own; admission.py
+bounds each tenant by plan, so the bench spreads turns over several
+tenants.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+import httpx  # noqa: E402
+from sqlmodel import Session, SQLModel, select  # noqa: E402
+
+from backend.app import models  # noqa: E402
+from backend.app.auth import hash_pw, create_token  # noqa: E402
+from backend.app.engine import seed_concepts  # noqa: E402
+from benchmarks import fake_llm  # noqa: E402
+
+
+def _seed(tenants: int) -> list[tuple[str, int]]:
+    engine = models.get_engine()
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    seed_concepts()
+    out = []
+    with Session(engine) as s:
+        concepts = s.exec(select(models.Concept)).all()
+        for i in range(tenants):
+            t = models.Tenant(name=f"t{i}"); s.add(t); s.flush()
+            u = models.User(tenant_id=t.id, email=f"p{i}@x.com", password_hash=hash_pw("pw"))
+            learner = models.Learner(tenant_id=t.id, name="kid", dob="2018-01")
+            s.add(u); s.add(learner); s.flush()
+            for c in concepts:
+                s.add(models.Progress(learner_id=learner.id, concept_id=c.id))
+            out.append((create_token(u.id, t.id), learner.id))
+        s.commit()
+    return out
+
+
+async def _drive(app, seeds, n: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    lat: list[float] = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(i: int):
+            jwt, learner_id = seeds[i % len(seeds)]
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post(
+                    "/lesson",
+                    json={"learner_id": learner_id, "user_text": "2+3"},
+                    headers={"Authorization": f"Bearer {jwt}"},
+                )
+                r.raise_for_status()
+                lat.append(time.perf_counter() - t0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n)))
+        elapsed = time.perf_counter() - start
+    lat.sort()
+    return {
+        "requests": n,
+        "concurrency": concurrency,
+        "rps": round(n / elapsed, 1),
+        "p50_ms": round(lat[len(lat) // 2] * 1000, 1),
+        "p95_ms": round(lat[int(len(lat) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--tenants", type=int, default=16)
+    args = ap.parse_args()
+
+    server = fake_llm.spawn(args.port, args.latency_ms)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    try:
+        from backend.app.main import app
+
+        seeds = _seed(args.tenants)
+        result = asyncio.run(_drive(app, seeds, args.requests, args.concurrency))
+    finally:
+        server.terminate()
+    result["llm_latency_ms"] = args.latency_ms
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
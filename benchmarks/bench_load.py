@@ -0,0 +1,315 @@
+"""
+bench_load.py – mixed-traffic load test of the whole API, fully offline.
+
+Usage
+-----
+    python -m benchmarks.bench_load --tenants 20 --learners 3 --duration 30
+    python -m benchmarks.bench_load --mix lesson=60,progress=40 --out run.json
+    python -m benchmarks.bench_load --baseline main.json      # diff vs a saved run
+
+Seeds N tenants (one parent login + M learners each), then keeps
+--concurrency virtual users busy for --duration seconds.  Each request
+picks a route by --mix weight and a random tenant; the RNG is seeded, so
+two runs issue the same sequence.  Routes:
+
+    login            POST /auth/token (bcrypt on the hash pool)
+    lesson           POST /lesson
+    lesson_stream    POST /lesson/stream (SSE, read to the end)
+    progress         GET  /progress/{learner_id}
+    tenant_progress  GET  /tenants/me/progress
+    tts              GET  /voice/tts (small phrase set → mostly cache hits)
+    stt              POST /voice/stt (3 s WAV)
+
+External services are replaced by the offline fakes, each with its own
+latency knob: fake_llm.py (chat + moderation, child process),
+FakeWhisper (CPU burn per audio second) and FakeSynthesizer.  Output is
+one JSON document – per route count / errors / rps / p50 / p95 / p99 /
+max – so two commits can be compared with --baseline (adds a
+`delta_pct` block per route: + is slower / fewer rps).
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-load-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/load.db")
+os.environ.setdefault("TTS_CACHE_DIR", os.path.join(_tmp, "tts"))
+
+DEFAULT_MIX = "login=5,lesson=35,lesson_stream=15,progress=25,tenant_progress=10,tts=7,stt=3"
+PASSWORD = "load-test-pw"
+PHRASES = ["Great job!", "OK, let's keep going!", "What is 3 + 4?", "Try again!"]
+UTTERANCES = ["2+3", "what is 4 + 1?", "I don't know", "5", "count by 5s please"]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Fake backends (module:factory targets; knobs travel as env vars so they
+# also reach STT worker processes)
+# ──────────────────────────────────────────────────────────────────────────────
+def fake_whisper():
+    from benchmarks.fakes import FakeWhisper
+
+    return FakeWhisper(int(os.environ.get("LOAD_WHISPER_COST", "40")))
+
+
+def fake_synthesizer():
+    from benchmarks.fakes import FakeSynthesizer
+
+    return FakeSynthesizer(float(os.environ.get("LOAD_TTS_FIRST_CHUNK_MS", "150")))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Seeding
+# ──────────────────────────────────────────────────────────────────────────────
+def _seed(tenants: int, learners: int) -> list[dict]:
+    from sqlmodel import Session, SQLModel
+
+    from backend.app import models
+    from backend.app.auth import create_token, hash_pw
+    from backend.app.engine import seed_concepts
+
+    engine = models.get_engine()
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    seed_concepts()
+    password_hash = hash_pw(PASSWORD)  # one bcrypt for everyone: seeding stays fast
+    out = []
+    with Session(engine) as s:
+        for i in range(tenants):
+            t = models.Tenant(name=f"load{i}")
+            s.add(t)
+            s.flush()
+            u = models.User(tenant_id=t.id, email=f"load{i}@x.com", password_hash=password_hash)
+            s.add(u)
+            kids = [models.Learner(tenant_id=t.id, name=f"kid{j}", dob="2018-01")
+                    for j in range(learners)]
+            s.add_all(kids)
+            s.flush()
+            out.append({
+                "email": u.email,
+                "jwt": create_token(u.id, t.id),
+                "learners": [k.id for k in kids],
+            })
+        s.commit()
+    return out
+
+
+def _wav(seconds: float, sr: int = 16_000) -> bytes:
+    import numpy as np
+    import soundfile as sf
+
+    t = np.arange(int(seconds * sr)) / sr
+    buf = io.BytesIO()
+    sf.write(buf, (0.1 * np.sin(2 * np.pi * 220 * t)).astype("float32"), sr, format="WAV")
+    return buf.getvalue()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Traffic
+# ──────────────────────────────────────────────────────────────────────────────
+def _routes(clip: bytes):
+    def auth(tenant):
+        return {"Authorization": f"Bearer {tenant['jwt']}"}
+
+    async def login(client, tenant, rng):
+        return await client.post(
+            "/auth/token", data={"username": tenant["email"], "password": PASSWORD}
+        )
+
+    async def lesson(client, tenant, rng):
+        body = {"learner_id": rng.choice(tenant["learners"]), "user_text": rng.choice(UTTERANCES)}
+        return await client.post("/lesson", json=body, headers=auth(tenant))
+
+    async def lesson_stream(client, tenant, rng):
+        body = {"learner_id": rng.choice(tenant["learners"]), "user_text": rng.choice(UTTERANCES)}
+        return await client.post("/lesson/stream", json=body, headers=auth(tenant))
+
+    async def progress(client, tenant, rng):
+        learner_id = rng.choice(tenant["learners"])
+        return await client.get(f"/progress/{learner_id}", headers=auth(tenant))
+
+    async def tenant_progress(client, tenant, rng):
+        return await client.get("/tenants/me/progress", headers=auth(tenant))
+
+    async def tts(client, tenant, rng):
+        return await client.get(
+            "/voice/tts", params={"text": rng.choice(PHRASES)}, headers=auth(tenant)
+        )
+
+    async def stt(client, tenant, rng):
+        return await client.post(
+            "/voice/stt", files={"file": ("c.wav", clip, "audio/wav")}, headers=auth(tenant)
+        )
+
+    return {f.__name__: f for f in (
+        login, lesson, lesson_stream, progress, tenant_progress, tts, stt
+    )}
+
+
+def _pct(xs: list[float], q: float) -> float:
+    """Nearest-rank percentile in ms (xs sorted)."""
+    if not xs:
+        return 0.0
+    return round(xs[min(len(xs) - 1, max(0, int(round(q * len(xs))) - 1))] * 1000, 2)
+
+
+def _summary(lat: list[float], errors: int, elapsed: float) -> dict:
+    lat = sorted(lat)
+    return {
+        "count": len(lat),
+        "errors": errors,
+        "rps": round(len(lat) / elapsed, 1),
+        "p50_ms": _pct(lat, 0.50),
+        "p95_ms": _pct(lat, 0.95),
+        "p99_ms": _pct(lat, 0.99),
+        "max_ms": round(lat[-1] * 1000, 2) if lat else 0.0,
+    }
+
+
+async def _drive(seeds, mix: dict[str, float], duration: float, concurrency: int,
+                 seed: int, clip: bytes) -> dict:
+    import httpx
+
+    from backend.app.main import app
+    from backend.app.stt import get_stt_pool
+
+    routes = _routes(clip)
+    names = [n for n in mix if mix[n] > 0]
+    weights = [mix[n] for n in names]
+    lat: dict[str, list[float]] = {n: [] for n in names}
+    errors: dict[str, int] = {n: 0 for n in names}
+    status: dict[str, dict[int, int]] = {n: {} for n in names}
+
+    if "stt" in names:
+        await get_stt_pool().start(warm=True)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120) as client:
+        stop = time.perf_counter() + duration
+
+        async def user(i: int):
+            rng = random.Random(seed * 1000 + i)
+            while time.perf_counter() < stop:
+                name = rng.choices(names, weights)[0]
+                tenant = rng.choice(seeds)
+                t0 = time.perf_counter()
+                try:
+                    r = await routes[name](client, tenant, rng)
+                    code = r.status_code
+                except Exception:  # noqa: BLE001 – counted, the run goes on
+                    code = 0
+                took = time.perf_counter() - t0
+                status[name][code] = status[name].get(code, 0) + 1
+                if 200 <= code < 400:
+                    lat[name].append(took)
+                else:
+                    errors[name] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    out = {n: dict(_summary(lat[n], errors[n], elapsed), status=status[n]) for n in names}
+    everything = [x for n in names for x in lat[n]]
+    out["_all"] = _summary(everything, sum(errors.values()), elapsed)
+    return out
+
+
+def _diff(current: dict, baseline: dict) -> dict:
+    """Per-route % change vs a saved run (+ = slower / less throughput)."""
+    delta = {}
+    for route, now in current["routes"].items():
+        then = baseline.get("routes", {}).get(route)
+        if not then:
+            continue
+        row = {}
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if then[key]:
+                row[key] = round((now[key] - then[key]) / then[key] * 100, 1)
+        if then["rps"]:
+            row["rps"] = round((then["rps"] - now["rps"]) / then["rps"] * 100, 1)
+        delta[route] = row
+    return delta
+
+
+def _parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tenants", type=int, default=20)
+    ap.add_argument("--learners", type=int, default=3, help="per tenant")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds of traffic")
+    ap.add_argument("--concurrency", type=int, default=32, help="virtual users")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="route=weight,…")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--port", type=int, default=8787, help="fake LLM port")
+    ap.add_argument("--llm-ms", type=float, default=300.0, help="fake LLM time to first token")
+    ap.add_argument("--token-ms", type=float, default=20.0)
+    ap.add_argument("--moderation-ms", type=float, default=120.0)
+    ap.add_argument("--whisper-cost", type=int, default=40, help="FFT passes per audio second")
+    ap.add_argument("--tts-ms", type=float, default=150.0, help="fake TTS first chunk")
+    ap.add_argument("--stt-executor", default="thread", choices=("thread", "process"))
+    ap.add_argument("--out", help="also write the JSON here")
+    ap.add_argument("--baseline", help="earlier --out file to diff against")
+    args = ap.parse_args()
+
+    mix = _parse_mix(args.mix)
+    unknown = set(mix) - set(_routes(b""))
+    if unknown:
+        ap.error(f"unknown routes in --mix: {', '.join(sorted(unknown))}")
+
+    from benchmarks import fake_llm
+
+    os.environ.update({
+        "OPENAI_API_KEY": "fake",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.port}/v1",
+        "STT_EXECUTOR": args.stt_executor,
+        "STT_MODEL_LOADER": "benchmarks.bench_load:fake_whisper",
+        "TTS_SYNTHESIZER": "benchmarks.bench_load:fake_synthesizer",
+        "LOAD_WHISPER_COST": str(args.whisper_cost),
+        "LOAD_TTS_FIRST_CHUNK_MS": str(args.tts_ms),
+        "AUTH_BCRYPT_ROUNDS": os.environ.get("AUTH_BCRYPT_ROUNDS", "10"),
+    })
+    server = fake_llm.spawn(
+        args.port, args.llm_ms, token_ms=args.token_ms, moderation_ms=args.moderation_ms
+    )
+    try:
+        seeds = _seed(args.tenants, args.learners)
+        clip = _wav(3.0) if mix.get("stt") else b""
+        routes = asyncio.run(
+            _drive(seeds, mix, args.duration, args.concurrency, args.seed, clip)
+        )
+    finally:
+        server.terminate()
+        from backend.app.progress import shutdown_progress_recorder
+        from backend.app.stt import shutdown_stt_pool
+
+        shutdown_stt_pool()
+        shutdown_progress_recorder()
+
+    result = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        "routes": routes,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            result["delta_pct"] = _diff(result, json.load(fh))
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
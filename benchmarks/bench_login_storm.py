@@ -0,0 +1,145 @@
+"""
+bench_login_storm.py – a classroom logging in at once, with /lesson traffic alongside.
+
+Usage
+-----
+    python -m benchmarks.bench_login_storm --students 30 --window 5 --rounds 12
+
+Seeds `--students` accounts, fires their logins spread evenly over
+`--window` seconds and keeps a steady stream of /lesson calls going at the
+same time.  "threadpool" reproduces the old behaviour (bcrypt on the
+request threadpool); "pool" uses the dedicated hashing pool in passwords.py.
+Reports login and /lesson latency percentiles plus the pool's queue stats.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+import httpx  # noqa: E402
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from passlib.hash import bcrypt  # noqa: E402
+from sqlmodel import Session, SQLModel, select  # noqa: E402
+
+from backend.app import main as app_main, models, passwords  # noqa: E402
+from backend.app.auth import create_token  # noqa: E402
+from backend.app.config import get_settings  # noqa: E402
+from backend.app.engine import seed_concepts  # noqa: E402
+
+
+class _ThreadpoolHasher:
+    """Old behaviour: hash/verify inline on the AnyIO worker threads."""
+
+    async def verify(self, pw, pw_hash):
+        return await run_in_threadpool(passwords._verify_and_upgrade, pw, pw_hash)
+
+    def stats(self):
+        return {}
+
+
+def _seed(students: int, rounds: int) -> tuple[str, int]:
+    engine = models.get_engine()
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    seed_concepts()
+    pw_hash = bcrypt.using(rounds=rounds).hash("pw")  # same cost as the policy: no rehash
+    with Session(engine) as s:
+        t = models.Tenant(name="class"); s.add(t); s.flush()
+        teacher = models.User(tenant_id=t.id, email="teacher@x.com", password_hash=pw_hash)
+        s.add(teacher)
+        for i in range(students):
+            s.add(models.User(tenant_id=t.id, email=f"s{i}@x.com", password_hash=pw_hash))
+        learner = models.Learner(tenant_id=t.id, name="kid", dob="2018-01")
+        s.add(learner); s.commit()
+        for concept in s.exec(select(models.Concept)):
+            s.add(models.Progress(learner_id=learner.id, concept_id=concept.id))
+        s.commit()
+        return create_token(teacher.id, t.id), learner.id
+
+
+def _pct(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(len(xs) * q))] * 1000, 1) if xs else 0.0
+
+
+async def _storm(students: int, window: float, jwt: str, learner_id: int) -> dict:
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        logins: list[float] = []
+        lessons: list[float] = []
+        busy = 0
+        done = asyncio.Event()
+
+        async def login(i: int):
+            nonlocal busy
+            await asyncio.sleep(window * i / students)
+            t0 = time.perf_counter()
+            r = await client.post("/auth/token", data={"username": f"s{i}@x.com", "password": "pw"})
+            if r.status_code == 503:
+                busy += 1
+                return
+            r.raise_for_status()
+            logins.append(time.perf_counter() - t0)
+
+        async def lesson_traffic():
+            hdrs = {"Authorization": f"Bearer {jwt}"}
+            body = {"learner_id": learner_id, "user_text": "2+3"}
+            while not done.is_set():
+                t0 = time.perf_counter()
+                r = await client.post("/lesson", json=body, headers=hdrs)
+                r.raise_for_status()
+                lessons.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.05)
+
+        traffic = [asyncio.create_task(lesson_traffic()) for _ in range(4)]
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(students)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*traffic)
+
+    return {
+        "wall_s": round(elapsed, 2),
+        "login_p50_ms": _pct(logins, 0.5),
+        "login_p95_ms": _pct(logins, 0.95),
+        "login_503": busy,
+        "lesson_calls": len(lessons),
+        "lesson_p50_ms": _pct(lessons, 0.5),
+        "lesson_p95_ms": _pct(lessons, 0.95),
+    }
+
+
+def _run(mode: str, args) -> dict:
+    jwt, learner_id = _seed(args.students, args.rounds)
+    real = app_main.get_hash_pool
+    if mode == "threadpool":
+        app_main.get_hash_pool = lambda: _ThreadpoolHasher()  # type: ignore
+    try:
+        result = asyncio.run(_storm(args.students, args.window, jwt, learner_id))
+        result["pool"] = app_main.get_hash_pool().stats()
+    finally:
+        app_main.get_hash_pool = real
+        passwords.shutdown_hash_pool()
+        models.dispose_engines()
+    return {"mode": mode, **result}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--students", type=int, default=30)
+    ap.add_argument("--window", type=float, default=5.0)
+    ap.add_argument("--rounds", type=int, default=12)
+    args = ap.parse_args()
+    get_settings().auth_bcrypt_rounds = args.rounds
+    results = [_run(mode, args) for mode in ("threadpool", "pool")]
+    print(json.dumps({"cpus": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
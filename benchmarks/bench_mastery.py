@@ -0,0 +1,111 @@
+"""
+bench_mastery.py – replay synthetic attempts through the rolling-window mastery path.
+
+Usage
+-----
+    python -m benchmarks.bench_mastery --attempts 1000000 --learners 2000
+
+Three measurements over the same random attempt stream:
+
+• "update"   mastery.push() alone – the O(1) in-memory window update
+• "recorder" ProgressRecorder.record() + bulk ON CONFLICT flushes into a
+             throw-away SQLite file, i.e. the production write path
+• "verify"   every stored (recent_bits, recent_count, mastered) is checked
+             against a pure-Python replay of the same stream
+
+Storage stays one row per (learner, concept) however many attempts are
+replayed; an attempt log would need one row per attempt.  Timings include
+generating the random stream.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+from sqlmodel import Session, SQLModel, select  # noqa: E402
+
+from backend.app import mastery, models  # noqa: E402
+from backend.app.config import get_settings  # noqa: E402
+from backend.app.progress import ProgressRecorder  # noqa: E402
+
+CONCEPTS = 3
+
+
+def _stream(n: int, learners: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield rng.randrange(1, learners + 1), rng.randrange(1, CONCEPTS + 1), rng.random() < 0.8
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--attempts", type=int, default=1_000_000)
+    ap.add_argument("--learners", type=int, default=2000)
+    ap.add_argument("--flush-max", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    # 1) pure window updates (also the reference for the check below)
+    ref: dict[tuple[int, int], tuple[int, int]] = {}
+    t0 = time.perf_counter()
+    for lid, cid, ok in _stream(args.attempts, args.learners, args.seed):
+        bits, count = ref.get((lid, cid), (0, 0))
+        ref[(lid, cid)] = mastery.push(bits, count, ok)
+    update_s = time.perf_counter() - t0
+
+    # 2) production write path
+    engine = models.get_engine()
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    cfg = get_settings()
+    cfg.progress_flush_max = args.flush_max
+    recorder = ProgressRecorder()
+    t0 = time.perf_counter()
+    for lid, cid, ok in _stream(args.attempts, args.learners, args.seed):
+        recorder.record(lid, cid, ok, tenant_id=1)
+    recorder.close()
+    record_s = time.perf_counter() - t0
+
+    # 3) verify
+    mismatches = 0
+    with Session(engine) as s:
+        rows = s.exec(select(models.Progress)).all()
+        for row in rows:
+            bits, count = ref[(row.learner_id, row.concept_id)]
+            if (row.recent_bits, row.recent_count, row.mastered) != (
+                bits, count, mastery.is_mastered(bits, count)
+            ):
+                mismatches += 1
+        mastered = sum(row.mastered for row in rows)
+
+    print(json.dumps({
+        "attempts": args.attempts,
+        "progress_rows": len(rows),
+        "mastered_rows": mastered,
+        "update_only": {
+            "seconds": round(update_s, 2),
+            "attempts_per_s": round(args.attempts / update_s),
+            "ns_per_attempt": round(update_s / args.attempts * 1e9),
+        },
+        "recorder_to_sqlite": {
+            "seconds": round(record_s, 2),
+            "attempts_per_s": round(args.attempts / record_s),
+            "flushes": recorder.flushes,
+            "rows_written": recorder.rows_written,
+        },
+        "mismatches": mismatches,
+        "db_bytes": sum(  # main file + WAL (not checkpointed yet)
+            os.path.getsize(p) for p in (engine.url.database, engine.url.database + "-wal")
+            if os.path.exists(p)
+        ),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
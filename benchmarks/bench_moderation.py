@@ -0,0 +1,112 @@
+"""
+bench_moderation.py – turn latency added by the safety layer.
+
+Usage
+-----
+    python -m benchmarks.bench_moderation --latency-ms 300 --moderation-ms 120 --turns 20
+
+Streams a multi-sentence reply from the fake LLM (which also serves
+/v1/moderations) and compares:
+
+    none        raw stream, no moderation
+    serial      whole reply, then one moderation call (the naive way)
+    pipelined   engine._safety_stage: sentences checked while the LLM
+                keeps generating
+
+The first turn of each mode is cold; later turns hit the verdict cache,
+so `remote_calls` shows how often the moderation service was asked.
+Pipelining mostly moves the *first* token forward: the last sentence
+can only be checked once the LLM has finished it.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+from benchmarks import fake_llm  # noqa: E402
+
+REPLY = (
+    "Photosynthesis happens inside leaves. Chlorophyll absorbs sunlight. "
+    "Plants then produce glucose and oxygen. Could you name one plant nearby?"
+)
+PROMPT = [
+    {"role": "system", "content": "You are a supportive 6th-grade tutor."},
+    {"role": "user", "content": "How do plants eat?"},
+]
+
+
+async def _turn(mode: str) -> tuple[float, float]:
+    from backend.app.engine import OPENAI_MODEL, _safety_stage
+    from backend.app.llm import get_gateway
+    from backend.app.moderation import get_moderator
+
+    tokens = get_gateway().stream_chat(PROMPT, model=OPENAI_MODEL, max_tokens=150)
+    start = time.perf_counter()
+    first = None
+    if mode == "serial":
+        text = "".join([t async for t in tokens])
+        await get_moderator().is_flagged(text)
+        first = time.perf_counter() - start
+    else:
+        stream = _safety_stage(tokens) if mode == "pipelined" else tokens
+        async for _ in stream:
+            if first is None:
+                first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def _run(turns: int) -> dict:
+    from backend.app.llm import close_gateway
+    from backend.app.moderation import get_moderator
+
+    await _turn("none")  # connect + warm the client outside the measurement
+    out = {}
+    for mode in ("none", "serial", "pipelined"):
+        get_moderator()._verdicts.clear()
+        before = get_moderator().remote_calls
+        lat = [await _turn(mode) for _ in range(turns)]
+        cold_first, cold_total = lat[0]
+        warm = sorted(total for _, total in lat[1:])
+        out[mode] = {
+            "cold_first_token_ms": round(cold_first * 1000, 1),
+            "cold_total_ms": round(cold_total * 1000, 1),
+            "warm_total_p50_ms": round(warm[len(warm) // 2] * 1000, 1),
+            "remote_calls": get_moderator().remote_calls - before,
+        }
+    out["moderator"] = get_moderator().stats()
+    await close_gateway()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--token-ms", type=float, default=20.0)
+    ap.add_argument("--moderation-ms", type=float, default=120.0)
+    ap.add_argument("--turns", type=int, default=20)
+    args = ap.parse_args()
+
+    server = fake_llm.spawn(
+        args.port, args.latency_ms, token_ms=args.token_ms,
+        moderation_ms=args.moderation_ms, reply=REPLY,
+    )
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    try:
+        result = asyncio.run(_run(args.turns))
+    finally:
+        server.terminate()
+    result["llm_latency_ms"] = args.latency_ms
+    result["moderation_ms"] = args.moderation_ms
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+bench_reply_cache.py – tutor reply latency with and without the reply cache.
+
+Usage
+-----
+    python -m benchmarks.bench_reply_cache --latency-ms 300 --prompts 50
+
+Each of --prompts distinct utterances is asked once cold (LLM round trip
+to the fake server) and then --repeats times warm, with spelling/case
+variations that normalise to the same key.  A final burst fires
+--burst identical cold requests at once to show single-flight: they
+cost one upstream call.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+from benchmarks import fake_llm  # noqa: E402
+
+SYSTEM = "You are a friendly kindergarten math tutor. Use very short sentences and emojis."
+
+
+def _prompt(text: str) -> list[dict[str, str]]:
+    return [{"role": "system", "content": SYSTEM}, {"role": "user", "content": text}]
+
+
+def _pct(lat: list[float], q: float) -> float:
+    lat = sorted(lat)
+    return round(lat[min(int(len(lat) * q), len(lat) - 1)] * 1e6, 1)
+
+
+async def _run(prompts: int, repeats: int, burst: int) -> dict:
+    from backend.app.engine import _cached_reply
+    from backend.app.llm import close_gateway
+    from backend.app.reply_cache import get_reply_cache
+
+    cold: list[float] = []
+    warm: list[float] = []
+    for i in range(prompts):
+        t0 = time.perf_counter()
+        await _cached_reply(_prompt(f"What is {i} + 1?"))
+        cold.append(time.perf_counter() - t0)
+        for j in range(repeats):
+            text = f"what is {i} + 1" if j % 2 else f"  WHAT IS {i} + 1 ?"
+            t0 = time.perf_counter()
+            await _cached_reply(_prompt(text))
+            warm.append(time.perf_counter() - t0)
+
+    before = get_reply_cache().stats()["misses"]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_cached_reply(_prompt("How many legs has a cat?")) for _ in range(burst)))
+    burst_s = time.perf_counter() - t0
+    await close_gateway()
+
+    stats = get_reply_cache().stats()
+    return {
+        "miss_p50_us": _pct(cold, 0.5),
+        "miss_p95_us": _pct(cold, 0.95),
+        "hit_p50_us": _pct(warm, 0.5),
+        "hit_p95_us": _pct(warm, 0.95),
+        "hit_p99_us": _pct(warm, 0.99),
+        "burst": burst,
+        "burst_upstream_calls": stats["misses"] - before,
+        "burst_ms": round(burst_s * 1000, 1),
+        "cache": stats,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--prompts", type=int, default=50)
+    ap.add_argument("--repeats", type=int, default=20)
+    ap.add_argument("--burst", type=int, default=32)
+    args = ap.parse_args()
+
+    server = fake_llm.spawn(args.port, args.latency_ms)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    try:
+        result = asyncio.run(_run(args.prompts, args.repeats, args.burst))
+    finally:
+        server.terminate()
+    result["llm_latency_ms"] = args.latency_ms
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+bench_roster.py – onboarding a class roster: one POST per learner vs bulk import.
+
+Usage
+-----
+    python -m benchmarks.bench_roster --rows 10000 --single-rows 1000
+
+Through the ASGI app (httpx ASGITransport, no network), on a throw-away
+SQLite file:
+
+• "per_request"   --single-rows × POST /learners at --concurrency
+                  (auth lookup, id reservation and commit per learner)
+• "import_inline" one POST /learners/import of --rows CSV rows, answered
+                  when every row is in (roster_inline_bytes raised for it)
+• "import_job"    the same file as a background job: 202 at once, then
+                  GET …/{job_id} every 10 ms until it is done
+
+Every run gets its own tenant.  rows_per_s is what to compare;
+--bad-every N makes every Nth row invalid so the error path is in the
+measurement too.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+import httpx  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from backend.app import auth, models  # noqa: E402
+from backend.app.config import get_settings  # noqa: E402
+from backend.app.main import app  # noqa: E402
+
+
+def _tenant(name: str) -> dict:
+    with Session(models.get_engine()) as s:
+        t = models.Tenant(name=name); s.add(t); s.flush()
+        u = models.User(tenant_id=t.id, email=f"{name}@bench.com", password_hash="x")
+        s.add(u)
+        s.commit()
+        return {"Authorization": f"Bearer {auth.create_token(u.id, t.id)}"}
+
+
+def _roster(rows: int, bad_every: int) -> bytes:
+    lines = ["name,dob,class"]
+    for i in range(rows):
+        dob = "2016-13" if bad_every and i % bad_every == bad_every - 1 else "2016-04"
+        lines.append(f"Student {i},{dob},{i % 30}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def _per_request(client, hdrs, n: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            r = await client.post("/learners", json={"name": f"s{i}", "dob": "2016-04"}, headers=hdrs)
+            r.raise_for_status()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - t0
+    return {"rows": n, "seconds": round(elapsed, 2), "rows_per_s": round(n / elapsed)}
+
+
+async def _import(client, hdrs, body: bytes, background: bool) -> dict:
+    t0 = time.perf_counter()
+    r = await client.post(
+        f"/learners/import?background={str(background).lower()}", content=body, headers=hdrs
+    )
+    accepted = time.perf_counter() - t0
+    job = r.json()
+    if r.status_code == 202:
+        while job["status"] not in ("done", "failed"):
+            await asyncio.sleep(0.01)
+            job = (await client.get(r.headers["location"], headers=hdrs)).json()
+    elapsed = time.perf_counter() - t0
+    out = {
+        "rows": job["rows"],
+        "created": job["created"],
+        "failed": job["failed"],
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(job["rows"] / elapsed),
+    }
+    if background:
+        out["accepted_ms"] = round(accepted * 1000, 1)
+    return out
+
+
+async def _main(args) -> dict:
+    body = _roster(args.rows, args.bad_every)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as c:
+        return {
+            "roster_bytes": len(body),
+            "batch_rows": get_settings().roster_batch_rows,
+            "per_request": await _per_request(
+                c, _tenant("single"), args.single_rows, args.concurrency
+            ),
+            "import_inline": await _import(c, _tenant("inline"), body, background=False),
+            "import_job": await _import(c, _tenant("job"), body, background=True),
+        }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10_000)
+    ap.add_argument("--single-rows", type=int, default=1000)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--bad-every", type=int, default=0)
+    args = ap.parse_args()
+
+    engine = models.get_engine()
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    get_settings().roster_inline_bytes = 1 << 30  # the inline run stays inline
+    print(json.dumps(asyncio.run(_main(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
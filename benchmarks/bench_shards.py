@@ -0,0 +1,134 @@
+"""
+bench_shards.py – progress write throughput as tenants spread over more shards.
+
+Usage
+-----
+    python -m benchmarks.bench_shards --shards 1 2 4 --tenants 8 --seconds 5
+    python -m benchmarks.bench_shards --synchronous FULL   # fsync every commit
+
+One writer thread per tenant runs the production flush path
+(progress._bulk_upsert + commit, --rows learners × 1 concept per
+transaction) against the tenant's shard for --seconds.  With one shard
+every writer queues on the same SQLite write lock; with more shards the
+tenants' commits go to different files.  Shards are fresh SQLite files in
+a temp dir (the default database only holds the directory), tenants placed
+round-robin.
+
+Reports committed transactions/s and rows/s per shard count, plus the
+p50 / p99 commit latency a writer saw.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/directory.db")
+
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from backend.app import mastery, progress, shards  # noqa: E402
+from backend.app.config import get_settings  # noqa: E402
+from backend.app.engine import seed_concepts  # noqa: E402
+from backend.app.models import Tenant, _engine  # noqa: E402
+
+
+def _setup(n_shards: int, tenants: int, synchronous: str, run: int) -> list[int]:
+    cfg = get_settings()
+    names = [f"s{i}" for i in range(n_shards)]  # fresh files; the default is the directory
+    cfg.db_shards = {n: f"sqlite:///{_tmp}/run{run}-{n}.db" for n in names}
+    cfg.db_new_tenant_shards = names
+    shards.reset_router()
+    router = shards.get_router()
+    for name in names:
+        event.listen(
+            router.engine(name), "connect",
+            lambda conn, _: conn.execute(f"PRAGMA synchronous={synchronous}"),
+        )
+    shards.init_shards()
+
+    ids = []
+    with Session(_engine()) as session:
+        for i in range(tenants):
+            tenant = Tenant(name=f"school{i}")
+            session.add(tenant)
+            session.flush()
+            shards.mirror_tenant(tenant, router.place(session, tenant))
+            ids.append(tenant.id)
+        session.commit()
+    return ids
+
+
+def _writer(tenant_id: int, rows: int, deadline: float, latencies: list[float]):
+    router = shards.get_router()
+    engine = router.engine_for(tenant_id)
+    base = tenant_id * 1_000_000
+    bits, count = mastery.push(0, 0, True)
+    batch = {(base + i, 1): [1, 1, bits, count] for i in range(rows)}
+    learners = {base + i: tenant_id for i in range(rows)}
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        with Session(engine) as session:
+            progress._bulk_upsert(session, batch, learners)
+            session.commit()
+        latencies.append(time.perf_counter() - t0)
+
+
+def _run(n_shards: int, args, run: int) -> dict:
+    tenants = _setup(n_shards, args.tenants, args.synchronous, run)
+    per_writer: list[list[float]] = [[] for _ in tenants]
+    deadline = time.perf_counter() + args.seconds
+    threads = [
+        threading.Thread(target=_writer, args=(tid, args.rows, deadline, lat))
+        for tid, lat in zip(tenants, per_writer)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    latencies = sorted(x for lat in per_writer for x in lat)
+    txns = len(latencies)
+    return {
+        "shards": n_shards,
+        "txn_per_s": round(txns / elapsed, 1),
+        "rows_per_s": round(txns * args.rows / elapsed),
+        "commit_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "commit_p99_ms": round(latencies[int(0.99 * (txns - 1))] * 1000, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--tenants", type=int, default=8)
+    ap.add_argument("--rows", type=int, default=20, help="progress rows per transaction")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--synchronous", default="NORMAL", choices=["OFF", "NORMAL", "FULL"])
+    args = ap.parse_args()
+
+    SQLModel.metadata.create_all(_engine())
+    seed_concepts()
+    results = []
+    for run, n in enumerate(args.shards):
+        results.append(_run(n, args, run))
+    base = results[0]["txn_per_s"]
+    for r in results:
+        r["speedup"] = round(r["txn_per_s"] / base, 2)
+    print(json.dumps({
+        "tenants": args.tenants,
+        "rows_per_txn": args.rows,
+        "synchronous": args.synchronous,
+        "cpus": os.cpu_count(),
+        "runs": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+bench_startup.py – cold-start cost of a worker: import, then lifespan.
+
+Usage
+-----
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --max-import-ms 800    # CI guard
+
+Every run is a fresh interpreter (nothing cached in sys.modules) against
+a new SQLite file, and reports:
+
+    import_ms     `import backend.app.main`
+    startup_ms    run_startup_phases() – env, schema, starter concepts
+    phases_ms     the same, per phase
+    heavy         heavy modules that got imported along the way
+
+Medians go to stdout as JSON; an extra `-X importtime` run lists the
+modules with the most self time under `top_imports`.  With --max-import-ms the
+exit status is 1 when the median import time is over budget.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("numpy", "soundfile", "whisper", "torch", "edge_tts", "openai", "tiktoken")
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import backend.app.main as main
+imported = time.perf_counter() - t0
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+t0 = time.perf_counter()
+phases = main.run_startup_phases()
+started = time.perf_counter() - t0
+print(json.dumps({{"import_ms": imported * 1000, "startup_ms": started * 1000,
+                  "phases_ms": phases, "heavy": heavy}}))
+"""
+
+
+def _run_once(importtime: bool = False) -> tuple[dict, str]:
+    tmp = tempfile.mkdtemp(prefix="lp-boot-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/boot.db", PYTHONPATH=ROOT)
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else [])
+    out = subprocess.run(
+        cmd + ["-c", _PROBE.format(heavy=HEAVY)],
+        cwd=tmp, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1]), out.stderr
+
+
+def _top_imports(stderr: str, n: int) -> list[dict]:
+    """Slowest modules by their own import time (children excluded)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append({
+            "module": name.strip(),
+            "self_ms": round(int(self_us) / 1000, 1),
+            "cumulative_ms": round(int(cumulative_us) / 1000, 1),
+        })
+    return sorted(rows, key=lambda r: -r["self_ms"])[:n]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--max-import-ms", type=float, default=0.0, help="fail above this median")
+    args = ap.parse_args()
+
+    first, stderr = _run_once(importtime=True)
+    runs = [_run_once()[0] for _ in range(args.runs)]
+    result = {
+        "runs": args.runs,
+        "import_ms": round(statistics.median(r["import_ms"] for r in runs), 1),
+        "startup_ms": round(statistics.median(r["startup_ms"] for r in runs), 1),
+        "phases_ms": {
+            name: round(statistics.median(r["phases_ms"][name] for r in runs), 1)
+            for name in runs[0]["phases_ms"]
+        },
+        "heavy": runs[0]["heavy"],
+        "top_imports": _top_imports(stderr, args.top),
+    }
+    print(json.dumps(result, indent=2))
+    if args.max_import_ms and result["import_ms"] > args.max_import_ms:
+        print(f"import {result['import_ms']} ms > budget {args.max_import_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
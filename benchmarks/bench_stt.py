@@ -0,0 +1,113 @@
+"""
+bench_stt.py – /voice/stt clips/sec at 1, 4 and 16 concurrent uploads.
+
+Usage
+-----
+    python -m benchmarks.bench_stt                         # FakeWhisper, process pool
+    python -m benchmarks.bench_stt --real                  # real Whisper tiny
+    python -m benchmarks.bench_stt --executor thread --workers 1
+
+Clips are synthetic 3 s WAVs.  The pool is pre-warmed so model load time
+is not counted.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+_tmp = tempfile.mkdtemp(prefix="lp-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+def _wav(seconds: float, sr: int = 16_000) -> bytes:
+    t = np.arange(int(seconds * sr)) / sr
+    buf = io.BytesIO()
+    sf.write(buf, (0.1 * np.sin(2 * np.pi * 220 * t)).astype("float32"), sr, format="WAV")
+    return buf.getvalue()
+
+
+def _auth() -> dict:
+    """Bearer header for a school-plan tenant (admission never rate-limits it)."""
+    from sqlmodel import Session, SQLModel
+
+    from backend.app import auth, models
+
+    SQLModel.metadata.create_all(models.get_engine())
+    with Session(models.get_engine()) as s:
+        t = models.Tenant(name="bench", plan="school"); s.add(t); s.flush()
+        u = models.User(tenant_id=t.id, email=f"bench{t.id}@bench.com", password_hash="x")
+        s.add(u)
+        s.commit()
+        return {"Authorization": f"Bearer {auth.create_token(u.id, t.id)}"}
+
+
+async def _level(client, clip: bytes, concurrency: int, rounds: int) -> dict:
+    n = concurrency * rounds
+    sem = asyncio.Semaphore(concurrency)
+    busy = 0
+
+    async def one():
+        nonlocal busy
+        async with sem:
+            r = await client.post(
+                "/voice/stt", files={"file": ("c.wav", clip, "audio/wav")}
+            )
+            if r.status_code == 503:
+                busy += 1
+            else:
+                r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "clips": n,
+        "clips_per_s": round((n - busy) / elapsed, 2),
+        "rejected_503": busy,
+    }
+
+
+async def _run(args) -> dict:
+    import httpx
+    from backend.app.main import app
+    from backend.app.stt import get_stt_pool
+
+    pool = get_stt_pool()
+    await pool.start(warm=True)
+    clip = _wav(args.seconds)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=600, headers=_auth()
+    ) as client:
+        levels = [await _level(client, clip, c, args.rounds) for c in (1, 4, 16)]
+    out = {"pool": pool.stats(), "clip_seconds": args.seconds, "levels": levels}
+    pool.shutdown()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--real", action="store_true", help="use Whisper instead of FakeWhisper")
+    ap.add_argument("--executor", default="process", choices=("process", "thread"))
+    ap.add_argument("--workers", type=int, default=0)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--rounds", type=int, default=4)
+    args = ap.parse_args()
+
+    os.environ["STT_EXECUTOR"] = args.executor
+    os.environ["STT_WORKERS"] = str(args.workers)
+    os.environ["STT_MAX_QUEUE"] = "64"
+    if not args.real:
+        os.environ["STT_MODEL_LOADER"] = "benchmarks.fakes:FakeWhisper"
+    print(json.dumps(asyncio.run(_run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+bench_stt_ingest.py – peak RSS of decoding a 1-minute and a 10-minute upload.
+
+Usage
+-----
+    python -m benchmarks.bench_stt_ingest
+
+Each measurement runs in a fresh interpreter (ru_maxrss is a high-water
+mark) on a 44.1 kHz stereo WAV.  "legacy" is the old path: whole upload in
+memory → sf.read → np.mean downmix.  "streaming" is audio.decode_for_whisper
+on a spooled file.  Figures are peak RSS minus the interpreter's baseline
+after imports.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+_CHILD = r"""
+import io, resource, sys, tempfile
+import numpy as np, soundfile as sf
+from backend.app.audio import decode_for_whisper
+mode, path = sys.argv[1], sys.argv[2]
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if mode == "legacy":
+    raw = open(path, "rb").read()
+    data, _ = sf.read(io.BytesIO(raw), dtype="float32")
+    data = np.mean(data, axis=1)
+else:
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(64 * 1024), b""):
+            spool.write(chunk)
+    data = decode_for_whisper(spool)
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(peak - base, len(data))  # KiB on Linux
+"""
+
+
+def _clip(path: str, seconds: int, sr: int = 44_100):
+    with sf.SoundFile(path, "w", sr, 2, format="WAV", subtype="PCM_16") as out:
+        t = np.arange(sr) / sr
+        second = (0.2 * np.sin(2 * np.pi * 220 * t)).astype("float32")
+        block = np.stack([second, second], axis=1)
+        for _ in range(seconds):
+            out.write(block)
+
+
+def main():
+    tmp = tempfile.mkdtemp(prefix="lp-ingest-")
+    env = dict(os.environ, AUDIO_MAX_SECONDS="3600", AUDIO_MAX_BYTES=str(1 << 31))
+    results = []
+    for label, seconds in (("1-minute", 60), ("10-minute", 600)):
+        path = os.path.join(tmp, f"{seconds}.wav")
+        _clip(path, seconds)
+        row = {"clip": label, "upload_mb": round(os.path.getsize(path) / 2**20, 1)}
+        for mode in ("legacy", "streaming"):
+            out = subprocess.run(
+                [sys.executable, "-c", _CHILD, mode, path],
+                capture_output=True, text=True, env=env, check=True,
+            ).stdout.split()
+            row[f"{mode}_peak_rss_mb"] = round(int(out[0]) / 1024, 1)
+        results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+bench_tts_cache.py – /voice/tts latency for a repetitive reply mix.
+
+Usage
+-----
+    python -m benchmarks.bench_tts_cache --requests 500 --phrases 20
+
+Uses benchmarks.fakes.FakeSynthesizer (150 ms to first chunk) in place of
+edge-tts and a throw-away cache dir.  Reports cold (every phrase is a miss)
+vs warm latency and how many synth calls were saved.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="lp-tts-")
+os.environ.setdefault("TTS_CACHE_DIR", _tmp)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+os.environ.setdefault("TTS_SYNTHESIZER", "benchmarks.fakes:FakeSynthesizer")
+
+import httpx  # noqa: E402
+
+from backend.app.main import app  # noqa: E402
+from backend.app.tts_cache import get_synthesizer, get_tts_cache  # noqa: E402
+
+PHRASES = [
+    "OK, let's keep going!", "Great job!", "Try again, you can do it.",
+    "What is 3 + 4?", "Nice counting!", "Let's read the next sentence.",
+]
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(len(xs) * p))] * 1000, 2)
+
+
+def _auth() -> dict:
+    """Bearer header for a school-plan tenant (admission never rate-limits it)."""
+    from sqlmodel import Session, SQLModel
+
+    from backend.app import auth, models
+
+    SQLModel.metadata.create_all(models.get_engine())
+    with Session(models.get_engine()) as s:
+        t = models.Tenant(name="bench", plan="school"); s.add(t); s.flush()
+        u = models.User(tenant_id=t.id, email=f"bench{t.id}@bench.com", password_hash="x")
+        s.add(u)
+        s.commit()
+        return {"Authorization": f"Bearer {auth.create_token(u.id, t.id)}"}
+
+
+async def _run(n: int, phrases: list[str], concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", headers=_auth()
+    ) as client:
+        sem = asyncio.Semaphore(concurrency)
+        lat: list[float] = []
+
+        async def one(text):
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.get("/voice/tts", params={"text": text})
+                r.raise_for_status()
+                lat.append(time.perf_counter() - t0)
+
+        rng = random.Random(7)
+        start = time.perf_counter()
+        await asyncio.gather(*(one(rng.choice(phrases)) for _ in range(n)))
+        elapsed = time.perf_counter() - start
+    return {"requests": n, "rps": round(n / elapsed, 1),
+            "p50_ms": _pct(lat, 0.5), "p95_ms": _pct(lat, 0.95)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=500)
+    ap.add_argument("--phrases", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=16)
+    args = ap.parse_args()
+    phrases = (PHRASES * (args.phrases // len(PHRASES) + 1))[: args.phrases]
+    phrases = [f"{p} ({i})" if i >= len(PHRASES) else p for i, p in enumerate(phrases)]
+
+    first = asyncio.run(_run(args.requests, phrases, args.concurrency))
+    second = asyncio.run(_run(args.requests, phrases, args.concurrency))
+    print(json.dumps({
+        "first_pass": first,
+        "warm_pass": second,
+        "synth_calls": get_synthesizer().calls,
+        "cache": get_tts_cache().stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+fake_llm.py – OpenAI-compatible chat server with configurable latency.
+
+Usage
+-----
+    python -m benchmarks.fake_llm --port 8787 --latency-ms 400
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8787/v1 uvicorn backend.app.main:app
+
+Only implements what the gateway calls (POST /v1/chat/completions, plain
+or `stream: true`) plus POST /v1/moderations for the safety layer.  The
+reply is canned (--reply) so runs are reproducible; latency to the first
+token is `latency_ms ± jitter`, then one word per `token_ms`.  Moderation
+answers after `moderation_ms` and flags inputs containing "forbidden".
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+FAKE_REPLY = "Great job! What is 3 + 4?"
+FLAG_WORD = "forbidden"
+
+
+def make_app(
+    latency_ms: float = 300.0,
+    jitter_ms: float = 0.0,
+    token_ms: float = 20.0,
+    moderation_ms: float = 120.0,
+    reply: str = FAKE_REPLY,
+) -> FastAPI:
+    app = FastAPI(title="fake-llm")
+    app.state.calls = 0
+    app.state.moderation_calls = 0
+
+    async def _delay():
+        jitter = random.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0.0
+        await asyncio.sleep(max(0.0, latency_ms + jitter) / 1000)
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await _delay()
+        if body.get("stream"):
+            return StreamingResponse(_stream(body), media_type="text/event-stream")
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 20, "completion_tokens": 9, "total_tokens": 29},
+        }
+
+    async def _stream(body):
+        cid = f"chatcmpl-{uuid.uuid4().hex}"
+        base = {"id": cid, "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model", "fake")}
+        for i, word in enumerate(re.findall(r"\s*\S+", reply)):
+            if i:
+                await asyncio.sleep(token_ms / 1000)
+            chunk = dict(base, choices=[{"index": 0, "delta": {"content": word},
+                                         "finish_reason": None}])
+            yield f"data: {json.dumps(chunk)}\n\n"
+        done = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        yield f"data: {json.dumps(done)}\n\n"
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage = dict(base, choices=[], usage={
+                "prompt_tokens": 20, "completion_tokens": i + 1, "total_tokens": 21 + i,
+            })
+            yield f"data: {json.dumps(usage)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/moderations")
+    async def moderations(request: Request):
+        body = await request.json()
+        app.state.moderation_calls += 1
+        await asyncio.sleep(moderation_ms / 1000)
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        results = []
+        for text in inputs:
+            flagged = FLAG_WORD in text.lower()
+            results.append({
+                "flagged": flagged,
+                "categories": {"violence": flagged},
+                "category_scores": {"violence": 0.99 if flagged else 0.001},
+            })
+        return {"id": f"modr-{uuid.uuid4().hex}", "model": body.get("model", "fake"),
+                "results": results}
+
+    return app
+
+
+def spawn(
+    port: int,
+    latency_ms: float = 300.0,
+    jitter_ms: float = 0.0,
+    token_ms: float = 20.0,
+    moderation_ms: float = 120.0,
+    reply: str = FAKE_REPLY,
+) -> subprocess.Popen:
+    """
+    Run the fake server in a child process on 127.0.0.1:*port*.
+
+    A separate process keeps the fake's own CPU out of the measured
+    process (an in-thread server shares the GIL with the app under test).
+    """
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_llm",
+            "--port", str(port),
+            "--latency-ms", str(latency_ms),
+            "--jitter-ms", str(jitter_ms),
+            "--token-ms", str(token_ms),
+            "--moderation-ms", str(moderation_ms),
+            "--reply", reply,
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"fake LLM did not start on port {port}")
+
+
+def main():
+    import uvicorn
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--token-ms", type=float, default=20.0)
+    ap.add_argument("--moderation-ms", type=float, default=120.0)
+    ap.add_argument("--reply", default=FAKE_REPLY)
+    args = ap.parse_args()
+    uvicorn.run(
+        make_app(args.latency_ms, args.jitter_ms, args.token_ms, args.moderation_ms, args.reply),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+fakes.py – offline stand-ins for the heavy voice backends.
+
+FakeWhisper   plug in with STT_MODEL_LOADER=benchmarks.fakes:FakeWhisper;
+              burns CPU roughly in proportion to clip length, like the
+              real model, without downloads or torch.
+FakeSynthesizer
+              plug in with TTS_SYNTHESIZER=benchmarks.fakes:FakeSynthesizer;
+              deterministic "MP3" bytes after a configurable delay.
+FakeModerator
+              plug in with MODERATION_BACKEND=benchmarks.fakes:FakeModerator;
+              flags text containing any of `flag_words` after a delay.
+"""
+
+import asyncio
+import hashlib
+
+import numpy as np
+
+WHISPER_SR = 16_000
+
+
+class FakeWhisper:
+    def __init__(self, cost_per_second: int = 40):
+        # FFT passes per second of audio; ~tiny-model cost on one core
+        self.cost_per_second = cost_per_second
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        seconds = max(1, int(len(audio) / WHISPER_SR))
+        frame = np.resize(np.asarray(audio, dtype="float32"), 4096)
+        for _ in range(seconds * self.cost_per_second):
+            frame = np.abs(np.fft.irfft(np.fft.rfft(frame) * 0.999, n=4096)).astype("float32")
+        return {"text": f"fake transcript of {seconds}s"}
+
+
+class FakeSynthesizer:
+    def __init__(self, first_chunk_ms: float = 150.0, chunk_ms: float = 10.0,
+                 bytes_per_char: int = 400):
+        self.first_chunk_ms = first_chunk_ms
+        self.chunk_ms = chunk_ms
+        self.bytes_per_char = bytes_per_char
+        self.calls = 0
+
+    async def stream(self, text: str, voice: str):
+        self.calls += 1
+        seed = hashlib.sha256(f"{voice}{text}".encode()).digest()
+        total = max(1, len(text)) * self.bytes_per_char
+        await asyncio.sleep(self.first_chunk_ms / 1000)
+        sent = 0
+        while sent < total:
+            n = min(4096, total - sent)
+            yield (seed * (n // len(seed) + 1))[:n]
+            sent += n
+            if sent < total and self.chunk_ms:
+                await asyncio.sleep(self.chunk_ms / 1000)
+
+
+class FakeModerator:
+    def __init__(self, latency_ms: float = 120.0, flag_words: tuple[str, ...] = ("forbidden",)):
+        self.latency_ms = latency_ms
+        self.flag_words = flag_words
+        self.calls = 0
+
+    async def flagged(self, text: str, tenant_id=None) -> bool:
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        lowered = text.lower()
+        return any(w in lowered for w in self.flag_words)
@@ -20,11 +20,12 @@ export default function Tutor({ learner }) {
       });
       setReplyText(data.reply);
 
-      // TTS
-      const tts = await fetch(
-        "http://127.0.0.1:8000/voice/tts?text=" + encodeURIComponent(data.reply)
-      );
-      setReplyUrl(URL.createObjectURL(await tts.blob()));
+      // TTS (same client, so the request carries the learner's token)
+      const tts = await api.get("/voice/tts", {
+        params: { text: data.reply },
+        responseType: "blob",
+      });
+      setReplyUrl(URL.createObjectURL(tts.data));
     } catch (err) {
       console.error(err);
       alert("Error: " + err);
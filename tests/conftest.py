@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+# Point the suite at a throw-away DB before backend.app is imported, so
+# test runs never touch (or flip to WAL) the tracked ./learnpal.db.
+_tmp = tempfile.mkdtemp(prefix="learnpal-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ.setdefault("TTS_CACHE_DIR", os.path.join(_tmp, "tts"))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope="module")
+def _fresh_process_state():
+    # modules drop/recreate the schema, so ids get reused between them
+    from backend.app.admission import reset_admission
+    from backend.app.auth import clear_auth_caches
+    from backend.app.catalog import reset_catalog
+    from backend.app.memory import reset_memory
+    from backend.app.moderation import set_moderator
+    from backend.app.progress import shutdown_progress_recorder
+    from backend.app.reply_cache import reset_reply_cache
+    from backend.app.shards import reset_router
+
+    reset_admission()
+    clear_auth_caches()
+    reset_catalog()
+    reset_memory()
+    reset_reply_cache()
+    reset_router()
+    set_moderator(None)
+    yield
+    shutdown_progress_recorder()  # land buffered attempts before the next drop_all
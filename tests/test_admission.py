@@ -0,0 +1,227 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app import main, tts_cache
+from backend.app.admission import AdmissionRejected, FairQueue, get_admission, reset_admission
+from backend.app.auth import create_token, hash_pw
+from backend.app.config import get_settings
+from backend.app.engine import seed_concepts
+from backend.app.llm import stub_stream
+from backend.app.models import _engine, Learner, SQLModel, Tenant, User
+
+client = TestClient(main.app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    seed_concepts()
+
+    global tenants
+    tenants = {}
+    with Session(_engine()) as s:
+        for plan in ("free", "school"):
+            t = Tenant(name=plan, plan=plan); s.add(t); s.flush()
+            u = User(tenant_id=t.id, email=f"{plan}@school.com", password_hash=hash_pw("pw"),
+                     role="admin" if plan == "school" else "parent")
+            l = Learner(tenant_id=t.id, name="Kid", dob="2018-01")
+            s.add(u); s.add(l); s.flush()
+            tenants[plan] = ({"Authorization": f"Bearer {create_token(u.id, t.id)}"}, l.id)
+        s.commit()
+
+
+@pytest.fixture(autouse=True)
+def _fresh():
+    reset_admission()
+    yield
+    reset_admission()
+
+
+def _lesson(plan: str):
+    hdrs, learner_id = tenants[plan]
+    return client.post(
+        "/lesson", json={"learner_id": learner_id, "user_text": "hi"}, headers=hdrs
+    )
+
+
+def test_rate_limit_per_plan(monkeypatch):
+    monkeypatch.setattr(get_settings(), "admission_burst", {"free": 3.0, "school": 100.0})
+    monkeypatch.setattr(get_settings(), "admission_rate", {"free": 0.1, "school": 1.0})
+    assert [_lesson("free").status_code for _ in range(3)] == [200, 200, 200]
+    r = _lesson("free")
+    assert r.status_code == 429
+    assert int(r.headers["retry-after"]) == 10  # one unit at 0.1 units/s
+    # the other tenant's bucket is untouched
+    assert all(_lesson("school").status_code == 200 for _ in range(5))
+
+
+def test_disabled_admits_everything(monkeypatch):
+    monkeypatch.setattr(get_settings(), "admission_enabled", False)
+    monkeypatch.setattr(get_settings(), "admission_burst", {"free": 1.0})
+    assert all(_lesson("free").status_code == 200 for _ in range(3))
+
+
+def test_slot_held_until_stream_ends(monkeypatch):
+    seen = []
+
+    async def _stream(*_a, **_kw):
+        async for tok in stub_stream():
+            seen.append(get_admission().queues["llm"].busy)
+            yield tok
+
+    monkeypatch.setattr(main, "stream_tutor_reply", _stream)
+    hdrs, learner_id = tenants["free"]
+    r = client.post(
+        "/lesson/stream", json={"learner_id": learner_id, "user_text": "hi"}, headers=hdrs
+    )
+    assert r.status_code == 200
+    assert seen and set(seen) == {1}
+    assert get_admission().queues["llm"].busy == 0
+
+
+def test_fair_queue_serves_tenants_by_weight():
+    async def scenario():
+        queue = FairQueue("llm", slots=1)
+        order = []
+        await queue.acquire("holder", 1.0, 1.0)
+
+        async def one(tenant, weight):
+            await queue.acquire(tenant, weight, 1.0)
+            order.append(tenant)
+            queue.release(0.01)
+
+        # the noisy tenant queues first, but can't keep the others waiting
+        tasks = [asyncio.create_task(one("noisy", 1.0)) for _ in range(6)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(one("quiet", 1.0)) for _ in range(2)]
+        tasks += [asyncio.create_task(one("school", 4.0)) for _ in range(4)]
+        await asyncio.sleep(0)
+        queue.release(0.01)
+        await asyncio.gather(*tasks)
+        return order, queue
+
+    order, queue = asyncio.run(scenario())
+    # finish tags: school 0.25 … 1.0 (weight 4), quiet 1, 2, noisy 1 … 6;
+    # ties go to the earlier arrival
+    assert order == (
+        ["school"] * 3 + ["noisy", "quiet", "school", "noisy", "quiet"] + ["noisy"] * 4
+    )
+    assert queue.busy == 0 and queue.stats()["queue_depth"] == 0
+    assert queue.stats()["admitted"] == 13
+
+
+def test_full_queue_and_long_wait_are_rejected(monkeypatch):
+    monkeypatch.setattr(get_settings(), "admission_max_queue_per_tenant", 1)
+    monkeypatch.setattr(get_settings(), "admission_max_wait_s", 0.05)
+
+    async def scenario():
+        queue = FairQueue("stt", slots=1)
+        await queue.acquire(1, 1.0, 2.0)
+        waiter = asyncio.create_task(queue.acquire(1, 1.0, 2.0))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await queue.acquire(1, 1.0, 2.0)
+        with pytest.raises(AdmissionRejected) as slow:
+            await waiter
+        queue.release(0.5)
+        return full.value, slow.value, queue
+
+    full, slow, queue = asyncio.run(scenario())
+    assert (full.reason, slow.reason) == ("queue", "timeout")
+    assert full.retry_after >= 1
+    assert queue.busy == 0 and queue.rejected == 2
+
+
+def test_abandoned_waiters_free_their_queue_places(monkeypatch):
+    monkeypatch.setattr(get_settings(), "admission_max_queue_per_tenant", 2)
+    monkeypatch.setattr(get_settings(), "admission_max_wait_s", 0.05)
+
+    async def scenario():
+        queue = FairQueue("stt", slots=1)
+        await queue.acquire(0, 1.0, 2.0)
+        timed_out = [asyncio.create_task(queue.acquire(1, 1.0, 2.0)) for _ in range(2)]
+        results = await asyncio.gather(*timed_out, return_exceptions=True)
+        assert all(isinstance(r, AdmissionRejected) for r in results)
+        after_timeouts = queue.stats()
+
+        cancelled = asyncio.create_task(queue.acquire(1, 1.0, 2.0))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        after_cancel = queue.stats()
+
+        # a full per-tenant quota of fresh waiters still fits, and is served
+        monkeypatch.setattr(get_settings(), "admission_max_wait_s", 1.0)
+        waiters = [asyncio.create_task(queue.acquire(1, 1.0, 2.0)) for _ in range(2)]
+        await asyncio.sleep(0)
+        queue.release(0.01)
+        await waiters[0]
+        queue.release(0.01)
+        await waiters[1]
+        queue.release(0.01)
+        return after_timeouts, after_cancel, queue
+
+    after_timeouts, after_cancel, queue = asyncio.run(scenario())
+    for stats in (after_timeouts, after_cancel):
+        assert stats["queue_depth"] == 0 and stats["waiting_by_tenant"] == {}
+    assert queue.busy == 0 and queue.stats()["queue_depth"] == 0
+    assert queue.rejected == 2 and queue.admitted == 3
+
+
+def test_ws_lesson_reports_retry_after(monkeypatch):
+    monkeypatch.setattr(get_settings(), "admission_burst", {"free": 1.0})
+    hdrs, learner_id = tenants["free"]
+    token = hdrs["Authorization"].split()[1]
+    with client.websocket_connect(f"/ws/lesson?token={token}") as ws:
+        ws.send_json({"learner_id": learner_id, "user_text": "hi"})
+        while ws.receive_json()["type"] != "done":
+            pass
+        ws.send_json({"learner_id": learner_id, "user_text": "again"})
+        frame = ws.receive_json()
+        assert frame["type"] == "error" and frame["retry_after"] >= 1
+
+
+def test_stats_endpoint():
+    _lesson("school")
+    assert client.get("/health/admission", headers=tenants["free"][0]).status_code == 403
+    r = client.get("/health/admission", headers=tenants["school"][0])
+    assert r.status_code == 200
+    llm = r.json()["queues"]["llm"]
+    assert llm["admitted"] == 1 and llm["busy"] == 0 and llm["queue_depth"] == 0
+
+
+class _Synth:
+    def __init__(self):
+        self.calls = 0
+
+    async def stream(self, text, voice):
+        self.calls += 1
+        yield text.encode()
+
+
+def test_tutor_page_pattern_stays_within_the_free_plan(monkeypatch, tmp_path):
+    # Tutor.jsx: POST /lesson, then GET /voice/tts for the reply with the
+    # same bearer token; replaying the reply is a cache hit and free
+    monkeypatch.setattr(get_settings(), "admission_burst", {"free": 6.0})
+    monkeypatch.setattr(get_settings(), "admission_rate", {"free": 0.01})
+    monkeypatch.setattr(get_settings(), "tts_cache_dir", str(tmp_path))
+    tts_cache.reset_tts_cache()
+    synth = _Synth()
+    tts_cache.set_synthesizer(synth)
+    hdrs, _ = tenants["free"]
+    try:
+        for _ in range(5):
+            reply = _lesson("free").json()["reply"]
+            for _ in range(12):
+                r = client.get("/voice/tts", params={"text": reply}, headers=hdrs)
+                assert r.status_code == 200
+    finally:
+        tts_cache.set_synthesizer(None)
+        tts_cache.reset_tts_cache()
+    assert synth.calls == 1
+    # 5 lessons + one synthesis: 5.5 of the 6 units; 55 cached replays cost nothing
+    assert get_admission().queues["tts"].stats()["admitted"] == 1
+    assert client.get("/voice/tts", params={"text": reply}).status_code == 401
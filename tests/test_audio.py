@@ -0,0 +1,183 @@
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app import stt
+from backend.app.audio import decode_for_whisper, trim_silence
+from backend.app.auth import hash_pw, create_token
+from backend.app.config import get_settings
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User, Learner
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    with Session(_engine()) as s:
+        t = Tenant(name="T"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="a@x.com", password_hash=hash_pw("pw")); s.add(u)
+        l = Learner(tenant_id=t.id, name="Kid", dob="2018-01"); s.add(l)
+        s.commit()
+        global jwt, learner_id
+        jwt = create_token(u.id, t.id)
+        learner_id = l.id
+
+
+def _wav(seconds, sr, channels=1) -> io.BytesIO:
+    t = np.arange(int(seconds * sr)) / sr
+    tone = np.sin(2 * np.pi * 440 * t).astype("float32")
+    buf = io.BytesIO()
+    sf.write(buf, np.stack([tone] * channels, axis=1), sr, format="WAV")
+    return buf
+
+
+def test_stereo_44k_downmixed_and_resampled(monkeypatch):
+    monkeypatch.setattr(get_settings(), "audio_block_frames", 4096)
+    out = decode_for_whisper(_wav(2.0, 44_100, channels=2))
+    assert out.dtype == np.float32
+    assert abs(len(out) - 32_000) <= 1
+    ref = np.sin(2 * np.pi * 440 * np.arange(len(out)) / 16_000)
+    assert np.abs(out - ref).max() < 0.01
+
+
+def _tone(freq, seconds, sr) -> io.BytesIO:
+    t = np.arange(int(seconds * sr)) / sr
+    buf = io.BytesIO()
+    sf.write(buf, np.sin(2 * np.pi * freq * t).astype("float32"), sr, format="WAV")
+    return buf
+
+
+@pytest.mark.parametrize("sr", [44_100, 48_000])
+def test_downsampling_filters_out_of_band_energy(sr, monkeypatch):
+    monkeypatch.setattr(get_settings(), "audio_block_frames", 4096)
+    # 10 kHz can't exist at 16 kHz; unfiltered it folds back to ~6 kHz
+    folded = decode_for_whisper(_tone(10_000, 1.0, sr))
+    assert np.sqrt(np.mean(folded ** 2)) < 0.01
+    speech = decode_for_whisper(_tone(3000, 1.0, sr))
+    assert np.sqrt(np.mean(speech ** 2)) > 0.65  # full-scale sine: 0.707
+
+
+def test_long_output_is_memory_mapped(monkeypatch):
+    monkeypatch.setattr(get_settings(), "audio_mmap_seconds", 0.5)
+    assert isinstance(decode_for_whisper(_wav(1.0, 16_000)), np.memmap)
+
+
+def test_duration_cap(monkeypatch):
+    monkeypatch.setattr(get_settings(), "audio_max_seconds", 1.0)
+    with pytest.raises(HTTPException) as exc:
+        decode_for_whisper(_wav(2.0, 16_000))
+    assert exc.value.status_code == 413
+
+
+def test_upload_size_cap(monkeypatch):
+    monkeypatch.setattr(get_settings(), "audio_max_bytes", 1000)
+    r = client.post(
+        "/voice/stt",
+        files={"file": ("a.wav", _wav(1.0, 16_000).getvalue(), "audio/wav")},
+        headers={"Authorization": f"Bearer {jwt}"},
+    )
+    assert r.status_code == 413
+
+
+def test_voice_turn_oversized_upload_keeps_socket_usable(monkeypatch):
+    monkeypatch.setattr(get_settings(), "audio_max_bytes", 1000)
+    with client.websocket_connect(f"/voice/turn?token={jwt}") as ws:
+        ws.send_json({"learner_id": learner_id})
+        for _ in range(4):
+            ws.send_bytes(b"\0" * 600)
+        ws.send_json({"type": "end"})
+        assert ws.receive_json()["type"] == "error"
+
+        ws.send_json({"learner_id": 987_654})
+        assert ws.receive_json() == {"type": "error", "detail": "Forbidden"}
+
+
+def _speech(seconds, sr=16_000):
+    t = np.arange(int(seconds * sr)) / sr
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype("float32")
+
+
+def _hiss(seconds, sr=16_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, 0.001, int(seconds * sr)).astype("float32")
+
+
+def test_trim_silence_keeps_padded_speech():
+    clip = np.concatenate([_hiss(2.0), _speech(1.0), _hiss(3.0), _speech(0.5), _hiss(2.0)])
+    cut = trim_silence(clip)
+    assert len(cut.segments) == 1
+    # both bursts plus vad_pad_ms either side, the pauses between gone
+    assert 1.5 * 16_000 < cut.kept < 2.6 * 16_000
+    assert cut.trimmed_ratio > 0.65
+
+
+def test_trim_silence_drops_clip_without_speech():
+    for clip in (_hiss(3.0), np.zeros(8000, dtype="float32"), np.zeros(0, dtype="float32")):
+        cut = trim_silence(clip)
+        assert cut.segments == [] and cut.kept == 0
+    click = np.concatenate([_hiss(1.0), _speech(0.03), _hiss(1.0)])
+    assert trim_silence(click).segments == []
+
+
+def test_trim_silence_splits_long_speech_at_pauses(monkeypatch):
+    monkeypatch.setattr(get_settings(), "vad_max_segment_s", 20.0)
+    clip = np.concatenate([x for _ in range(6) for x in (_speech(8.0), _hiss(1.0))])
+    cut = trim_silence(clip)
+    assert [round(len(s) / 16_000) for s in cut.segments] == [17, 17, 17]
+    assert all(len(s) <= 20 * 16_000 for s in cut.segments)
+
+    nonstop = trim_silence(_speech(45.0))  # no pause to split at: cut hard
+    assert [len(s) / 16_000 for s in nonstop.segments] == [20.0, 20.0, 5.0]
+    assert nonstop.trimmed_ratio == 0.0
+
+
+def test_trim_silence_disabled_passes_clip_through(monkeypatch):
+    monkeypatch.setattr(get_settings(), "vad_enabled", False)
+    clip = _hiss(1.0)
+    cut = trim_silence(clip)
+    assert len(cut.segments) == 1 and cut.segments[0] is clip
+
+
+class _CountingWhisper:
+    def __init__(self):
+        self.clips = []
+
+    def transcribe(self, data):
+        self.clips.append(len(data))
+        return {"text": f" part{len(self.clips)} "}
+
+
+def _post(clip) -> dict:
+    buf = io.BytesIO()
+    sf.write(buf, clip, 16_000, format="WAV")
+    r = client.post(
+        "/voice/stt", files={"file": ("a.wav", buf.getvalue(), "audio/wav")},
+        headers={"Authorization": f"Bearer {jwt}"},
+    )
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_stt_skips_silence_and_transcribes_segments(monkeypatch):
+    whisper = _CountingWhisper()
+    monkeypatch.setattr(get_settings(), "stt_executor", "thread")
+    monkeypatch.setattr(get_settings(), "vad_max_segment_s", 10.0)
+    monkeypatch.setattr(stt, "_get_whisper_model", lambda: whisper)
+    stt.shutdown_stt_pool()
+    try:
+        assert _post(_hiss(2.0)) == {"text": "", "trimmed_ratio": 1.0}
+        assert whisper.clips == []
+
+        body = _post(np.concatenate([_hiss(2.0), _speech(6.0), _hiss(1.0), _speech(6.0)]))
+        assert len(whisper.clips) == 2  # one call per segment
+        assert sorted(body["text"].split()) == ["part1", "part2"]
+        assert 0.05 < body["trimmed_ratio"] < 0.2
+    finally:
+        stt.shutdown_stt_pool()
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import event
+from sqlmodel import Session
+
+from backend.app import auth
+from backend.app.config import get_settings
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    with Session(_engine()) as s:
+        t = Tenant(name="C"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="c@x.com", password_hash="x"); s.add(u)
+        s.commit()
+        global jwt_token, user_id
+        jwt_token = auth.create_token(u.id, t.id)
+        user_id = u.id
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *_):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(_engine(), "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *_):
+        event.remove(_engine(), "before_cursor_execute", self)
+
+
+def test_claims_only_dependency_skips_db():
+    hdr = {"Authorization": f"Bearer {jwt_token}"}
+    client.get("/learners", headers=hdr)
+    with _QueryCounter() as q:
+        assert client.get("/learners", headers=hdr).status_code == 200
+    assert q.count == 1  # the learner query itself, no User lookup
+
+
+def test_user_cache_hit_and_invalidation():
+    hdr = {"Authorization": f"Bearer {jwt_token}"}
+    assert client.get("/me", headers=hdr).json()["email"] == "c@x.com"
+    with _QueryCounter() as q:
+        client.get("/me", headers=hdr)
+    assert q.count == 0
+
+    with Session(_engine()) as s:
+        u = s.get(User, user_id)
+        u.email = "changed@x.com"
+        s.add(u); s.commit()
+    assert client.get("/me", headers=hdr).json()["email"] == "changed@x.com"
+
+
+def test_expired_token_rejected():
+    cfg = get_settings()
+    stale = jwt.encode(
+        {"sub": str(user_id), "tenant": 1, "exp": datetime.utcnow() - timedelta(seconds=1)},
+        cfg.jwt_secret,
+        algorithm=cfg.jwt_algorithm,
+    )
+    assert auth.principal_from_token(stale) is None
+    assert client.get("/learners", headers={"Authorization": f"Bearer {stale}"}).status_code == 401
+
+
+def test_cache_disabled(monkeypatch):
+    monkeypatch.setattr(get_settings(), "auth_cache_enabled", False)
+    auth.clear_auth_caches()
+    hdr = {"Authorization": f"Bearer {jwt_token}"}
+    with _QueryCounter() as q:
+        assert client.get("/me", headers=hdr).status_code == 200
+    assert q.count == 1
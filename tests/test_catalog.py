@@ -0,0 +1,61 @@
+import json
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+from backend.app import catalog, engine
+from backend.app.config import get_settings
+from backend.app.models import _engine, SQLModel, Concept, Learner
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    engine.seed_concepts()
+
+
+def test_indexes():
+    cat = catalog.get_catalog()
+    add = cat.concept("addition within 10")
+    assert cat.by_id[add.id] is add
+    assert {c.label for c in cat.by_domain["math"]} == {"addition within 10", "counting by 5s"}
+    assert [c.label for c in cat.by_grade["6"]] == ["identify main idea"]
+    item = cat.pick_item("addition within 10")
+    assert item.concept == "addition within 10"
+    assert cat.items_by_id[item.id] is item
+
+
+def test_turn_bookkeeping_makes_no_queries():
+    learner = Learner(id=1, tenant_id=1, name="Kid", dob="2018-01")
+    catalog.get_catalog()
+    seen = []
+    listener = lambda *args: seen.append(args[2])  # noqa: E731
+    event.listen(_engine(), "before_cursor_execute", listener)
+    try:
+        messages = engine._build_messages(learner, "1+1")
+        engine._record_attempt(1, 1, "1+1")
+    finally:
+        event.remove(_engine(), "before_cursor_execute", listener)
+    assert seen == []
+    assert "practise" in messages[0]["content"]
+
+
+def test_version_bump_publishes_new_concepts(tmp_path, monkeypatch):
+    bank = tmp_path / "bank.json"
+    items = [
+        {"id": f"frac-{i}", "concept": "fractions", "prompt": f"{i}/2?", "answer": "x"}
+        for i in range(5000)
+    ]
+    bank.write_text(json.dumps({"version": 7, "items": items}))
+    monkeypatch.setattr(get_settings(), "item_bank_path", str(bank))
+
+    before = catalog.get_catalog()
+    with Session(_engine()) as s:
+        s.add(Concept(domain="math", label="fractions", grade="3")); s.commit()
+    assert catalog.get_catalog() is before  # no re-query until bumped
+
+    after = catalog.bump_catalog()
+    assert after.version == before.version + 1
+    assert after.item_bank_version == 7
+    assert after.concept("fractions").grade == "3"
+    assert len(after.items("fractions")) == 5000
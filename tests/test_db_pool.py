@@ -0,0 +1,48 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import Session
+
+from backend.app.main import app
+from backend.app.models import _engine, get_engine, SQLModel, Tenant, User
+from backend.app.auth import create_token
+
+client = TestClient(app)
+
+
+def test_engine_is_shared():
+    assert _engine() is _engine()
+    assert get_engine() is _engine()
+
+
+def test_sqlite_file_pragmas():
+    with _engine().connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # 1 == NORMAL
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+
+
+def _token(role: str) -> str:
+    SQLModel.metadata.create_all(_engine())
+    with Session(_engine()) as s:
+        t = Tenant(name="ops"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email=f"{role}@ops.com", password_hash="x", role=role)
+        s.add(u); s.commit()
+        return create_token(u.id, t.id)
+
+
+def test_pool_stats_requires_admin():
+    assert client.get("/health/db").status_code == 401
+    hdr = {"Authorization": f"Bearer {_token('parent')}"}
+    assert client.get("/health/db", headers=hdr).status_code == 403
+
+
+def test_pool_stats_endpoint():
+    with _engine().connect():
+        pass
+    hdr = {"Authorization": f"Bearer {_token('admin')}"}
+    r = client.get("/health/db", headers=hdr)
+    assert r.status_code == 200
+    assert all("@" not in key for key in r.json())
+    stats = next(iter(r.json().values()))
+    assert stats["checkouts"] >= 1
+    assert "wait_seconds_total" in stats
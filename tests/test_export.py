@@ -0,0 +1,106 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import Session
+
+from backend.app import export
+from backend.app.auth import create_token
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User, Learner, Concept, Progress
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    with Session(_engine()) as s:
+        t = Tenant(name="School"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="e@x.com", password_hash="x"); s.add(u)
+        other = Tenant(name="Other"); s.add(other); s.flush()
+        concepts = [Concept(domain="math", label=f"c{i}", grade="K") for i in range(3)]
+        s.add_all(concepts)
+        kids = [Learner(tenant_id=t.id, name=f"kid{i}", dob="2018-01") for i in range(2)]
+        stranger = Learner(tenant_id=other.id, name="stranger", dob="2018-01")
+        s.add_all(kids + [stranger]); s.flush()
+        for kid in kids:
+            for c in concepts:
+                s.add(Progress(learner_id=kid.id, concept_id=c.id, tenant_id=t.id,
+                               attempts=4, correct=3, recent_bits=0b1110, recent_count=4))
+        s.add(Progress(learner_id=stranger.id, concept_id=concepts[0].id, tenant_id=other.id))
+        s.commit()
+        global hdr
+        hdr = {"Authorization": f"Bearer {create_token(u.id, t.id)}"}
+
+
+def test_csv_export():
+    r = client.get("/tenants/me/progress/export", headers={**hdr, "Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert len(rows) == 6
+    assert {row["learner_name"] for row in rows} == {"kid0", "kid1"}
+    assert rows[0]["rolling_accuracy"] == "0.75"
+
+
+def test_ndjson_gzip_export():
+    chunks = export.export_stream(
+        json.loads(client.get("/me", headers=hdr).text)["tenant_id"], "ndjson", gzip=True
+    )
+    lines = gzip.decompress(b"".join(chunks)).decode().splitlines()
+    assert len(lines) == 6
+    assert json.loads(lines[0])["attempts"] == 4
+
+    r = client.get("/tenants/me/progress/export?format=ndjson", headers={**hdr, "Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert len(r.text.splitlines()) == 6  # httpx decodes transparently
+
+
+def test_bad_format():
+    assert client.get("/tenants/me/progress/export?format=xml", headers=hdr).status_code == 400
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("no VmRSS")
+
+
+@pytest.mark.slow
+def test_million_row_export_has_bounded_rss():
+    learners, concepts = 1000, 1000
+    with _engine().begin() as conn:
+        conn.execute(text("DELETE FROM progress"))
+        tid = conn.execute(text("INSERT INTO tenant (name, plan) VALUES ('big', 'school')")).lastrowid
+        conn.execute(
+            text("INSERT INTO concept (domain, label, grade) VALUES ('math', :l, 'K')"),
+            [{"l": f"big{i}"} for i in range(concepts)],
+        )
+        cids = [r[0] for r in conn.execute(text("SELECT id FROM concept WHERE label LIKE 'big%'"))]
+        conn.execute(
+            text("INSERT INTO learner (tenant_id, name, dob, persona_json) VALUES (:t, :n, '2018-01', '{}')"),
+            [{"t": tid, "n": f"k{i}"} for i in range(learners)],
+        )
+        lids = [r[0] for r in conn.execute(text("SELECT id FROM learner WHERE tenant_id = :t"), {"t": tid})]
+        for lid in lids:
+            conn.execute(
+                text("INSERT INTO progress (learner_id, concept_id, tenant_id, correct, attempts, "
+                     "recent_bits, recent_count, mastered) VALUES (:l, :c, :t, 1, 2, 1, 2, 0)"),
+                [{"l": lid, "c": cid, "t": tid} for cid in cids],
+            )
+
+    baseline = peak = _rss_bytes()
+    lines = 0
+    for i, chunk in enumerate(export.export_stream(tid, "csv")):
+        lines += chunk.count(b"\n")
+        if i % 50 == 0:
+            peak = max(peak, _rss_bytes())
+    assert lines == learners * concepts + 1  # + header
+    assert peak - baseline < 40 * 1024 * 1024
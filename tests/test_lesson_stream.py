@@ -0,0 +1,87 @@
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User, Learner
+from backend.app.auth import hash_pw, create_token
+from backend.app.config import get_settings
+from backend.app.engine import seed_concepts, stream_tutor_reply
+from backend.app.llm import STUB_REPLY
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    seed_concepts()
+
+    with Session(_engine()) as s:
+        t = Tenant(name="T"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="s@x.com", password_hash=hash_pw("pw")); s.add(u)
+        l = Learner(tenant_id=t.id, name="Kid", dob="2018-01"); s.add(l)
+        s.commit()
+        global jwt, learner_id
+        jwt = create_token(u.id, t.id)
+        learner_id = l.id
+
+
+def _sse_events(body: str):
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        yield lines["event"], json.loads(lines["data"])
+
+
+def test_stub_streams_first_token_early(monkeypatch):
+    monkeypatch.setattr(get_settings(), "llm_stub_token_delay_s", 0.05)
+
+    async def consume():
+        start = time.perf_counter()
+        first = None
+        tokens = []
+        async for tok in stream_tutor_reply(learner_id, "hi"):
+            if first is None:
+                first = time.perf_counter() - start
+            tokens.append(tok)
+        return first, time.perf_counter() - start, tokens
+
+    first, total, tokens = asyncio.run(consume())
+    assert "".join(tokens) == STUB_REPLY
+    assert len(tokens) > 1
+    assert first < total / 2
+
+
+def test_sse_route():
+    r = client.post(
+        "/lesson/stream",
+        json={"learner_id": learner_id, "user_text": "2+2"},
+        headers={"Authorization": f"Bearer {jwt}"},
+    )
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = list(_sse_events(r.text))
+    assert events[-1] == ("done", {"reply": STUB_REPLY})
+    assert "".join(d["text"] for e, d in events if e == "token") == STUB_REPLY
+
+    prog = client.get(f"/progress/{learner_id}", headers={"Authorization": f"Bearer {jwt}"})
+    assert prog.json()["addition within 10"]["attempts"] >= 1
+
+
+def test_websocket_route():
+    with client.websocket_connect(f"/ws/lesson?token={jwt}") as ws:
+        ws.send_json({"learner_id": learner_id, "user_text": "hi"})
+        frames = []
+        while True:
+            msg = ws.receive_json()
+            frames.append(msg)
+            if msg["type"] == "done":
+                break
+        assert frames[0]["type"] == "token"
+        assert frames[-1]["reply"] == STUB_REPLY
+
+        ws.send_json({"learner_id": 999_999, "user_text": "hi"})
+        assert ws.receive_json() == {"type": "error", "detail": "Learner not found"}
@@ -0,0 +1,158 @@
+import asyncio
+import types
+
+import openai
+import pytest
+
+from backend.app import llm
+from backend.app.config import get_settings
+
+
+class _FakeCompletions:
+    """Stands in for client.chat.completions; scripted per call."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+        self.inflight = 0
+        self.max_inflight = 0
+
+    async def create(self, **_):
+        self.calls += 1
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            step = self.script.pop(0) if self.script else ("ok", 0.0)
+            kind, delay = step
+            await asyncio.sleep(delay)
+            if kind == "conn":
+                raise openai.APIConnectionError(request=None)
+            msg = types.SimpleNamespace(content=" hi there ")
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=msg)])
+        finally:
+            self.inflight -= 1
+
+
+def _gateway(monkeypatch, script):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    gw = llm.LLMGateway()
+    completions = _FakeCompletions(script)
+    fake_client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    monkeypatch.setattr(gw, "client", lambda: fake_client)
+    return gw, completions
+
+
+@pytest.fixture(autouse=True)
+def _fast_policy(monkeypatch):
+    cfg = get_settings()
+    monkeypatch.setattr(cfg, "llm_timeout_s", 0.05)
+    monkeypatch.setattr(cfg, "llm_deadline_s", 1.0)
+    monkeypatch.setattr(cfg, "llm_backoff_s", 0.001)
+    monkeypatch.setattr(cfg, "llm_max_retries", 2)
+
+
+def test_stub_without_key(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    reply = asyncio.run(llm.LLMGateway().chat([], model="m"))
+    assert reply == llm.STUB_REPLY
+
+
+def test_retries_transient_errors(monkeypatch):
+    gw, completions = _gateway(monkeypatch, [("conn", 0), ("ok", 0)])
+    assert asyncio.run(gw.chat([], model="m")) == "hi there"
+    assert completions.calls == 2
+
+
+def test_timeout_falls_back_to_stub(monkeypatch):
+    gw, completions = _gateway(monkeypatch, [("ok", 0.2)] * 3)
+    assert asyncio.run(gw.chat([], model="m")) == llm.STUB_REPLY
+    assert completions.calls == 3
+
+
+def test_no_second_per_tenant_limit(monkeypatch):
+    # admission.py already bounds a tenant by plan; the gateway must not
+    # queue its admitted requests again (and burn their deadline doing so)
+    gw, completions = _gateway(monkeypatch, [("ok", 0.01)] * 6)
+
+    async def burst():
+        return await asyncio.gather(*(gw.chat([], model="m", tenant_id=1) for _ in range(6)))
+
+    assert asyncio.run(burst()) == ["hi there"] * 6
+    assert completions.max_inflight == 6
+
+
+def test_loop_change_closes_stale_client(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    gw = llm.LLMGateway()
+
+    async def grab():
+        client = gw.client()
+        await asyncio.sleep(0)
+        return client
+
+    first = asyncio.run(grab())
+
+    async def rebind():
+        gw.client()
+        await asyncio.gather(*llm._retiring)
+
+    asyncio.run(rebind())
+    assert first.is_closed()
+    asyncio.run(gw.aclose())
+
+
+def test_stream_deadline_covers_body(monkeypatch):
+    cfg = get_settings()
+    monkeypatch.setattr(cfg, "llm_deadline_s", 0.2)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    gw = llm.LLMGateway()
+    closed = []
+
+    class _StallingStream:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if not closed and not hasattr(self, "sent"):
+                self.sent = True
+                delta = types.SimpleNamespace(content="Hel")
+                return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+            await asyncio.sleep(10)  # upstream stops sending mid-answer
+
+        async def close(self):
+            closed.append(True)
+
+    async def create(**_):
+        return _StallingStream()
+
+    fake_client = types.SimpleNamespace(
+        chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create))
+    )
+    monkeypatch.setattr(gw, "client", lambda: fake_client)
+
+    async def collect():
+        t0 = asyncio.get_running_loop().time()
+        tokens = [tok async for tok in gw.stream_chat([], model="m")]
+        return tokens, asyncio.get_running_loop().time() - t0
+
+    tokens, elapsed = asyncio.run(collect())
+    assert tokens == ["Hel"]
+    assert elapsed < 1.0
+    assert closed == [True]
+
+
+def test_token_usage_is_counted(monkeypatch):
+    from backend.app.metrics import LLM_TOKENS
+
+    gw, completions = _gateway(monkeypatch, [])
+    usage = types.SimpleNamespace(prompt_tokens=12, completion_tokens=3)
+
+    async def create(**_):
+        msg = types.SimpleNamespace(content="hi")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=msg)], usage=usage)
+
+    monkeypatch.setattr(completions, "create", create)
+    before = LLM_TOKENS.value(model="usage-m", kind="prompt")
+    asyncio.run(gw.chat([], model="usage-m"))
+    assert LLM_TOKENS.value(model="usage-m", kind="prompt") - before == 12
+    assert LLM_TOKENS.value(model="usage-m", kind="completion") == 3
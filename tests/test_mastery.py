@@ -0,0 +1,66 @@
+import random
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app import mastery, progress
+from backend.app.auth import create_token
+from backend.app.engine import seed_concepts
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User, Learner, Progress
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    seed_concepts()
+    with Session(_engine()) as s:
+        t = Tenant(name="M"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="m@x.com", password_hash="x"); s.add(u)
+        l = Learner(tenant_id=t.id, name="Kid", dob="2018-01"); s.add(l)
+        s.commit()
+        global jwt, learner_id
+        jwt = create_token(u.id, t.id)
+        learner_id = l.id
+
+
+def test_window_rolls_over():
+    bits = count = 0
+    for _ in range(10):
+        bits, count = mastery.push(bits, count, True)
+    assert mastery.is_mastered(bits, count)
+    for _ in range(3):
+        bits, count = mastery.push(bits, count, False)
+    assert count == 10
+    assert mastery.accuracy(bits, count) == 0.7
+    assert not mastery.is_mastered(bits, count)
+    assert mastery.summary(bits, count)["recent"] == [1] * 7 + [0] * 3
+
+
+def test_bulk_upsert_matches_python_reference():
+    rng = random.Random(7)
+    recorder = progress.ProgressRecorder()
+    ref_bits = ref_count = 0
+    for _ in range(20):
+        for _ in range(rng.randint(1, 15)):
+            outcome = rng.random() < 0.85
+            recorder.record(learner_id, 3, outcome, tenant_id=1)
+            ref_bits, ref_count = mastery.push(ref_bits, ref_count, outcome)
+        recorder.flush()
+        with Session(_engine()) as s:
+            row = s.get(Progress, (learner_id, 3))
+            assert (row.recent_bits, row.recent_count) == (ref_bits, ref_count)
+            assert row.mastered == mastery.is_mastered(ref_bits, ref_count)
+    recorder.close()
+
+
+def test_progress_endpoint_reports_mastery():
+    hdr = {"Authorization": f"Bearer {jwt}"}
+    for _ in range(10):
+        client.post("/lesson", json={"learner_id": learner_id, "user_text": "2+2"}, headers=hdr)
+    body = client.get(f"/progress/{learner_id}", headers=hdr).json()["addition within 10"]
+    assert body["mastered"] is True
+    assert body["rolling_accuracy"] == 1.0
+    assert body["recent"] == [1] * 10
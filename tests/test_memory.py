@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from backend.app import memory
+from backend.app.config import get_settings
+
+
+@pytest.fixture
+def store(monkeypatch):
+    cfg = get_settings()
+    monkeypatch.setattr(cfg, "memory_token_budget", 300)
+    monkeypatch.setattr(cfg, "memory_recent_turns", 6)
+    monkeypatch.setattr(cfg, "memory_summary_tokens", 60)
+    monkeypatch.setattr(cfg, "memory_max_learners", 2)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    return memory.MemoryStore()
+
+
+def _prompt_tokens(messages) -> int:
+    return sum(memory.count_tokens(m["content"]) + memory.MESSAGE_OVERHEAD for m in messages)
+
+
+def test_prompt_stays_within_budget(store):
+    async def session():
+        sizes = []
+        for i in range(100):
+            msgs = store.build_messages(1, "You are a tutor.", f"question {i} " * 5)
+            sizes.append(_prompt_tokens(msgs))
+            store.append(1, f"question {i} " * 5, f"answer number {i} " * 6)
+            await asyncio.sleep(0)
+        await store.drain()
+        return sizes
+
+    sizes = asyncio.run(session())
+    assert max(sizes) <= 300
+    assert max(sizes[50:]) - min(sizes[50:]) < 80  # flat, not growing
+
+
+def test_old_turns_fold_into_summary(store):
+    async def session():
+        for i in range(5):
+            store.append(7, f"my dog is called Rex{i}", "nice!")
+        await store.drain()
+
+    asyncio.run(session())
+    conv = store._sessions[7]
+    assert len(conv.turns) == 6
+    assert not conv.folding
+    assert "Rex0" in conv.summary
+    msgs = store.build_messages(7, "sys", "hi")
+    assert "Rex0" in msgs[0]["content"]
+    assert [m["content"] for m in msgs[1:-1]][-1] == "nice!"
+
+
+def test_sessions_are_lru_bounded(store):
+    for learner in (1, 2, 3):
+        store.build_messages(learner, "sys", "hi")
+    assert list(store._sessions) == [2, 3]
+
+
+def test_tutor_reply_replays_history(monkeypatch):
+    from backend.app import engine
+    from backend.app.models import Learner
+
+    seen = []
+
+    async def fake_reply(messages, tenant_id=None):
+        seen.append(messages)
+        return f"reply {len(seen)}"
+
+    learner = Learner(id=42, tenant_id=1, name="Kid", dob="2018-01")
+    monkeypatch.setattr(engine, "_gpt_reply", fake_reply)
+    monkeypatch.setattr(engine, "_load_learner", lambda _id, _tenant=None: learner)
+    monkeypatch.setattr(engine, "_record_attempt", lambda *a: None)
+    monkeypatch.setattr(engine, "_practice_item", lambda *_: "")
+    memory.reset_memory()
+
+    async def two_turns():
+        await engine.tutor_reply(42, "what is 2+2?")
+        await engine.tutor_reply(42, "and 3+3?")
+
+    asyncio.run(two_turns())
+    assert [m["content"] for m in seen[1][1:]] == ["what is 2+2?", "reply 1", "and 3+3?"]
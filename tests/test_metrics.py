@@ -0,0 +1,94 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app import metrics
+from backend.app.auth import create_token, hash_pw
+from backend.app.config import get_settings
+from backend.app.main import app
+from backend.app.models import SQLModel, Learner, Tenant, User, _engine
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    with Session(_engine()) as s:
+        tenant = Tenant(name="metrics")
+        s.add(tenant)
+        s.flush()
+        parent = User(tenant_id=tenant.id, email="m@x.com", password_hash=hash_pw("pw"))
+        learner = Learner(tenant_id=tenant.id, name="Kid", dob="2018-01")
+        s.add(parent)
+        s.add(learner)
+        s.commit()
+        global jwt, learner_id
+        jwt = create_token(parent.id, tenant.id)
+        learner_id = learner.id
+
+
+def _sample(text: str, prefix: str) -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+               if line.startswith(prefix))
+
+
+def test_routes_db_and_stages_are_exported():
+    headers = {"Authorization": f"Bearer {jwt}"}
+    for _ in range(3):
+        assert client.get(f"/progress/{learner_id}", headers=headers).status_code == 200
+    client.get("/no/such/path")
+
+    body = client.get("/metrics")
+    assert body.status_code == 200
+    assert body.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = body.text
+    route = 'route="/progress/{learner_id}"'
+    assert _sample(text, f'learnpal_http_requests_total{{method="GET",{route},status="200"}}') >= 3
+    assert f'learnpal_http_request_duration_seconds_bucket{{method="GET",{route},le="+Inf"}}' in text
+    assert _sample(text, f"learnpal_request_db_queries_sum{{{route}}}") >= 3
+    assert 'route="<unmatched>"' in text and "/no/such/path" not in text
+    assert 'learnpal_stage_duration_seconds_count{stage="auth_decode"}' in text
+
+
+def test_server_timing_header(monkeypatch):
+    monkeypatch.setattr(get_settings(), "metrics_server_timing", True)
+    r = client.get(f"/progress/{learner_id}", headers={"Authorization": f"Bearer {jwt}"})
+    timing = r.headers["server-timing"]
+    assert timing.startswith("app;dur=")
+    assert 'db;dur=' in timing and "queries" in timing
+
+
+def test_metrics_token(monkeypatch):
+    monkeypatch.setattr(get_settings(), "metrics_token", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_timed_adds_to_current_request():
+    timings = metrics.RequestTimings()
+    token = metrics._current.set(timings)
+    try:
+        async def work():
+            async with metrics.timed("llm"):
+                await asyncio.sleep(0.01)
+
+        asyncio.run(work())
+        with metrics.timed("llm"):
+            pass
+    finally:
+        metrics._current.reset(token)
+    assert timings.stages["llm"] >= 0.01
+    assert "llm;dur=" in timings.server_timing()
+
+
+def test_histogram_render_is_cumulative():
+    h = metrics.Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 5.0):
+        h.observe(v, stage='a"b')
+    lines = h.render()
+    assert 't_seconds_bucket{stage="a\\"b",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="a\\"b",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="a\\"b",le="+Inf"} 3' in lines
+    assert 't_seconds_count{stage="a\\"b"} 3' in lines
@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlmodel import Session, select
+
+from backend.app import migrations
+from backend.app.export import export_query
+from backend.app.main import learner_page_query
+from backend.app.models import SQLModel, Concept, Progress, SchemaMigration, User, _engine
+
+LATEST = [version for version, _, _ in migrations.MIGRATIONS]
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    migrations.init_db()
+
+
+def _legacy_db(tmp_path, *users: str):
+    """A database as create_all() left it before migrations existed."""
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for ddl in (
+            "DROP TABLE schemamigration",
+            "DROP INDEX ix_user_email",
+            "DROP INDEX ix_learner_tenant_id_id",
+            "DROP INDEX ix_concept_label",
+            "DROP INDEX ix_progress_tenant_learner",
+            "CREATE INDEX ix_learner_tenant_id ON learner (tenant_id)",
+            "ALTER TABLE progress DROP COLUMN mastered",
+            "INSERT INTO tenant (id, name, plan, reply_cache_opt_out) VALUES (1, 't', 'free', 0)",
+        ):
+            conn.execute(text(ddl))
+        for email in users:
+            conn.execute(text(
+                "INSERT INTO user (tenant_id, email, password_hash, role) "
+                "VALUES (1, :email, 'x', 'parent')"
+            ), {"email": email})
+    return engine
+
+
+def _indexes(engine, table: str) -> set[str]:
+    return {ix["name"] for ix in inspect(engine).get_indexes(table)}
+
+
+def test_fresh_database_is_stamped():
+    with Session(_engine()) as s:
+        assert sorted(s.exec(select(SchemaMigration.version)).all()) == LATEST
+    assert migrations.migrate(_engine()) == []
+
+
+def test_legacy_database_is_migrated_once(tmp_path):
+    engine = _legacy_db(tmp_path, "a@x.com", "b@x.com")
+    assert migrations.migrate(engine) == LATEST
+    assert migrations.migrate(engine) == []
+
+    assert "mastered" in {c["name"] for c in inspect(engine).get_columns("progress")}
+    assert _indexes(engine, "learner") == {"ix_learner_tenant_id_id"}
+    assert _indexes(engine, "progress") == {"ix_progress_tenant_learner"}
+    assert "ix_concept_label" in _indexes(engine, "concept")
+    unique = {ix["name"] for ix in inspect(engine).get_indexes("user") if ix["unique"]}
+    assert unique == {"ix_user_email"}
+
+
+def test_duplicate_emails_stop_the_migration(tmp_path):
+    engine = _legacy_db(tmp_path, "dup@x.com", "dup@x.com")
+    with pytest.raises(migrations.MigrationError, match="1 e-mail"):
+        migrations.migrate(engine)
+    with engine.connect() as conn:  # baseline kept, version 2 rolled back
+        done = conn.execute(text("SELECT version FROM schemamigration")).scalars().all()
+    assert done == [1]
+
+
+def _plan(stmt) -> str:
+    engine = _engine()
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return " | ".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql)))
+
+
+@pytest.mark.parametrize("stmt, index", [
+    (select(User).where(User.email == "a@x.com"), "ix_user_email (email=?)"),
+    (select(Concept).where(Concept.label == "addition within 10"), "ix_concept_label (label=?)"),
+    (learner_page_query(1, 500, 50, ("id", "name")), "ix_learner_tenant_id_id (tenant_id=? AND id>?)"),
+    (select(Progress.learner_id, Progress.concept_id).where(Progress.tenant_id == 1),
+     "ix_progress_tenant_learner (tenant_id=?)"),
+    (export_query(1), "ix_progress_tenant_learner (tenant_id=?)"),
+])
+def test_hot_queries_use_an_index(stmt, index):
+    plan = _plan(stmt)
+    assert f"USING INDEX {index}" in plan or f"USING COVERING INDEX {index}" in plan, plan
+    assert "SCAN" not in plan and "TEMP B-TREE" not in plan, plan
@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+from backend.app import engine
+from backend.app.llm import STUB_REPLY
+from backend.app.moderation import SAFE_FALLBACK, Moderator, set_moderator
+from backend.app.reply_cache import get_reply_cache, reset_reply_cache
+from benchmarks.fakes import FakeModerator
+
+
+class FailingBackend:
+    calls = 0
+
+    async def flagged(self, text, tenant_id=None):
+        self.calls += 1
+        raise RuntimeError("moderation down")
+
+
+async def _tokens(text: str, delay: float, closed: list):
+    try:
+        for word in text.split(" "):
+            await asyncio.sleep(delay)
+            yield word + " "
+    finally:
+        closed.append(True)
+
+
+def test_lexicon_short_circuits_obvious_text():
+    backend = FakeModerator(latency_ms=0)
+    mod = Moderator(backend)
+    assert asyncio.run(mod.is_flagged(STUB_REPLY)) is False
+    assert asyncio.run(mod.is_flagged("Great job! What is 3 + 4? 😀")) is False
+    assert asyncio.run(mod.is_flagged("Go get a gun.")) is True
+    assert backend.calls == 0
+    assert mod.stats()["local_safe"] == 2 and mod.stats()["local_flagged"] == 1
+
+
+def test_remote_verdicts_are_cached_by_content():
+    backend = FakeModerator(latency_ms=0)
+    mod = Moderator(backend)
+
+    async def twice():
+        return [await mod.is_flagged("Photosynthesis turns light into sugar.") for _ in range(2)]
+
+    assert asyncio.run(twice()) == [False, False]
+    assert backend.calls == 1
+    assert mod.stats()["cache_hits"] == 1
+
+
+def test_backend_errors_fail_closed_after_one_retry():
+    backend = FailingBackend()
+    mod = Moderator(backend)
+    assert asyncio.run(mod.is_flagged("Photosynthesis turns light into sugar.")) is True
+    assert backend.calls == 2
+
+
+def test_safety_stage_overlaps_generation():
+    set_moderator(Moderator(FakeModerator(latency_ms=100)))
+    text = "Plants breathe through stomata. Roots drink groundwater. Leaves capture sunlight."
+    closed: list = []
+
+    async def run():
+        t0 = time.perf_counter()
+        out = [t async for t in engine._safety_stage(_tokens(text, 0.03, closed))]
+        return "".join(out), time.perf_counter() - t0
+
+    try:
+        out, elapsed = asyncio.run(run())
+    finally:
+        set_moderator(None)
+    assert out.strip() == text
+    # 9 tokens × 30 ms + ~one 100 ms verdict; serial checks would be ≥ 570 ms
+    assert elapsed < 0.5
+    assert closed
+
+
+def test_flagged_sentence_ends_stream_with_fallback():
+    set_moderator(Moderator(FakeModerator(latency_ms=10)))
+    text = "Plants breathe through stomata. Forbidden content follows here. Never spoken."
+    closed: list = []
+
+    async def run():
+        return [t async for t in engine._safety_stage(_tokens(text, 0.01, closed))]
+
+    try:
+        out = asyncio.run(run())
+    finally:
+        set_moderator(None)
+    assert "".join(out) == f"Plants breathe through stomata.  {SAFE_FALLBACK}"
+    assert closed  # LLM stream released
+
+
+class FakeGateway:
+    def __init__(self, text: str, delay: float = 0.0, fail_after: int = -1):
+        self.text, self.delay, self.fail_after = text, delay, fail_after
+        self.closed: list = []
+
+    async def stream_chat(self, messages, *, model, tenant_id=None, max_tokens=150, strict=False):
+        i = 0
+        async for tok in _tokens(self.text, self.delay, self.closed):
+            if i == self.fail_after:
+                raise RuntimeError("connection reset")
+            i += 1
+            yield tok
+
+
+def _lesson(monkeypatch, gateway: FakeGateway, user_text: str, latency_ms: float = 0):
+    from backend.app.models import Learner
+
+    learner = Learner(id=5, tenant_id=1, name="Kid", dob="2018-01")
+    monkeypatch.setattr(engine, "get_gateway", lambda: gateway)
+    monkeypatch.setattr(engine, "_load_learner", lambda _id, _tenant=None: learner)
+    monkeypatch.setattr(engine, "_record_attempt", lambda *a: None)
+    monkeypatch.setattr(engine, "_practice_item", lambda *_: "")
+    set_moderator(Moderator(FakeModerator(latency_ms=latency_ms)))
+    reset_reply_cache()
+
+    async def run():
+        t0 = time.perf_counter()
+        reply = await engine.tutor_reply(5, user_text)
+        return reply, time.perf_counter() - t0
+
+    try:
+        return asyncio.run(run())
+    finally:
+        set_moderator(None)
+
+
+def test_tutor_reply_replaces_flagged_reply(monkeypatch):
+    gateway = FakeGateway("Here is something forbidden and unusual.")
+    reply, _ = _lesson(monkeypatch, gateway, "tell me a secret")
+    assert reply == SAFE_FALLBACK
+    assert get_reply_cache().stats()["entries"] == 0
+
+
+def test_tutor_reply_moderates_while_generating(monkeypatch):
+    text = "Plants breathe through stomata. Great job! What is 3 + 4? Can you try? Count with me: 5, 10, 15!"
+    _, instant = _lesson(monkeypatch, FakeGateway(text, 0.02), "how do plants live")
+    reply, elapsed = _lesson(monkeypatch, FakeGateway(text, 0.02), "how do plants live", 150)
+    assert reply == text
+    # the one remote verdict (150 ms) lands while the lexicon-safe tail is
+    # still streaming in; moderating the finished reply would add all of it
+    assert elapsed - instant < 0.075
+
+
+def test_tutor_reply_cut_off_mid_stream_is_a_stub(monkeypatch):
+    gateway = FakeGateway("Plants breathe through stomata. Roots drink", fail_after=3)
+    reply, _ = _lesson(monkeypatch, gateway, "why are plants green")
+    assert reply == STUB_REPLY
+    assert gateway.closed
+    assert get_reply_cache().stats()["entries"] == 0
@@ -0,0 +1,65 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from passlib.hash import bcrypt
+from sqlmodel import Session
+
+from backend.app import passwords
+from backend.app.config import get_settings
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+
+
+def test_calibration_respects_floor_and_budget():
+    try:
+        assert passwords.calibrate(target_ms=0.001, floor=5) == 5
+        rounds = passwords.calibrate(target_ms=200, floor=4)
+        assert passwords.current_rounds() == rounds >= 4
+    finally:
+        passwords.reset_policy()
+
+
+def test_login_rehashes_outdated_cost(monkeypatch):
+    monkeypatch.setattr(get_settings(), "auth_bcrypt_rounds", 6)
+    with Session(_engine()) as s:
+        t = Tenant(name="R"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="r@x.com",
+                 password_hash=bcrypt.using(rounds=4).hash("pw"))
+        s.add(u); s.commit()
+        user_id = u.id
+
+    r = client.post("/auth/token", data={"username": "r@x.com", "password": "pw"})
+    assert r.status_code == 200
+    with Session(_engine()) as s:
+        stored = s.get(User, user_id).password_hash
+    assert passwords.hash_cost(stored) == 6
+    assert bcrypt.verify("pw", stored)
+
+    assert client.post(
+        "/auth/token", data={"username": "r@x.com", "password": "nope"}
+    ).status_code == 400
+
+
+def test_full_queue_is_busy(monkeypatch):
+    monkeypatch.setattr(get_settings(), "auth_hash_max_queue", 1)
+    monkeypatch.setattr(get_settings(), "auth_bcrypt_rounds", 4)
+    pool = passwords.HashPool()
+
+    async def burst():
+        return await asyncio.gather(
+            pool.hash("a"), pool.hash("b"), return_exceptions=True
+        )
+
+    try:
+        results = asyncio.run(burst())
+    finally:
+        pool.shutdown()
+    assert isinstance(results[1], passwords.HashBusy)
+    assert pool.stats()["rejected"] == 1
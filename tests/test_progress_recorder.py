@@ -0,0 +1,87 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from backend.app import progress
+from backend.app.auth import create_token
+from backend.app.config import get_settings
+from backend.app.engine import seed_concepts
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User, Learner, Progress
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    seed_concepts()
+    with Session(_engine()) as s:
+        t = Tenant(name="P"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="w@x.com", password_hash="x"); s.add(u)
+        l = Learner(tenant_id=t.id, name="Kid", dob="2018-01"); s.add(l)
+        s.commit()
+        global jwt, learner_id
+        jwt = create_token(u.id, t.id)
+        learner_id = l.id
+
+
+def _slow_flushes(monkeypatch):
+    cfg = get_settings()
+    monkeypatch.setattr(cfg, "progress_flush_interval_s", 60)
+    monkeypatch.setattr(cfg, "progress_flush_max", 10_000)
+    progress.shutdown_progress_recorder()
+
+
+def test_attempts_coalesce_into_one_upsert(monkeypatch):
+    _slow_flushes(monkeypatch)
+    recorder = progress.get_progress_recorder()
+    for i in range(50):
+        recorder.record(learner_id, 2, correct=i % 2 == 0, tenant_id=1)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(_engine(), "before_cursor_execute", listener)
+    try:
+        assert recorder.flush() == 1
+    finally:
+        event.remove(_engine(), "before_cursor_execute", listener)
+    assert [s for s in statements if "ON CONFLICT" in s]
+
+    recorder.record(learner_id, 2, correct=True, tenant_id=1)
+    recorder.flush()
+    with Session(_engine()) as s:
+        row = s.get(Progress, (learner_id, 2))
+        assert (row.attempts, row.correct) == (51, 26)
+
+
+def test_progress_reads_unflushed_attempts(monkeypatch):
+    _slow_flushes(monkeypatch)
+    hdr = {"Authorization": f"Bearer {jwt}"}
+    before = client.get(f"/progress/{learner_id}", headers=hdr).json()
+    base = before.get("addition within 10", {"attempts": 0})["attempts"]
+    for _ in range(3):
+        client.post("/lesson", json={"learner_id": learner_id, "user_text": "1+1"}, headers=hdr)
+
+    assert progress.get_progress_recorder().stats()["pending_attempts"] == 3
+    body = client.get(f"/progress/{learner_id}", headers=hdr).json()
+    assert body["addition within 10"]["attempts"] == base + 3
+
+    progress.shutdown_progress_recorder()  # durable flush
+    body = client.get(f"/progress/{learner_id}", headers=hdr).json()
+    assert body["addition within 10"]["attempts"] == base + 3
+
+
+def test_failed_flush_requeues(monkeypatch):
+    _slow_flushes(monkeypatch)
+    recorder = progress.get_progress_recorder()
+    recorder.record(learner_id, 3, correct=True, tenant_id=1)
+
+    def boom(*_):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(progress, "_bulk_upsert", boom)
+    assert recorder.flush() == 0
+    assert recorder.stats()["pending_attempts"] == 1
+    monkeypatch.undo()
+    assert recorder.flush() == 1
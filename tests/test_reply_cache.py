@@ -0,0 +1,160 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app import engine
+from backend.app.auth import create_token, hash_pw
+from backend.app.config import get_settings
+from backend.app.engine import seed_concepts
+from backend.app.llm import STUB_REPLY
+from backend.app.main import app
+from backend.app.models import SQLModel, Learner, Tenant, User, _engine
+from backend.app.reply_cache import ReplyCache, cache_key, get_reply_cache
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    seed_concepts()
+    with Session(_engine()) as s:
+        tenant = Tenant(name="cache")
+        s.add(tenant)
+        s.flush()
+        parent = User(tenant_id=tenant.id, email="c@x.com", password_hash=hash_pw("pw"))
+        learner = Learner(tenant_id=tenant.id, name="Kid", dob="2018-01")
+        school = Tenant(name="class", plan="school")
+        s.add(school)
+        s.flush()
+        teacher = User(tenant_id=school.id, email="t@x.com", password_hash=hash_pw("pw"))
+        classmates = [
+            Learner(tenant_id=school.id, name=f"Kid {i}", dob="2019-03") for i in range(20)
+        ]
+        s.add(parent)
+        s.add(learner)
+        s.add(teacher)
+        s.add_all(classmates)
+        s.commit()
+        global jwt, learner_id, teacher_jwt, classmate_ids
+        jwt = create_token(parent.id, tenant.id)
+        learner_id = learner.id
+        teacher_jwt = create_token(teacher.id, school.id)
+        classmate_ids = [c.id for c in classmates]
+
+
+def _prompt(user_text: str, system: str = "You are a tutor.") -> list[dict[str, str]]:
+    return [{"role": "system", "content": system}, {"role": "user", "content": user_text}]
+
+
+def _history(*turns: str, last: str = "2+3") -> list[dict[str, str]]:
+    roles = ("user", "assistant") * len(turns)
+    return [_prompt("")[0], *({"role": r, "content": t} for r, t in zip(roles, turns)),
+            {"role": "user", "content": last}]
+
+
+def test_key_normalizes_utterance_and_covers_short_history():
+    assert cache_key("m", _prompt("What is 2+3?")) == cache_key("m", _prompt("  what is   2+3 "))
+    assert cache_key("m", _prompt("2+3")) != cache_key("m", _prompt("2+3", system="other"))
+    assert cache_key("m", _prompt("2+3")) != cache_key("other", _prompt("2+3"))
+    # early turns: the history is part of the key
+    assert cache_key("m", _history("Hi!", "hello")) == cache_key("m", _history("hi", "hello"))
+    assert cache_key("m", _history("hi", "hello")) != cache_key("m", _history("hi", "hey"))
+    assert cache_key("m", _history("hi", "hello")) != cache_key("m", _prompt("2+3"))
+    # long conversations and odd shapes are not cached
+    assert cache_key("m", _history("a", "b", "c", "d", "e", "f")) is None
+    assert cache_key("m", _history("a", "b")[:-1]) is None
+
+
+def test_ttl_and_byte_bound_eviction(monkeypatch):
+    cfg = get_settings()
+    monkeypatch.setattr(cfg, "reply_cache_max_bytes", 2000)
+    monkeypatch.setattr(cfg, "reply_cache_ttl_s", 60)
+    cache = ReplyCache()
+    for i in range(20):
+        cache.put(f"k{i}", "x" * 100)
+    assert cache.stats()["bytes"] <= 2000
+    assert cache.get("k0") is None and cache.get("k19") == "x" * 100
+    assert cache.evictions > 0
+
+    cache.ttl = -1
+    cache.put("stale", "old")
+    assert cache.get("stale") is None
+
+
+def test_identical_concurrent_misses_share_one_call():
+    cache = ReplyCache()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "five"
+
+    async def burst():
+        return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(10)))
+
+    assert asyncio.run(burst()) == ["five"] * 10
+    assert calls == 1
+    assert cache.stats()["coalesced"] == 9
+    assert asyncio.run(cache.get_or_compute("k", compute)) == "five"
+    assert calls == 1 and cache.hits == 1
+
+
+def test_stub_reply_is_not_cached():
+    cache = ReplyCache()
+
+    async def stub():
+        return STUB_REPLY
+
+    asyncio.run(cache.get_or_compute("k", stub))
+    assert cache.get("k") is None
+
+
+def test_lesson_hits_cache_until_tenant_opts_out(monkeypatch):
+    calls = []
+
+    async def fake_reply(messages, tenant_id=None):
+        calls.append(messages)
+        return "2 + 3 is 5!"
+
+    monkeypatch.setattr(engine, "_gpt_reply", fake_reply)
+    monkeypatch.setattr(engine, "_practice_item", lambda *_: "")
+    monkeypatch.setattr(get_settings(), "memory_enabled", False)
+    headers = {"Authorization": f"Bearer {jwt}"}
+
+    def ask(text):
+        r = client.post("/lesson", json={"learner_id": learner_id, "user_text": text}, headers=headers)
+        assert r.status_code == 200
+        return r.json()["reply"]
+
+    assert ask("What is 2+3?") == ask("what is 2+3") == "2 + 3 is 5!"
+    assert len(calls) == 1
+
+    r = client.patch("/tenants/me/settings", json={"reply_cache_opt_out": True}, headers=headers)
+    assert r.json() == {"reply_cache_opt_out": True}
+    ask("What is 2+3?")
+    ask("What is 2+3?")
+    assert len(calls) == 3
+    assert get_reply_cache().stats()["hits"] == 1
+
+
+def test_second_turns_are_shared_with_default_settings(monkeypatch):
+    # memory on, practice items on: a class of kindergartners who all open
+    # with "hi" and then say "I don't know" needs two LLM calls, not forty
+    calls = []
+
+    async def fake_reply(messages, tenant_id=None):
+        calls.append(messages)
+        return f"reply to {messages[-1]['content']}"
+
+    monkeypatch.setattr(engine, "_gpt_reply", fake_reply)
+    headers = {"Authorization": f"Bearer {teacher_jwt}"}
+    for text in ("hi", "I don't know"):
+        for lid in classmate_ids:
+            r = client.post("/lesson", json={"learner_id": lid, "user_text": text}, headers=headers)
+            assert r.json() == {"reply": f"reply to {text}"}, r.json()
+    assert len(calls) == 2
+    assert len(calls[1]) == 4  # system, "hi", its reply, "I don't know"
@@ -0,0 +1,85 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app.auth import create_token
+from backend.app.config import get_settings
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    with Session(_engine()) as s:
+        t = Tenant(name="School"); s.add(t)
+        other = Tenant(name="Other"); s.add(other); s.flush()
+        u = User(tenant_id=t.id, email="r@x.com", password_hash="x"); s.add(u)
+        o = User(tenant_id=other.id, email="ro@x.com", password_hash="x"); s.add(o)
+        s.commit()
+        global hdr, other_hdr
+        hdr = {"Authorization": f"Bearer {create_token(u.id, t.id)}"}
+        other_hdr = {"Authorization": f"Bearer {create_token(o.id, other.id)}"}
+
+
+def _names() -> list[str]:
+    return [l["name"] for l in client.get("/learners?limit=1000", headers=hdr).json()]
+
+
+def test_csv_import_reports_bad_rows(monkeypatch):
+    monkeypatch.setattr(get_settings(), "roster_batch_rows", 2)
+    body = (
+        "Name,DOB,class\n"
+        "Ada,2017-03,1A\n"
+        "\n"
+        "Bob,2017-13,1A\n"      # bad month
+        "Cy,2016-11\n"          # missing field
+        '"Dee, Jr.",2016-01,1B\n'
+        "  ,2016-02,1B\n"       # blank name
+        "Eve,2015-07,1B\n"
+    )
+    r = client.post("/learners/import", content=body, headers=hdr)
+    assert r.status_code == 200
+    out = r.json()
+    assert out["status"] == "done"
+    assert (out["rows"], out["created"], out["failed"]) == (6, 3, 3)
+    assert [e["row"] for e in out["errors"]] == [4, 5, 7]
+    assert "dob" in out["errors"][0]["error"]
+    assert _names()[-3:] == ["Ada", "Dee, Jr.", "Eve"]
+
+
+def test_ndjson_and_bad_input():
+    lines = [json.dumps({"name": "Nia", "dob": "2018-05"}), "{oops", "[1]"]
+    r = client.post("/learners/import?format=ndjson", content="\n".join(lines), headers=hdr)
+    assert (r.json()["created"], r.json()["failed"]) == (1, 2)
+
+    r = client.post("/learners/import", content="first,last\nA,B\n", headers=hdr)
+    assert r.status_code == 400 and "dob" in r.json()["detail"]
+    assert client.post("/learners/import?format=xml", content="", headers=hdr).status_code == 400
+
+
+def test_size_cap(monkeypatch):
+    monkeypatch.setattr(get_settings(), "roster_max_bytes", 100)
+    body = "name,dob\n" + "Zed,2017-01\n" * 20
+    assert client.post("/learners/import", content=body, headers=hdr).status_code == 413
+
+
+def test_large_roster_becomes_a_job(monkeypatch):
+    monkeypatch.setattr(get_settings(), "roster_inline_bytes", 1000)
+    body = "name,dob\n" + "".join(f"kid{i},2016-04\n" for i in range(300))
+    r = client.post("/learners/import", content=body, headers=hdr)
+    assert r.status_code == 202
+    url = r.headers["location"]
+    assert client.get(url, headers=other_hdr).status_code == 404  # other tenant
+
+    for _ in range(200):
+        job = client.get(url, headers=hdr).json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.02)
+    assert (job["status"], job["created"], job["failed"]) == ("done", 300, 0)
+    assert _names().count("kid299") == 1
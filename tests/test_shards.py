@@ -0,0 +1,105 @@
+import tempfile
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlmodel import Session
+
+from backend.app import progress, shards
+from backend.app.config import get_settings
+from backend.app.engine import seed_concepts
+from backend.app.main import app
+from backend.app.models import SQLModel, Learner, Progress, TenantShard, _engine, get_engine
+
+client = TestClient(app)
+_dir = tempfile.mkdtemp(prefix="learnpal-shards-")
+SHARDS = {"a": f"sqlite:///{_dir}/a.db", "b": f"sqlite:///{_dir}/b.db"}
+
+
+def setup_module(_=None):
+    global _saved
+    cfg = get_settings()
+    _saved = cfg.db_shards, cfg.db_new_tenant_shards
+    cfg.db_shards, cfg.db_new_tenant_shards = SHARDS, ["a", "b"]
+    shards.reset_router()
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    seed_concepts()
+    shards.init_shards()
+
+
+def teardown_module(_=None):
+    cfg = get_settings()
+    cfg.db_shards, cfg.db_new_tenant_shards = _saved
+    shards.reset_router()
+
+
+def _signup(email: str) -> dict:
+    r = client.post("/auth/signup", json={"email": email, "password": "pw", "tenant_name": email})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def _learners(url, tenant_id=None) -> list[int]:
+    stmt = select(Learner.id)
+    if tenant_id is not None:
+        stmt = stmt.where(Learner.tenant_id == tenant_id)
+    with get_engine(url).connect() as conn:
+        return list(conn.execute(stmt).scalars())
+
+
+def _attempts(url, learner_id: int) -> int:
+    with get_engine(url).connect() as conn:
+        return conn.execute(
+            select(func.coalesce(func.sum(Progress.attempts), 0))
+            .where(Progress.learner_id == learner_id)
+        ).scalar_one()
+
+
+def test_tenants_are_placed_and_routed():
+    hdr_a, hdr_b = _signup("a@school.com"), _signup("b@school.com")
+    a = [client.post("/learners", json={"name": f"a{i}", "dob": "2018-01"}, headers=hdr_a).json()
+         for i in range(2)]
+    b = client.post("/learners", json={"name": "b0", "dob": "2018-01"}, headers=hdr_b).json()
+
+    ids = [l["id"] for l in a] + [b["id"]]
+    assert len(set(ids)) == 3  # one id space across shards
+    assert sorted(_learners(SHARDS["a"])) == ids[:2]
+    assert _learners(SHARDS["b"]) == [b["id"]]
+    assert _learners(None) == []  # nothing on the default shard
+
+    assert [l["name"] for l in client.get("/learners", headers=hdr_a).json()] == ["a0", "a1"]
+    lesson = {"learner_id": b["id"], "user_text": "2+2"}
+    assert client.post("/lesson", json=lesson, headers=hdr_b).status_code == 200
+    assert client.post("/lesson", json=lesson, headers=hdr_a).status_code == 404
+    progress.get_progress_recorder().flush()
+    assert _attempts(SHARDS["b"], b["id"]) == 1
+    assert client.get(f"/progress/{b['id']}", headers=hdr_b).json()
+
+
+def test_move_tenant_between_shards():
+    hdr = _signup("mover@school.com")
+    learner = client.post("/learners", json={"name": "m", "dob": "2018-01"}, headers=hdr).json()
+    tenant_id = learner["tenant_id"]
+    source = shards.get_router().shard_of(tenant_id)
+    target = "b" if source == "a" else "a"
+    for _ in range(2):
+        client.post("/lesson", json={"learner_id": learner["id"], "user_text": "1+1"}, headers=hdr)
+    # one attempt still buffered: the move flushes it to the source first
+    progress.get_progress_recorder().flush()
+    client.post("/lesson", json={"learner_id": learner["id"], "user_text": "1+1"}, headers=hdr)
+
+    copied = shards.move_tenant(tenant_id, target)
+    assert copied == {"learner": 1, "progress": 1, "tenantprogress": 1}
+    assert _learners(SHARDS[source], tenant_id) == []
+    assert _attempts(SHARDS[target], learner["id"]) == 3
+    with Session(_engine()) as s:
+        assert s.get(TenantShard, tenant_id).shard == target
+
+    assert client.get("/learners", headers=hdr).json()[0]["id"] == learner["id"]
+    client.post("/lesson", json={"learner_id": learner["id"], "user_text": "1+1"}, headers=hdr)
+    progress.get_progress_recorder().flush()
+    assert _attempts(SHARDS[target], learner["id"]) == 4
+
+    shards.move_tenant(tenant_id, shards.DEFAULT_SHARD)
+    with Session(_engine()) as s:
+        assert s.get(TenantShard, tenant_id) is None
+    assert _learners(None, tenant_id) == [learner["id"]]
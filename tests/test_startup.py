@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from backend.app import main
+from backend.app.models import SQLModel, Concept, _engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("numpy", "soundfile", "whisper", "torch", "edge_tts", "openai", "tiktoken", "dotenv")
+
+_PROBE = """
+import json, sys
+import backend.app.main
+print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+
+def test_import_is_light_and_side_effect_free(tmp_path):
+    db = tmp_path / "never.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db}", PYTHONPATH=ROOT)
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(heavy=HEAVY)],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120, check=True,
+    )
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
+    assert not db.exists()  # no schema / seeding until the lifespan runs
+
+
+def test_lifespan_runs_each_phase_once(monkeypatch):
+    SQLModel.metadata.drop_all(_engine())
+    monkeypatch.setattr(main, "_done_phases", set())
+    calls = []
+    phases = tuple(
+        (name, (lambda name=name, fn=fn: (calls.append(name), fn())))
+        for name, fn in main.STARTUP_PHASES
+    )
+    monkeypatch.setattr(main, "STARTUP_PHASES", phases)
+
+    with TestClient(main.app) as client:
+        assert client.get("/health").status_code == 200
+    with TestClient(main.app):
+        pass
+
+    assert calls == ["env", "database", "concepts", "shards"]
+    with Session(_engine()) as s:
+        assert s.exec(select(Concept)).first() is not None
@@ -0,0 +1,92 @@
+import asyncio
+import io
+import threading
+
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app import stt
+from backend.app.auth import create_token, hash_pw
+from backend.app.config import get_settings
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    with Session(_engine()) as s:
+        t = Tenant(name="T"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="p@x.com", password_hash=hash_pw("pw")); s.add(u)
+        s.commit()
+        global AUTH
+        AUTH = {"Authorization": f"Bearer {create_token(u.id, t.id)}"}
+
+
+class _SlowWhisper:
+    def __init__(self):
+        self.calls = 0
+        self.gate = threading.Event()
+
+    def transcribe(self, clip):
+        self.calls += 1
+        self.gate.wait(2)
+        return {"text": f" {len(clip)} "}
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    cfg = get_settings()
+    monkeypatch.setattr(cfg, "stt_executor", "thread")
+    monkeypatch.setattr(cfg, "stt_workers", 1)
+    monkeypatch.setattr(cfg, "stt_batch_window_ms", 50)
+    monkeypatch.setattr(cfg, "stt_batch_max", 8)
+    model = _SlowWhisper()
+    monkeypatch.setattr(stt, "_get_whisper_model", lambda: model)
+    stt.shutdown_stt_pool()
+    yield model
+    model.gate.set()
+    stt.shutdown_stt_pool()
+
+
+def test_concurrent_short_clips_share_a_batch(fake_model):
+    fake_model.gate.set()
+    pool = stt.get_stt_pool()
+
+    async def burst():
+        clips = [np.zeros(n, dtype="float32") for n in (100, 200, 300)]
+        return await asyncio.gather(*(pool.transcribe(c) for c in clips))
+
+    assert asyncio.run(burst()) == ["100", "200", "300"]
+    assert pool.batches == 1
+    assert fake_model.calls == 3
+
+
+def test_warm_up_loads_model(fake_model):
+    fake_model.gate.set()
+    asyncio.run(stt.get_stt_pool().start(warm=True))
+    assert stt.get_stt_pool().stats()["workers"] == 1
+
+
+def test_queue_full_returns_503(fake_model, monkeypatch):
+    monkeypatch.setattr(get_settings(), "stt_max_queue", 0)
+    buf = io.BytesIO()
+    tone = 0.3 * np.sin(2 * np.pi * 220 * np.arange(1600) / 16_000)  # silence skips the pool
+    sf.write(buf, tone.astype("float32"), 16_000, format="WAV")
+    r = client.post(
+        "/voice/stt", files={"file": ("a.wav", buf.getvalue(), "audio/wav")}, headers=AUTH
+    )
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "1"
+
+
+def test_worker_initializer_preloads_model(monkeypatch):
+    monkeypatch.setattr(stt, "_stt_model", None)
+    monkeypatch.setattr(stt, "_model_loader", None)
+    stt._init_worker("tiny", "benchmarks.fakes:FakeWhisper", 0, preload=True)
+    assert stt._stt_model is not None
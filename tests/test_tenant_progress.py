@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app import progress
+from backend.app.auth import create_token
+from backend.app.engine import seed_concepts
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    seed_concepts()
+    with Session(_engine()) as s:
+        t = Tenant(name="Class"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="teach@x.com", password_hash="x"); s.add(u)
+        other = Tenant(name="Other"); s.add(other); s.flush()
+        o = User(tenant_id=other.id, email="o@x.com", password_hash="x"); s.add(o)
+        s.commit()
+        global hdr, other_hdr
+        hdr = {"Authorization": f"Bearer {create_token(u.id, t.id)}"}
+        other_hdr = {"Authorization": f"Bearer {create_token(o.id, other.id)}"}
+
+
+def test_heat_map_matrix_and_etag():
+    ids = [
+        client.post("/learners", json={"name": f"kid{i}", "dob": "2018-01"}, headers=hdr).json()["id"]
+        for i in range(3)
+    ]
+    client.post("/learners", json={"name": "stranger", "dob": "2018-01"}, headers=other_hdr)
+    for _ in range(2):
+        client.post("/lesson", json={"learner_id": ids[1], "user_text": "1+1"}, headers=hdr)
+    progress.get_progress_recorder().flush()
+
+    r = client.get("/tenants/me/progress", headers=hdr)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["learners"]["id"] == ids
+    col = body["concepts"]["label"].index("addition within 10")
+    assert [row[col] for row in body["attempts"]] == [0, 2, 0]
+    assert [row[col] for row in body["correct"]] == [0, 2, 0]
+    assert len(body["attempts"][0]) == len(body["concepts"]["id"])
+
+    etag = r.headers["etag"]
+    again = client.get("/tenants/me/progress", headers={**hdr, "If-None-Match": etag})
+    assert again.status_code == 304
+
+    client.post("/lesson", json={"learner_id": ids[0], "user_text": "hi"}, headers=hdr)
+    progress.get_progress_recorder().flush()
+    changed = client.get("/tenants/me/progress", headers={**hdr, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["attempts"][0][col] == 1
+
+
+def test_heat_map_is_tenant_scoped():
+    body = client.get("/tenants/me/progress", headers=other_hdr).json()
+    assert body["learners"]["name"] == ["stranger"]
+    assert client.get("/tenants/me/progress").status_code == 401
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app import tts_cache
+from backend.app.auth import create_token, hash_pw
+from backend.app.config import get_settings
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User
+
+client = TestClient(app)
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    with Session(_engine()) as s:
+        t = Tenant(name="T"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="tts@x.com", password_hash=hash_pw("pw")); s.add(u)
+        s.commit()
+        client.headers["Authorization"] = f"Bearer {create_token(u.id, t.id)}"
+
+
+class _CountingSynth:
+    def __init__(self):
+        self.calls = 0
+
+    async def stream(self, text, voice):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        for word in text.split():
+            yield f"[{word}]".encode()
+
+
+@pytest.fixture
+def synth(monkeypatch, tmp_path):
+    cfg = get_settings()
+    monkeypatch.setattr(cfg, "tts_cache_dir", str(tmp_path))
+    tts_cache.reset_tts_cache()
+    fake = _CountingSynth()
+    tts_cache.set_synthesizer(fake)
+    yield fake
+    tts_cache.set_synthesizer(None)
+    tts_cache.reset_tts_cache()
+
+
+def test_concurrent_misses_synthesize_once(synth):
+    cache = tts_cache.get_tts_cache()
+
+    async def many():
+        async def one():
+            return b"".join([c async for c in cache.stream("Well done!", "v")])
+        return await asyncio.gather(*(one() for _ in range(5)))
+
+    assert asyncio.run(many()) == [b"[Well][done!]"] * 5
+    assert synth.calls == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_tts_route_hits_etag_and_range(synth):
+    r = client.get("/voice/tts", params={"text": "OK, let's keep going!"})
+    assert r.status_code == 200
+    assert r.content == b"[OK,][let's][keep][going!]"
+    etag = r.headers["etag"]
+
+    again = client.get("/voice/tts", params={"text": "OK, let's keep going!"})
+    assert again.content == r.content
+    assert synth.calls == 1
+
+    assert client.get(
+        "/voice/tts", params={"text": "OK, let's keep going!"},
+        headers={"If-None-Match": etag},
+    ).status_code == 304
+
+    part = client.get(
+        "/voice/tts", params={"text": "OK, let's keep going!"},
+        headers={"Range": "bytes=0-4"},
+    )
+    assert part.status_code == 206
+    assert part.content == b"[OK,]"
+
+
+def test_disk_tier_serves_after_memory_eviction(synth, monkeypatch):
+    monkeypatch.setattr(get_settings(), "tts_cache_mem_bytes", 0)
+    tts_cache.reset_tts_cache()
+    client.get("/voice/tts", params={"text": "Great job"})
+    r = client.get("/voice/tts", params={"text": "Great job"}, headers={"Range": "bytes=7-"})
+    assert r.status_code == 206
+    assert r.content == b"[job]"
+    assert synth.calls == 1
+    assert tts_cache.get_tts_cache().stats()["hits_disk"] == 1
+
+
+def test_disk_budget_evicts_lru(synth, monkeypatch, tmp_path):
+    cfg = get_settings()
+    monkeypatch.setattr(cfg, "tts_cache_disk_bytes", 20)
+    tts_cache.reset_tts_cache()
+    cache = tts_cache.get_tts_cache()
+
+    async def fill():
+        for text in ("one two", "three four", "five six"):
+            await cache.fetch(text, "v")
+
+    asyncio.run(fill())
+    assert cache.stats()["disk_bytes"] <= 20
+    assert len(list(tmp_path.glob("*.mp3"))) == 1
@@ -1,9 +1,24 @@
 import io
 from fastapi.testclient import TestClient
+from sqlmodel import Session
+from backend.app.auth import create_token, hash_pw
 from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User
 
 client = TestClient(app)
 
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    with Session(_engine()) as s:
+        t = Tenant(name="T"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="v@x.com", password_hash=hash_pw("pw")); s.add(u)
+        s.commit()
+        global AUTH
+        AUTH = {"Authorization": f"Bearer {create_token(u.id, t.id)}"}
+
+
 def test_stt_endpoint():
     # 1-second silent WAV header
     wav_header = (
@@ -14,6 +29,13 @@ def test_stt_endpoint():
     r = client.post(
         "/voice/stt",
         files={"file": ("test.wav", io.BytesIO(wav_header), "audio/wav")},
+        headers=AUTH,
     )
     assert r.status_code == 200
     assert "text" in r.json()
+
+
+def test_voice_routes_need_a_token():
+    r = client.post("/voice/stt", files={"file": ("a.wav", b"", "audio/wav")})
+    assert r.status_code == 401
+    assert client.get("/voice/tts", params={"text": "hi"}).status_code == 401
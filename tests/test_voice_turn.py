@@ -0,0 +1,138 @@
+import io
+import json
+
+import numpy as np
+import soundfile as sf
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend.app import stt, voice
+from backend.app.config import get_settings
+from backend.app.main import app
+from backend.app.models import _engine, SQLModel, Tenant, User, Learner
+from backend.app.auth import hash_pw, create_token
+from backend.app.engine import seed_concepts
+from backend.app.llm import STUB_REPLY
+
+client = TestClient(app)
+
+
+class _FakeWhisper:
+    def transcribe(self, data):
+        return {"text": " what is two plus two "}
+
+
+async def _fake_synth(text):
+    for word in text.split():
+        yield f"<{word}>".encode()
+
+
+def setup_module(_=None):
+    SQLModel.metadata.drop_all(_engine())
+    SQLModel.metadata.create_all(_engine())
+    seed_concepts()
+
+    with Session(_engine()) as s:
+        t = Tenant(name="T"); s.add(t); s.flush()
+        u = User(tenant_id=t.id, email="v@x.com", password_hash=hash_pw("pw")); s.add(u)
+        l = Learner(tenant_id=t.id, name="Kid", dob="2018-01"); s.add(l)
+        s.commit()
+        global jwt, learner_id
+        jwt = create_token(u.id, t.id)
+        learner_id = l.id
+
+
+def _wav(seconds=0.5, sr=16_000) -> bytes:
+    buf = io.BytesIO()
+    t = np.arange(int(seconds * sr)) / sr  # a tone: silence would never reach Whisper
+    sf.write(buf, (0.3 * np.sin(2 * np.pi * 220 * t)).astype("float32"), sr, format="WAV")
+    return buf.getvalue()
+
+
+def test_sentence_chunker():
+    chunker = voice.SentenceChunker()
+    out = []
+    for tok in ["Hi", " there!", " What", " is 2", "+2?", " Try"]:
+        out += chunker.feed(tok)
+    assert out == ["Hi there!", "What is 2+2?"]
+    assert chunker.flush() == ["Try"]
+
+
+def test_voice_turn(monkeypatch):
+    monkeypatch.setattr(get_settings(), "stt_executor", "thread")
+    monkeypatch.setattr(stt, "_get_whisper_model", lambda: _FakeWhisper())
+    stt.shutdown_stt_pool()
+    monkeypatch.setattr(voice, "_synthesize", _fake_synth)
+
+    with client.websocket_connect(f"/voice/turn?token={jwt}") as ws:
+        ws.send_json({"learner_id": learner_id})
+        audio = _wav()
+        for i in range(0, len(audio), 4096):
+            ws.send_bytes(audio[i:i + 4096])
+        ws.send_json({"type": "end"})
+
+        frames = []
+        while True:
+            msg = ws.receive()
+            if msg.get("text") is not None:
+                frame = json.loads(msg["text"])
+                frames.append(frame)
+                if frame["type"] == "done":
+                    break
+            else:
+                frames.append(msg["bytes"])
+
+    assert frames[0] == {"type": "transcript", "text": "what is two plus two"}
+    done = frames[-1]
+    assert done["reply"] == STUB_REPLY
+    assert set(done["timings"]) >= {
+        "stt_ms", "llm_first_token_ms", "tts_first_audio_ms", "total_ms"
+    }
+    audio_frames = [f for f in frames if isinstance(f, bytes)]
+    assert b"".join(audio_frames) == b"<OK,><let's><keep><going!>"
+
+
+def test_voice_turn_rejects_other_tenant():
+    with client.websocket_connect(f"/voice/turn?token={jwt}") as ws:
+        ws.send_json({"learner_id": 987_654})
+        assert ws.receive_json() == {"type": "error", "detail": "Forbidden"}
+
+
+def test_voice_turn_rejects_malformed_start():
+    with client.websocket_connect(f"/voice/turn?token={jwt}") as ws:
+        ws.send_bytes(b"RIFF")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_text("[1, 2]")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"learner_id": 987_654})
+        assert ws.receive_json() == {"type": "error", "detail": "Forbidden"}
+
+
+def test_voice_turn_tts_failure_cancels_llm(monkeypatch):
+    monkeypatch.setattr(get_settings(), "stt_executor", "thread")
+    monkeypatch.setattr(stt, "_get_whisper_model", lambda: _FakeWhisper())
+    stt.shutdown_stt_pool()
+
+    async def _broken_synth(text):
+        raise RuntimeError("tts down")
+        yield b""  # pragma: no cover
+
+    monkeypatch.setattr(voice, "_synthesize", _broken_synth)
+
+    with client.websocket_connect(f"/voice/turn?token={jwt}") as ws:
+        ws.send_json({"learner_id": learner_id})
+        ws.send_bytes(_wav())
+        ws.send_json({"type": "end"})
+        while True:
+            msg = ws.receive()
+            if msg.get("text") is None:
+                continue
+            frame = json.loads(msg["text"])
+            assert frame["type"] != "done"
+            if frame["type"] == "error":
+                break
+        # connection is still usable for the next turn
+        ws.send_json({"learner_id": 987_654})
+        assert ws.receive_json() == {"type": "error", "detail": "Forbidden"}